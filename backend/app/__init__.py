@@ -3,10 +3,16 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from flask_cors import CORS
 import os
+from .services.cache import AnalyticsCache
+from .services.ingest_buffer import ActivityBuffer
+from .services.instrumentation import Instrumentation
 
 # 初始化扩展
 db = SQLAlchemy()
 migrate = Migrate()
+analytics_cache = AnalyticsCache()
+activity_buffer = ActivityBuffer()
+instrumentation = Instrumentation()
 
 def create_app(config_name='default'):
     """应用工厂函数"""
@@ -18,6 +24,13 @@ def create_app(config_name='default'):
     # 初始化扩展
     db.init_app(app)
     migrate.init_app(app, db)
+    analytics_cache.init_app(app)
+    activity_buffer.init_app(app)
+    instrumentation.init_app(app)
+    
+    # SQLite 连接调优（WAL 等 PRAGMA），需在建立第一个连接之前注册
+    from .utils.sqlite_pragmas import register_sqlite_pragmas
+    register_sqlite_pragmas(app)
     
     # 启用CORS，允许所有来源的请求
     CORS(app, resources={r"/api/*": {"origins": "*"}}, supports_credentials=True)
@@ -26,6 +39,14 @@ def create_app(config_name='default'):
     from .api import api_bp
     app.register_blueprint(api_bp, url_prefix='/api')
 
+    # 每请求SQL语句预算（测试、预发布环境）
+    from .utils.query_budget import register_query_budget
+    register_query_budget(app)
+
+    # 注册命令行命令
+    from .commands import register_commands
+    register_commands(app)
+
     @app.route('/health')
     def health_check():
         return {'status': 'ok'}
@@ -39,4 +60,4 @@ def create_app(config_name='default'):
     return app
 
 # 确保导出这些变量
-__all__ = ['db', 'migrate', 'create_app'] 
\ No newline at end of file
+__all__ = ['db', 'migrate', 'analytics_cache', 'activity_buffer', 'instrumentation', 'create_app'] 
\ No newline at end of file
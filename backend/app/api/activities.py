@@ -1,11 +1,155 @@
+from datetime import datetime, timezone
 from flask import jsonify, request
+from sqlalchemy import or_, and_, union
 from . import api_bp
 from ..models import Activity, User, Course
-from .. import db
+from ..models.course import course_students
+from .. import db, analytics_cache, activity_buffer
+from ..services.rollups import activity_counters, record_activity_created, record_activity_updated, record_activity_deleted, \
+    record_activities_inserted
+from ..services.ingest_buffer import BufferFull
+from ..utils.pagination import encode_cursor, decode_cursor, parse_datetime_arg, InvalidCursor
+from ..utils.query_budget import query_budget
+
+# 活动列表分页大小
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# 批量上报单次最多事件数
+MAX_BATCH_SIZE = 10000
+
+def member_pairs(course_ids, user_ids):
+    """一次查询返回可在课程中记录活动的 (course_id, user_id) 集合（选课学生及授课教师）"""
+    if not course_ids or not user_ids:
+        return set()
+    students = db.select(course_students.c.course_id, course_students.c.user_id).where(
+        course_students.c.course_id.in_(course_ids),
+        course_students.c.user_id.in_(user_ids)
+    )
+    instructors = db.select(Course.id, Course.instructor_id).where(
+        Course.id.in_(course_ids),
+        Course.instructor_id.in_(user_ids)
+    )
+    return set(db.session.execute(union(students, instructors)).tuples())
+
+def _is_int(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+def parse_batch_event(event):
+    """校验单条上报事件，返回 (插入字段, 错误信息)"""
+    if not isinstance(event, dict):
+        return None, '事件格式错误'
+    
+    user_id = event.get('user_id')
+    course_id = event.get('course_id')
+    activity_type = event.get('activity_type')
+    if not _is_int(user_id) or not _is_int(course_id):
+        return None, '缺少用户或课程'
+    if not isinstance(activity_type, str) or not activity_type or len(activity_type) > 50:
+        return None, '活动类型无效'
+    
+    duration = event.get('duration')
+    if duration is not None and (not _is_int(duration) or duration < 0):
+        return None, '持续时间无效'
+    score = event.get('score')
+    if score is not None and (isinstance(score, bool) or not isinstance(score, (int, float))):
+        return None, '得分无效'
+    completed = event.get('completed', False)
+    if not isinstance(completed, bool):
+        return None, '完成状态无效'
+    resource_id = event.get('resource_id')
+    if resource_id is not None:
+        resource_id = str(resource_id)
+        if len(resource_id) > 100:
+            return None, '资源ID过长'
+    metadata = event.get('metadata', {})
+    if not isinstance(metadata, dict):
+        return None, '元数据格式错误'
+    
+    # 事件发生时间，带时区的时间统一转换为UTC
+    created_at = datetime.utcnow()
+    if event.get('timestamp'):
+        try:
+            created_at = datetime.fromisoformat(event['timestamp'])
+        except (TypeError, ValueError):
+            return None, '时间格式无效'
+        if created_at.tzinfo is not None:
+            created_at = created_at.astimezone(timezone.utc).replace(tzinfo=None)
+    
+    return {
+        'user_id': user_id,
+        'course_id': course_id,
+        'activity_type': activity_type,
+        'resource_id': resource_id,
+        'duration': duration,
+        'score': score,
+        'completed': completed,
+        'data_json': metadata,
+        'created_at': created_at,
+        'updated_at': created_at
+    }, None
+
+def paginate_activities(query):
+    """按 (created_at, id) 倒序对活动查询进行游标分页
+
+    查询参数:
+    - limit: 每页数量，默认100，最大1000
+    - after: 上一页返回的 next_cursor
+    - since / until: ISO格式时间，筛选 since <= created_at < until
+    """
+    limit = request.args.get('limit', DEFAULT_PAGE_SIZE, type=int)
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    
+    try:
+        since = parse_datetime_arg(request.args.get('since'))
+        until = parse_datetime_arg(request.args.get('until'))
+    except ValueError:
+        return jsonify({
+            'status': 'error',
+            'message': '无效的时间格式'
+        }), 400
+    
+    if since:
+        query = query.filter(Activity.created_at >= since)
+    if until:
+        query = query.filter(Activity.created_at < until)
+    
+    cursor = request.args.get('after')
+    if cursor:
+        try:
+            cursor_created_at, cursor_id = decode_cursor(cursor)
+        except InvalidCursor:
+            return jsonify({
+                'status': 'error',
+                'message': '无效的分页游标'
+            }), 400
+        query = query.filter(or_(
+            Activity.created_at < cursor_created_at,
+            and_(Activity.created_at == cursor_created_at, Activity.id < cursor_id)
+        ))
+    
+    # 多取一条用于判断是否还有下一页
+    activities = query.order_by(Activity.created_at.desc(), Activity.id.desc()) \
+        .limit(limit + 1) \
+        .all()
+    
+    has_more = len(activities) > limit
+    activities = activities[:limit]
+    next_cursor = None
+    if has_more:
+        last = activities[-1]
+        next_cursor = encode_cursor(last.created_at, last.id)
+    
+    return jsonify({
+        'status': 'success',
+        'activities': [activity.to_dict() for activity in activities],
+        'next_cursor': next_cursor,
+        'has_more': has_more
+    })
 
 @api_bp.route('/activities', methods=['GET'])
 def get_activities():
-    """获取所有活动记录"""
+    """获取活动记录（游标分页）"""
     # 可以添加过滤参数
     user_id = request.args.get('user_id', type=int)
     course_id = request.args.get('course_id', type=int)
@@ -20,12 +164,7 @@ def get_activities():
     if activity_type:
         query = query.filter_by(activity_type=activity_type)
     
-    activities = query.all()
-    
-    return jsonify({
-        'status': 'success',
-        'activities': [activity.to_dict() for activity in activities]
-    })
+    return paginate_activities(query)
 
 @api_bp.route('/activities/<int:activity_id>', methods=['GET'])
 def get_activity(activity_id):
@@ -42,6 +181,9 @@ def create_activity():
     """创建学习活动记录"""
     data = request.json
     
+    if activity_buffer.enabled:
+        return enqueue_activity(data)
+    
     # 验证用户和课程是否存在
     user_id = data.get('user_id')
     course_id = data.get('course_id')
@@ -56,7 +198,7 @@ def create_activity():
         }), 400
     
     # 验证该用户是否已加入该课程
-    if user not in course.students and user.id != course.instructor_id:
+    if (course.id, user.id) not in member_pairs([course.id], [user.id]):
         return jsonify({
             'status': 'error',
             'message': '用户未加入该课程'
@@ -74,7 +216,12 @@ def create_activity():
     )
     
     db.session.add(new_activity)
+    db.session.flush()
+    
+    # 在同一事务中更新日汇总
+    record_activity_created(new_activity)
     db.session.commit()
+    analytics_cache.bump(course_id=course_id, user_id=user_id)
     
     return jsonify({
         'status': 'success',
@@ -82,11 +229,113 @@ def create_activity():
         'activity': new_activity.to_dict()
     }), 201
 
+def enqueue_activity(data):
+    """写缓冲模式：校验后放入缓冲队列，由后台线程批量写入"""
+    row, message = parse_batch_event(data)
+    if message:
+        return jsonify({
+            'status': 'error',
+            'message': message
+        }), 400
+    
+    if (row['course_id'], row['user_id']) not in member_pairs([row['course_id']], [row['user_id']]):
+        return jsonify({
+            'status': 'error',
+            'message': '用户未加入该课程'
+        }), 400
+    
+    try:
+        activity_buffer.submit(row)
+    except BufferFull:
+        response = jsonify({
+            'status': 'error',
+            'message': '活动记录队列已满，请稍后重试'
+        })
+        response.headers['Retry-After'] = '1'
+        return response, 503
+    
+    return jsonify({
+        'status': 'success',
+        'message': '活动记录已接收'
+    }), 202
+
+@api_bp.route('/activities/batch', methods=['POST'])
+def create_activities_batch():
+    """批量上报学习活动
+
+    请求体: {"events": [{user_id, course_id, activity_type, resource_id, duration,
+    score, completed, metadata, timestamp}, ...]}
+    合法事件在同一事务中批量插入，非法事件按下标返回错误信息
+    """
+    data = request.get_json(silent=True) or {}
+    events = data.get('events')
+    
+    if not isinstance(events, list) or not events:
+        return jsonify({
+            'status': 'error',
+            'message': '缺少活动事件'
+        }), 400
+    if len(events) > MAX_BATCH_SIZE:
+        return jsonify({
+            'status': 'error',
+            'message': f'单次最多上报{MAX_BATCH_SIZE}条事件'
+        }), 413
+    
+    errors = []
+    parsed = []
+    for index, event in enumerate(events):
+        row, message = parse_batch_event(event)
+        if message:
+            errors.append({'index': index, 'message': message})
+        else:
+            parsed.append((index, row))
+    
+    # 一次查询校验全部事件的选课关系
+    members = member_pairs(
+        {row['course_id'] for _, row in parsed},
+        {row['user_id'] for _, row in parsed}
+    )
+    rows = []
+    for index, row in parsed:
+        if (row['course_id'], row['user_id']) in members:
+            rows.append(row)
+        else:
+            errors.append({'index': index, 'message': '用户未加入该课程'})
+    errors.sort(key=lambda error: error['index'])
+    
+    if not rows:
+        return jsonify({
+            'status': 'error',
+            'message': '没有可写入的活动事件',
+            'inserted': 0,
+            'failed': len(errors),
+            'errors': errors
+        }), 400
+    
+    # 直接使用Core批量插入，跳过ORM对象的逐行处理
+    db.session.execute(Activity.__table__.insert(), rows)
+    # 在同一事务中更新日汇总
+    record_activities_inserted(rows)
+    db.session.commit()
+    analytics_cache.bump(
+        course_ids=[row['course_id'] for row in rows],
+        user_ids=[row['user_id'] for row in rows]
+    )
+    
+    return jsonify({
+        'status': 'success',
+        'message': '活动记录批量创建成功',
+        'inserted': len(rows),
+        'failed': len(errors),
+        'errors': errors
+    }), 201
+
 @api_bp.route('/activities/<int:activity_id>', methods=['PUT'])
 def update_activity(activity_id):
     """更新活动记录"""
     activity = Activity.query.get_or_404(activity_id)
     data = request.json
+    before = activity_counters(activity)
     
     if 'duration' in data:
         activity.duration = data['duration']
@@ -100,7 +349,10 @@ def update_activity(activity_id):
         current_metadata.update(data['metadata'])
         activity.data_json = current_metadata
     
+    # 在同一事务中更新日汇总
+    record_activity_updated(activity, before)
     db.session.commit()
+    analytics_cache.bump(course_id=activity.course_id, user_id=activity.user_id)
     
     return jsonify({
         'status': 'success',
@@ -112,8 +364,10 @@ def update_activity(activity_id):
 def delete_activity(activity_id):
     """删除活动记录"""
     activity = Activity.query.get_or_404(activity_id)
+    record_activity_deleted(activity)
     db.session.delete(activity)
     db.session.commit()
+    analytics_cache.bump(course_id=activity.course_id, user_id=activity.user_id)
     
     return jsonify({
         'status': 'success',
@@ -121,23 +375,17 @@ def delete_activity(activity_id):
     })
 
 @api_bp.route('/users/<int:user_id>/activities', methods=['GET'])
+@query_budget(2)
 def get_user_activities(user_id):
-    """获取用户的所有活动记录"""
+    """获取用户的活动记录（游标分页）"""
     user = User.query.get_or_404(user_id)
-    activities = Activity.query.filter_by(user_id=user_id).all()
     
-    return jsonify({
-        'status': 'success',
-        'activities': [activity.to_dict() for activity in activities]
-    })
+    return paginate_activities(Activity.query.filter_by(user_id=user_id))
 
 @api_bp.route('/courses/<int:course_id>/activities', methods=['GET'])
+@query_budget(2)
 def get_course_activities(course_id):
-    """获取课程的所有活动记录"""
+    """获取课程的活动记录（游标分页）"""
     course = Course.query.get_or_404(course_id)
-    activities = Activity.query.filter_by(course_id=course_id).all()
     
-    return jsonify({
-        'status': 'success',
-        'activities': [activity.to_dict() for activity in activities]
-    }) 
\ No newline at end of file
+    return paginate_activities(Activity.query.filter_by(course_id=course_id)) 
\ No newline at end of file
@@ -1,8 +1,12 @@
 from flask import jsonify, request
 from . import api_bp
 from ..models import User, Course, Activity, CourseProgress
-from .. import db
-from ..utils.auth import authenticate, require_role
+from ..models.course import course_students
+from .. import db, analytics_cache
+from ..utils.auth import authenticate, require_role, invalidate_principal
+from ..services import progress_engine, counters, gradebook, sketches
+from ..services.serializers import COURSE_OPTIONS, serialize_courses
+from ..utils.query_budget import query_budget
 from sqlalchemy import func
 from werkzeug.security import generate_password_hash
 from datetime import datetime
@@ -50,16 +54,25 @@ def admin_overview():
         'activity_type_distribution': activity_type_distribution
     }
     
-    print("返回系统概览数据:", data)
-    
     return jsonify({
         'status': 'success',
         'data': data
     })
 
+@api_bp.route('/admin/analytics-cache', methods=['GET'])
+@authenticate
+@require_role('admin')
+def admin_analytics_cache_stats():
+    """获取分析接口缓存的命中统计"""
+    return jsonify({
+        'status': 'success',
+        'stats': analytics_cache.stats()
+    })
+
 # 用户管理API
 
 @api_bp.route('/admin/users', methods=['GET'])
+@query_budget(3)
 @authenticate
 @require_role('admin')
 def admin_get_all_users():
@@ -68,8 +81,6 @@ def admin_get_all_users():
     per_page = request.args.get('per_page', 10, type=int)
     role_filter = request.args.get('role', None)
     
-    print(f"获取用户列表: page={page}, per_page={per_page}, role={role_filter}")
-    
     query = User.query
     
     # 按角色筛选
@@ -88,8 +99,6 @@ def admin_get_all_users():
         'current_page': page
     }
     
-    print(f"返回用户数据: {len(result['users'])}条记录")
-    
     return jsonify(result)
 
 @api_bp.route('/admin/users/<int:user_id>', methods=['GET'])
@@ -102,18 +111,16 @@ def admin_get_user_detail(user_id):
     # 获取用户的课程信息
     courses_data = []
     if user.role == 'student':
-        # 学生的选修课程
-        for course in user.enrolled_courses:
-            course_dict = course.to_dict()
-            # 获取课程进度
-            progress = CourseProgress.query.filter_by(
-                user_id=user_id, course_id=course.id
-            ).first()
-            course_dict['progress'] = progress.progress_percent if progress else 0
-            courses_data.append(course_dict)
+        # 学生的选修课程及各课程进度
+        courses = user.enrolled_courses.options(*COURSE_OPTIONS).all()
+        progress_map = dict(db.session.query(CourseProgress.course_id, CourseProgress.progress_percent)
+                            .filter(CourseProgress.user_id == user_id).all())
+        courses_data = serialize_courses(courses)
+        for course_dict in courses_data:
+            course_dict['progress'] = progress_map.get(course_dict['id']) or 0
     elif user.role == 'teacher':
         # 教师的教授课程
-        courses_data = [course.to_dict() for course in user.teaching_courses]
+        courses_data = serialize_courses(user.teaching_courses)
     
     # 获取用户活动统计
     activities_count = Activity.query.filter_by(user_id=user_id).count()
@@ -216,6 +223,7 @@ def admin_update_user(user_id):
     
     user.updated_at = datetime.utcnow()
     db.session.commit()
+    invalidate_principal(user.id)
     
     return jsonify({
         'status': 'success',
@@ -239,8 +247,11 @@ def admin_delete_user(user_id):
         }), 400
     
     # 删除用户相关数据（可以根据需要处理级联删除）
+    counters.user_removed(user_id)
+    sketches.user_removed(user_id)
     db.session.delete(user)
     db.session.commit()
+    invalidate_principal(user_id)
     
     return jsonify({
         'status': 'success',
@@ -250,6 +261,7 @@ def admin_delete_user(user_id):
 # 课程管理API
 
 @api_bp.route('/admin/courses', methods=['GET'])
+@query_budget(3)
 @authenticate
 @require_role('admin')
 def admin_get_all_courses():
@@ -258,7 +270,7 @@ def admin_get_all_courses():
     per_page = request.args.get('per_page', 10, type=int)
     status_filter = request.args.get('status', None)
     
-    query = Course.query
+    query = Course.query.options(*COURSE_OPTIONS)
     
     # 按状态筛选
     if status_filter:
@@ -270,13 +282,14 @@ def admin_get_all_courses():
     
     return jsonify({
         'status': 'success',
-        'courses': [course.to_dict() for course in courses],
+        'courses': serialize_courses(courses),
         'total': pagination.total,
         'pages': pagination.pages,
         'current_page': page
     })
 
 @api_bp.route('/admin/courses/<int:course_id>', methods=['GET'])
+@query_budget(6)
 @authenticate
 @require_role('admin')
 def admin_get_course_detail(course_id):
@@ -305,21 +318,23 @@ def admin_get_course_detail(course_id):
     })
 
 @api_bp.route('/admin/courses/<int:course_id>/students', methods=['GET'])
+@query_budget(3)
 @authenticate
 @require_role('admin')
 def admin_get_course_students(course_id):
     """获取课程学生及进度"""
-    course = Course.query.get_or_404(course_id)
-    
-    # 获取所有学生及其进度
+    Course.query.get_or_404(course_id)
+    
+    # 一次查询所有学生及其进度
+    rows = db.session.query(User, CourseProgress.progress_percent) \
+        .join(course_students, course_students.c.user_id == User.id) \
+        .outerjoin(CourseProgress, (CourseProgress.user_id == User.id) & (CourseProgress.course_id == course_id)) \
+        .filter(course_students.c.course_id == course_id) \
+        .all()
     students_data = []
-    for student in course.students:
+    for student, progress_percent in rows:
         student_dict = student.to_dict()
-        # 获取进度
-        progress = CourseProgress.query.filter_by(
-            user_id=student.id, course_id=course_id
-        ).first()
-        student_dict['progress'] = progress.progress_percent if progress else 0
+        student_dict['progress'] = progress_percent or 0
         students_data.append(student_dict)
     
     return jsonify({
@@ -426,6 +441,62 @@ def admin_delete_course(course_id):
         'message': '课程删除成功'
     })
 
+@api_bp.route('/admin/grade-settings', methods=['PUT'])
+@authenticate
+@require_role('admin')
+def admin_update_grade_settings():
+    """批量设置课程成绩比重并重算总评
+
+    请求体: {"final_exam_weight": 70, "regular_grade_weight": 30, "course_ids": [1, 2]}，
+    省略 course_ids 时应用到所有课程
+    """
+    data = request.json or {}
+    final_weight = data.get('final_exam_weight')
+    regular_weight = data.get('regular_grade_weight')
+
+    if not all(isinstance(weight, (int, float)) and not isinstance(weight, bool)
+               for weight in (final_weight, regular_weight)):
+        return jsonify({
+            'status': 'error',
+            'message': '缺少成绩权重或权重不是数字'
+        }), 400
+
+    # 确保权重总和为100%
+    if abs(final_weight + regular_weight - 100.0) > 0.01:
+        return jsonify({
+            'status': 'error',
+            'message': '成绩权重总和必须为100%'
+        }), 400
+
+    if 'course_ids' in data:
+        requested = data['course_ids']
+        if not isinstance(requested, list) or not all(isinstance(cid, int) for cid in requested):
+            return jsonify({
+                'status': 'error',
+                'message': 'course_ids 必须是课程ID列表'
+            }), 400
+        course_ids = [cid for (cid,) in db.session.query(Course.id).filter(Course.id.in_(set(requested)))]
+        invalid_ids = sorted(set(requested) - set(course_ids))
+        if invalid_ids:
+            return jsonify({
+                'status': 'error',
+                'message': '课程不存在',
+                'invalid_ids': invalid_ids
+            }), 400
+    else:
+        course_ids = [cid for (cid,) in db.session.query(Course.id)]
+
+    updated_grades = gradebook.apply_grade_weights(course_ids, float(final_weight), float(regular_weight))
+    db.session.commit()
+    analytics_cache.bump(course_ids=course_ids)
+
+    return jsonify({
+        'status': 'success',
+        'message': f'已更新 {len(course_ids)} 门课程的成绩设置',
+        'course_count': len(course_ids),
+        'updated_grade_count': updated_grades
+    })
+
 @api_bp.route('/admin/courses/<int:course_id>/students', methods=['POST'])
 @authenticate
 @require_role('admin')
@@ -456,17 +527,14 @@ def admin_add_student_to_course(course_id):
     
     # 添加学生到课程
     course.students.append(student)
+    counters.students_enrolled(course_id)
+    sketches.students_enrolled(course_id, [student.id])
     
     # 初始化课程进度
-    progress = CourseProgress(
-        user_id=student.id,
-        course_id=course_id,
-        progress_percent=0,
-        last_activity_date=datetime.utcnow()
-    )
-    db.session.add(progress)
+    progress_engine.get_or_create_progress(student.id, course_id)
     
     db.session.commit()
+    analytics_cache.bump(course_id=course_id, user_id=student.id)
     
     return jsonify({
         'status': 'success',
@@ -496,6 +564,8 @@ def admin_remove_student_from_course(course_id, student_id):
     
     # 从课程中移除学生
     course.students.remove(student)
+    counters.students_dropped(course_id)
+    sketches.students_dropped(course_id, [student.id])
     
     # 删除课程进度
     progress = CourseProgress.query.filter_by(
@@ -505,6 +575,7 @@ def admin_remove_student_from_course(course_id, student_id):
         db.session.delete(progress)
     
     db.session.commit()
+    analytics_cache.bump(course_id=course_id, user_id=student.id)
     
     return jsonify({
         'status': 'success',
@@ -1,42 +1,57 @@
 from flask import jsonify, request
 from . import api_bp
-from ..models import Activity, User, Course, CourseProgress, ResourceProgress, Assignment
-from .. import db
-from sqlalchemy import func, and_, desc, asc
+from ..models import Activity, ActivityDailyRollup, User, Course, CourseProgress, ResourceProgress, Assignment
+from ..models.course import course_students
+from .. import db, analytics_cache
+from ..services.cache import global_tags, course_tags
+from ..services import sketches, leaderboards
+from ..utils.histogram import PERCENT_BUCKETS, histogram, bucket_counts
+from sqlalchemy import func, and_, desc, asc, case
 from datetime import datetime, timedelta
+import heapq
 import statistics
 
+SCORE_BUCKETS = [('0-20分', 20), ('21-40分', 40), ('41-60分', 60), ('61-80分', 80), ('81-100分', None)]
+
+# 学习持续时间分布，上界单位为秒
+DURATION_BUCKETS = [('0-15分钟', 15 * 60), ('16-30分钟', 30 * 60), ('31-60分钟', 60 * 60),
+                    ('1-2小时', 120 * 60), ('2小时以上', None)]
+
 @api_bp.route('/analytics/user/<int:user_id>', methods=['GET'])
 def user_analytics(user_id):
     """获取用户的学习分析数据"""
     user = User.query.get_or_404(user_id)
     
-    # 获取用户的总活动时间
-    total_duration = db.session.query(func.sum(Activity.duration)) \
-        .filter(Activity.user_id == user_id) \
-        .scalar() or 0
-    
-    # 获取用户完成的活动数量
-    completed_activities = Activity.query \
-        .filter(Activity.user_id == user_id, Activity.completed == True) \
-        .count()
+    # 一次分组查询日汇总表，得到各课程的活动数、完成数、时长和得分
+    per_course = db.session.query(
+            ActivityDailyRollup.course_id,
+            func.sum(ActivityDailyRollup.activity_count),
+            func.sum(ActivityDailyRollup.completed_count),
+            func.sum(ActivityDailyRollup.duration_sum),
+            func.sum(ActivityDailyRollup.score_sum),
+            func.sum(ActivityDailyRollup.score_count)
+        ) \
+        .filter(ActivityDailyRollup.user_id == user_id) \
+        .group_by(ActivityDailyRollup.course_id) \
+        .all()
+    stats = {row[0]: row[1:] for row in per_course}
     
-    # 获取用户的平均得分
-    avg_score = db.session.query(func.avg(Activity.score)) \
-        .filter(Activity.user_id == user_id) \
-        .scalar() or 0
+    total_activities = sum(row[0] for row in stats.values())
+    completed_activities = sum(row[1] for row in stats.values())
+    total_duration = sum(row[2] for row in stats.values())
+    score_count = sum(row[4] for row in stats.values())
+    avg_score = sum(row[3] for row in stats.values()) / score_count if score_count else 0
     
     # 获取课程进度
     course_progress = []
-    enrolled_courses = user.enrolled_courses.all()
+    enrolled_courses = db.session.query(Course.id, Course.title) \
+        .join(course_students, course_students.c.course_id == Course.id) \
+        .filter(course_students.c.user_id == user_id) \
+        .all()
     
-    for course in enrolled_courses:
-        course_activities = Activity.query \
-            .filter(Activity.course_id == course.id, Activity.user_id == user_id) \
-            .all()
-        
-        total_course_activities = len(course_activities)
-        completed_course_activities = sum(1 for act in course_activities if act.completed)
+    for course_id, course_title in enrolled_courses:
+        total_course_activities, completed_course_activities, course_duration, course_score_sum, course_score_count = \
+            stats.get(course_id, (0, 0, 0, 0.0, 0))
         
         if total_course_activities > 0:
             progress_percent = (completed_course_activities / total_course_activities) * 100
@@ -44,11 +59,13 @@ def user_analytics(user_id):
             progress_percent = 0
         
         course_progress.append({
-            'course_id': course.id,
-            'course_title': course.title,
+            'course_id': course_id,
+            'course_title': course_title,
             'total_activities': total_course_activities,
             'completed_activities': completed_course_activities,
-            'progress_percent': progress_percent
+            'progress_percent': progress_percent,
+            'total_duration': course_duration,
+            'avg_score': course_score_sum / course_score_count if course_score_count else 0
         })
     
     # 获取用户最近的活动
@@ -62,7 +79,7 @@ def user_analytics(user_id):
         'status': 'success',
         'user_id': user_id,
         'total_duration': total_duration,
-        'total_activities': Activity.query.filter(Activity.user_id == user_id).count(),
+        'total_activities': total_activities,
         'completed_activities': completed_activities,
         'avg_score': avg_score,
         'course_progress': course_progress,
@@ -70,6 +87,7 @@ def user_analytics(user_id):
     })
 
 @api_bp.route('/analytics/course/<int:course_id>', methods=['GET'])
+@analytics_cache.cached(lambda course_id: course_tags(course_id, 'assignments'))
 def course_analytics(course_id):
     """获取课程的分析数据"""
     course = Course.query.get_or_404(course_id)
@@ -90,16 +108,8 @@ def course_analytics(course_id):
         .filter(Activity.course_id == course_id) \
         .scalar() or 0
     
-    # 获取最活跃的学生（基于活动数量）
-    active_students = db.session.query(
-            User.id, User.username, func.count(Activity.id).label('activity_count')
-        ) \
-        .join(Activity, Activity.user_id == User.id) \
-        .filter(Activity.course_id == course_id) \
-        .group_by(User.id) \
-        .order_by(func.count(Activity.id).desc()) \
-        .limit(5) \
-        .all()
+    # 获取最活跃的学生（基于活动数量），读取按增量维护的排行计数
+    active_students = leaderboards.top_students(course_id)
     
     active_students_list = [
         {
@@ -124,29 +134,8 @@ def course_analytics(course_id):
     }
     
     # 获取学生进度分布
-    progress_data = db.session.query(CourseProgress.progress_percent) \
-        .filter(CourseProgress.course_id == course_id) \
-        .all()
-    
-    progress_distribution = {
-        "0-20%": 0,
-        "21-40%": 0,
-        "41-60%": 0,
-        "61-80%": 0,
-        "81-100%": 0
-    }
-    
-    for (progress,) in progress_data:
-        if progress <= 20:
-            progress_distribution["0-20%"] += 1
-        elif progress <= 40:
-            progress_distribution["21-40%"] += 1
-        elif progress <= 60:
-            progress_distribution["41-60%"] += 1
-        elif progress <= 80:
-            progress_distribution["61-80%"] += 1
-        else:
-            progress_distribution["81-100%"] += 1
+    progress_distribution = histogram(CourseProgress.progress_percent, PERCENT_BUCKETS,
+                                      CourseProgress.course_id == course_id)
     
     # 获取作业完成率和平均得分
     assignments = Assignment.query.filter(Assignment.course_id == course_id).all()
@@ -186,6 +175,7 @@ def course_analytics(course_id):
     })
 
 @api_bp.route('/analytics/overview', methods=['GET'])
+@analytics_cache.cached(global_tags)
 def analytics_overview():
     """获取系统整体分析概览"""
     # 获取用户数量统计
@@ -214,13 +204,14 @@ def analytics_overview():
     today = datetime.utcnow().date()
     thirty_days_ago = today - timedelta(days=30)
     
+    # 读取日汇总表，避免按天扫描原始活动记录
     daily_activities = db.session.query(
-            func.date(Activity.created_at).label('date'),
-            func.count(Activity.id).label('count')
+            ActivityDailyRollup.date,
+            func.sum(ActivityDailyRollup.activity_count).label('count')
         ) \
-        .filter(func.date(Activity.created_at) >= thirty_days_ago) \
-        .group_by(func.date(Activity.created_at)) \
-        .order_by(func.date(Activity.created_at)) \
+        .filter(ActivityDailyRollup.date >= thirty_days_ago) \
+        .group_by(ActivityDailyRollup.date) \
+        .order_by(ActivityDailyRollup.date) \
         .all()
     
     activity_trend = [
@@ -243,15 +234,8 @@ def analytics_overview():
         for activity_type, count in activity_type_counts
     }
     
-    # 最活跃的课程
-    active_courses = db.session.query(
-            Course.id, Course.title, func.count(Activity.id).label('activity_count')
-        ) \
-        .join(Activity, Activity.course_id == Course.id) \
-        .group_by(Course.id) \
-        .order_by(func.count(Activity.id).desc()) \
-        .limit(5) \
-        .all()
+    # 最活跃的课程，读取按增量维护的课程活动计数
+    active_courses = leaderboards.top_courses()
     
     active_courses_list = [
         {
@@ -281,14 +265,15 @@ def student_learning_analytics(user_id):
     today = datetime.utcnow().date()
     thirty_days_ago = today - timedelta(days=30)
     
+    # 读取日汇总表，避免按天扫描原始活动记录
     daily_duration = db.session.query(
-            func.date(Activity.created_at).label('date'),
-            func.sum(Activity.duration).label('duration')
+            ActivityDailyRollup.date,
+            func.sum(ActivityDailyRollup.duration_sum).label('duration')
         ) \
-        .filter(Activity.user_id == user_id) \
-        .filter(func.date(Activity.created_at) >= thirty_days_ago) \
-        .group_by(func.date(Activity.created_at)) \
-        .order_by(func.date(Activity.created_at)) \
+        .filter(ActivityDailyRollup.user_id == user_id) \
+        .filter(ActivityDailyRollup.date >= thirty_days_ago) \
+        .group_by(ActivityDailyRollup.date) \
+        .order_by(ActivityDailyRollup.date) \
         .all()
     
     learning_time_trend = [
@@ -355,29 +340,8 @@ def student_learning_analytics(user_id):
             hourly_distribution[hour] = 0
     
     # 学习行为分析（学习持续时间分布）
-    duration_distribution = {
-        "0-15分钟": 0,
-        "16-30分钟": 0,
-        "31-60分钟": 0,
-        "1-2小时": 0,
-        "2小时以上": 0
-    }
-    
-    activities = Activity.query.filter(Activity.user_id == user_id).all()
-    
-    for activity in activities:
-        duration_minutes = (activity.duration or 0) / 60
-        
-        if duration_minutes <= 15:
-            duration_distribution["0-15分钟"] += 1
-        elif duration_minutes <= 30:
-            duration_distribution["16-30分钟"] += 1
-        elif duration_minutes <= 60:
-            duration_distribution["31-60分钟"] += 1
-        elif duration_minutes <= 120:
-            duration_distribution["1-2小时"] += 1
-        else:
-            duration_distribution["2小时以上"] += 1
+    duration_distribution = histogram(func.coalesce(Activity.duration, 0), DURATION_BUCKETS,
+                                      Activity.user_id == user_id)
     
     # 获取未完成作业
     from ..models import Assignment, AssignmentSubmission
@@ -419,35 +383,41 @@ def student_learning_analytics(user_id):
     })
 
 @api_bp.route('/analytics/class-performance/<int:course_id>', methods=['GET'])
+@analytics_cache.cached(course_tags)
 def class_performance_analytics(course_id):
     """获取班级整体表现分析"""
     course = Course.query.get_or_404(course_id)
     
     # 获取所有学生的进度数据
-    students = course.students.all()
+    # 一次分组聚合取回每个学生的进度、平均分和活动数量，避免逐个学生查询
+    completed_case = case((Activity.completed == True, 1), else_=0)
+    student_rows = db.session.query(
+            User.id,
+            User.username,
+            CourseProgress.progress_percent,
+            func.avg(Activity.score).label('avg_score'),
+            func.count(Activity.id).label('activity_count'),
+            func.coalesce(func.sum(completed_case), 0).label('completed_count')
+        ) \
+        .join(course_students, and_(
+            course_students.c.user_id == User.id,
+            course_students.c.course_id == course_id
+        )) \
+        .outerjoin(CourseProgress, and_(
+            CourseProgress.user_id == User.id,
+            CourseProgress.course_id == course_id
+        )) \
+        .outerjoin(Activity, and_(
+            Activity.user_id == User.id,
+            Activity.course_id == course_id
+        )) \
+        .group_by(User.id, User.username, CourseProgress.progress_percent) \
+        .order_by(User.id) \
+        .all()
+    
     progress_data = []
     
-    for student in students:
-        # 查询学生在该课程的课程进度
-        progress = CourseProgress.query \
-            .filter(CourseProgress.user_id == student.id, CourseProgress.course_id == course_id) \
-            .first()
-            
-        # 查询学生在该课程的平均得分
-        avg_score = db.session.query(func.avg(Activity.score)) \
-            .filter(Activity.user_id == student.id, Activity.course_id == course_id) \
-            .scalar() or 0
-            
-        # 查询学生在该课程的活动数量
-        activity_count = Activity.query \
-            .filter(Activity.user_id == student.id, Activity.course_id == course_id) \
-            .count()
-            
-        # 查询学生在该课程的完成活动数量
-        completed_activity_count = Activity.query \
-            .filter(Activity.user_id == student.id, Activity.course_id == course_id, Activity.completed == True) \
-            .count()
-        
+    for user_id, username, progress_percent, avg_score, activity_count, completed_activity_count in student_rows:
         # 计算完成率
         if activity_count > 0:
             completion_rate = (completed_activity_count / activity_count) * 100
@@ -455,45 +425,30 @@ def class_performance_analytics(course_id):
             completion_rate = 0
             
         progress_data.append({
-            'user_id': student.id,
-            'username': student.username,
-            'progress_percent': progress.progress_percent if progress else 0,
-            'avg_score': avg_score,
+            'user_id': user_id,
+            'username': username,
+            'progress_percent': progress_percent if progress_percent is not None else 0,
+            'avg_score': avg_score or 0,
             'activity_count': activity_count,
             'completion_rate': completion_rate
         })
     
+    # 活动得分和完成率的分位数，读取按增量维护的草图，无需扫描学生；
+    # 完成率草图与 progress_data 统计的是同一批选课学生
+    course_sketches = sketches.load_sketches([course_id])
+    percentiles = {metric: sketches.summarize(sketch) for metric, sketch in course_sketches.items()}
+    
     # 统计完成率分布
-    if progress_data:
-        completion_rates = [p['completion_rate'] for p in progress_data]
-        
+    # 每个学生的数值已随 progress_data 取回，直方图按同一分桶配置在内存中计数
+    completion_rates = [p['completion_rate'] for p in progress_data]
+    
+    if completion_rates:
         completion_stats = {
-            'avg': sum(completion_rates) / len(completion_rates) if completion_rates else 0,
-            'min': min(completion_rates) if completion_rates else 0,
-            'max': max(completion_rates) if completion_rates else 0,
-            'median': statistics.median(completion_rates) if completion_rates else 0
+            'avg': sum(completion_rates) / len(completion_rates),
+            'min': min(completion_rates),
+            'max': max(completion_rates),
+            'median': statistics.median(completion_rates)
         }
-        
-        # 构建完成率分布直方图
-        completion_distribution = {
-            "0-20%": 0,
-            "21-40%": 0,
-            "41-60%": 0,
-            "61-80%": 0,
-            "81-100%": 0
-        }
-        
-        for rate in completion_rates:
-            if rate <= 20:
-                completion_distribution["0-20%"] += 1
-            elif rate <= 40:
-                completion_distribution["21-40%"] += 1
-            elif rate <= 60:
-                completion_distribution["41-60%"] += 1
-            elif rate <= 80:
-                completion_distribution["61-80%"] += 1
-            else:
-                completion_distribution["81-100%"] += 1
     else:
         completion_stats = {
             'avg': 0,
@@ -501,45 +456,18 @@ def class_performance_analytics(course_id):
             'max': 0,
             'median': 0
         }
-        completion_distribution = {
-            "0-20%": 0,
-            "21-40%": 0,
-            "41-60%": 0,
-            "61-80%": 0,
-            "81-100%": 0
-        }
+    completion_distribution = bucket_counts(completion_rates, PERCENT_BUCKETS)
     
     # 统计平均分分布
-    if progress_data:
-        avg_scores = [p['avg_score'] for p in progress_data]
-        
+    avg_scores = [p['avg_score'] for p in progress_data]
+    
+    if avg_scores:
         score_stats = {
-            'avg': sum(avg_scores) / len(avg_scores) if avg_scores else 0,
-            'min': min(avg_scores) if avg_scores else 0,
-            'max': max(avg_scores) if avg_scores else 0,
-            'median': statistics.median(avg_scores) if avg_scores else 0
+            'avg': sum(avg_scores) / len(avg_scores),
+            'min': min(avg_scores),
+            'max': max(avg_scores),
+            'median': statistics.median(avg_scores)
         }
-        
-        # 构建平均分分布直方图
-        score_distribution = {
-            "0-20分": 0,
-            "21-40分": 0,
-            "41-60分": 0,
-            "61-80分": 0,
-            "81-100分": 0
-        }
-        
-        for score in avg_scores:
-            if score <= 20:
-                score_distribution["0-20分"] += 1
-            elif score <= 40:
-                score_distribution["21-40分"] += 1
-            elif score <= 60:
-                score_distribution["41-60分"] += 1
-            elif score <= 80:
-                score_distribution["61-80分"] += 1
-            else:
-                score_distribution["81-100分"] += 1
     else:
         score_stats = {
             'avg': 0,
@@ -547,29 +475,87 @@ def class_performance_analytics(course_id):
             'max': 0,
             'median': 0
         }
-        score_distribution = {
-            "0-20分": 0,
-            "21-40分": 0,
-            "41-60分": 0,
-            "61-80分": 0,
-            "81-100分": 0
-        }
+    score_distribution = bucket_counts(avg_scores, SCORE_BUCKETS)
     
-    # 学生参与度排名（基于活动数量）
-    engagement_ranking = sorted(progress_data, key=lambda x: x['activity_count'], reverse=True)[:10]
+    # 学生参与度排名（基于活动数量），只保留前10名，无需排序整个列表
+    engagement_ranking = heapq.nlargest(10, progress_data, key=lambda x: x['activity_count'])
     
     # 学生成绩排名（基于平均分）
-    performance_ranking = sorted(progress_data, key=lambda x: x['avg_score'], reverse=True)[:10]
+    performance_ranking = heapq.nlargest(10, progress_data, key=lambda x: x['avg_score'])
     
     return jsonify({
         'status': 'success',
         'course_id': course_id,
-        'student_count': len(students),
+        'student_count': len(progress_data),
         'progress_data': progress_data,
         'completion_stats': completion_stats,
         'completion_distribution': completion_distribution,
         'score_stats': score_stats,
         'score_distribution': score_distribution,
+        'percentiles': percentiles,
         'engagement_ranking': engagement_ranking,
         'performance_ranking': performance_ranking
-    }) 
\ No newline at end of file
+    }) 
+
+def parse_quantiles(value):
+    """解析逗号分隔的分位数参数（0-1），未提供时使用默认分位数"""
+    if not value:
+        return sketches.DEFAULT_QUANTILES
+    qs = tuple(float(item) for item in value.split(','))
+    if not qs or any(not 0 <= q <= 1 for q in qs):
+        raise ValueError(value)
+    return qs
+
+
+def percentiles_response(course_ids):
+    metric = request.args.get('metric')
+    if metric is not None and metric not in sketches.METRICS:
+        return jsonify({
+            'status': 'error',
+            'message': f'不支持的指标: {metric}'
+        }), 400
+    try:
+        qs = parse_quantiles(request.args.get('q'))
+    except ValueError:
+        return jsonify({
+            'status': 'error',
+            'message': '分位数参数应为0到1之间的数字，多个用逗号分隔'
+        }), 400
+
+    metrics = (metric,) if metric else sketches.METRICS
+    return jsonify({
+        'status': 'success',
+        'course_ids': course_ids,
+        'percentiles': {
+            name: sketches.summarize(sketch, qs)
+            for name, sketch in sketches.load_sketches(course_ids, metrics).items()
+        }
+    })
+
+@api_bp.route('/analytics/course/<int:course_id>/percentiles', methods=['GET'])
+@analytics_cache.cached(course_tags)
+def course_percentiles(course_id):
+    """获取课程活动得分和学生完成率的分位数
+
+    查询参数: metric（activity_score/completion_rate，默认全部）、q（如 0.5,0.9）
+    """
+    Course.query.get_or_404(course_id)
+    return percentiles_response([course_id])
+
+@api_bp.route('/analytics/percentiles', methods=['GET'])
+@analytics_cache.cached(global_tags)
+def merged_percentiles():
+    """合并多门课程（如一个院系）的草图后计算分位数
+
+    查询参数: course_ids（逗号分隔）、metric、q
+    """
+    try:
+        course_ids = sorted({int(item) for item in request.args.get('course_ids', '').split(',') if item})
+    except ValueError:
+        course_ids = None
+    if not course_ids:
+        return jsonify({
+            'status': 'error',
+            'message': 'course_ids 应为逗号分隔的课程ID'
+        }), 400
+    return percentiles_response(course_ids)
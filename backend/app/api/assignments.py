@@ -1,10 +1,15 @@
 from flask import jsonify, request
 from . import api_bp
 from ..models import Course, User, Assignment, AssignmentSubmission
-from .. import db
+from .. import db, analytics_cache
+from ..services import progress_engine
+from ..services import counters
+from ..services.serializers import ASSIGNMENT_OPTIONS, SUBMISSION_OPTIONS, serialize_assignments, serialize_submissions
+from ..utils.query_budget import query_budget
 from datetime import datetime
 
 @api_bp.route('/courses/<int:course_id>/assignments', methods=['GET'])
+@query_budget(3)
 def get_course_assignments(course_id):
     """获取课程的所有作业"""
     course = Course.query.get_or_404(course_id)
@@ -12,15 +17,10 @@ def get_course_assignments(course_id):
     # 获取查询参数中的user_id
     user_id = request.args.get('user_id', type=int)
     
-    assignments = Assignment.query.filter_by(course_id=course_id).all()
+    assignments = Assignment.query.options(*ASSIGNMENT_OPTIONS).filter_by(course_id=course_id).all()
     
-    # 根据是否传入user_id来决定使用哪种序列化方法
-    if user_id:
-        # 使用针对特定用户的序列化
-        assignment_dicts = [assignment.to_dict_for_user(user_id) for assignment in assignments]
-    else:
-        # 使用通用序列化
-        assignment_dicts = [assignment.to_dict() for assignment in assignments]
+    # 传入user_id时返回针对该用户的作业状态
+    assignment_dicts = serialize_assignments(assignments, user_id=user_id)
     
     return jsonify({
         'status': 'success',
@@ -78,7 +78,11 @@ def create_course_assignment(course_id):
     )
     
     db.session.add(new_assignment)
+    
+    # 课程作业总数变化，批量重算所有学生的进度
+    progress_engine.on_course_content_changed(course_id)
     db.session.commit()
+    analytics_cache.bump(course_id=course_id)
     
     return jsonify({
         'status': 'success',
@@ -110,6 +114,7 @@ def update_course_assignment(course_id, assignment_id):
         assignment.attachments = data['attachments']
     
     db.session.commit()
+    analytics_cache.bump(course_id=course_id)
     
     return jsonify({
         'status': 'success',
@@ -126,7 +131,11 @@ def delete_course_assignment(course_id, assignment_id):
     AssignmentSubmission.query.filter_by(assignment_id=assignment_id).delete()
     
     db.session.delete(assignment)
+    
+    # 课程作业总数变化，批量重算所有学生的进度
+    progress_engine.on_course_content_changed(course_id)
     db.session.commit()
+    analytics_cache.bump(course_id=course_id)
     
     return jsonify({
         'status': 'success',
@@ -134,19 +143,21 @@ def delete_course_assignment(course_id, assignment_id):
     })
 
 @api_bp.route('/courses/<int:course_id>/assignments/<int:assignment_id>/submissions', methods=['GET'])
+@query_budget(3)
 def get_assignment_submissions(course_id, assignment_id):
     """获取作业的所有提交"""
     assignment = Assignment.query.filter_by(id=assignment_id, course_id=course_id).first_or_404()
     
     # 获取所有提交
-    submissions = AssignmentSubmission.query.filter_by(assignment_id=assignment_id).all()
+    submissions = AssignmentSubmission.query.options(*SUBMISSION_OPTIONS) \
+        .filter_by(assignment_id=assignment_id).all()
     
     # 获取课程学生总数
-    total_students = assignment.course.students.count()
+    total_students = assignment.course.student_count
     
     return jsonify({
         'status': 'success',
-        'submissions': [submission.to_dict() for submission in submissions],
+        'submissions': serialize_submissions(submissions),
         'total_students': total_students
     })
 
@@ -226,11 +237,10 @@ def submit_assignment(course_id, assignment_id):
             
         existing_submission.submit_time = datetime.utcnow()
         
+        # 重新提交不改变进度计数，只确保进度记录存在
+        progress_engine.get_or_create_progress(user_id, course_id)
         db.session.commit()
-        
-        # 更新课程进度
-        from .progress import update_course_progress
-        update_course_progress(user_id, course_id)
+        analytics_cache.bump(course_id=course_id, user_id=user_id)
         
         return jsonify({
             'status': 'success',
@@ -248,11 +258,13 @@ def submit_assignment(course_id, assignment_id):
         )
         
         db.session.add(new_submission)
-        db.session.commit()
+        db.session.flush()
         
-        # 更新课程进度
-        from .progress import update_course_progress
-        update_course_progress(user_id, course_id)
+        # 在同一事务中按增量更新提交数和课程进度
+        counters.submission_added(assignment_id)
+        progress_engine.on_submission_created(user_id, course_id)
+        db.session.commit()
+        analytics_cache.bump(course_id=course_id, user_id=user_id)
         
         return jsonify({
             'status': 'success',
@@ -282,6 +294,7 @@ def grade_assignment(course_id, assignment_id, submission_id):
     submission.graded_at = datetime.utcnow()
     
     db.session.commit()
+    analytics_cache.bump(course_id=course_id, user_id=submission.user_id)
     
     return jsonify({
         'status': 'success',
@@ -84,11 +84,14 @@ def login():
         }), 401
     
     # 生成Token
+    now = datetime.utcnow()
     token_payload = {
         'user_id': user.id,
         'account': user.account,
+        'username': user.username,
         'role': user.role,
-        'exp': datetime.utcnow() + timedelta(days=1)
+        'iat': now,
+        'exp': now + timedelta(days=1)
     }
     
     token = jwt.encode(token_payload, SECRET_KEY, algorithm='HS256')
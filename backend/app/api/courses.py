@@ -1,20 +1,29 @@
 from flask import jsonify, request
 from . import api_bp
 from ..models import Course, User, CourseProgress
-from .. import db
+from .. import db, analytics_cache
+from ..services.cache import table_tag
+from ..services import counters, enrollment, sketches
+from ..services.serializers import COURSE_OPTIONS, serialize_courses
+from ..utils.etag import etag_versions
+from ..utils.query_budget import query_budget
 from datetime import datetime
 from sqlalchemy import or_
+import io
 
 @api_bp.route('/courses', methods=['GET'])
+@query_budget(1)
+@etag_versions(lambda: [table_tag('courses'), table_tag('course_students'), table_tag('users')])
 def get_courses():
     """获取所有课程"""
-    courses = Course.query.all()
+    courses = Course.query.options(*COURSE_OPTIONS).all()
     return jsonify({
         'status': 'success',
-        'courses': [course.to_dict() for course in courses]
+        'courses': serialize_courses(courses)
     })
 
 @api_bp.route('/courses/<int:course_id>', methods=['GET'])
+@query_budget(2)
 def get_course(course_id):
     """获取单个课程"""
     course = Course.query.get_or_404(course_id)
@@ -100,6 +109,7 @@ def delete_course(course_id):
     course = Course.query.get_or_404(course_id)
     db.session.delete(course)
     db.session.commit()
+    analytics_cache.bump(course_id=course_id)
     
     return jsonify({
         'status': 'success',
@@ -119,7 +129,10 @@ def enroll_student(course_id, user_id):
         }), 400
     
     course.students.append(user)
+    counters.students_enrolled(course_id)
+    sketches.students_enrolled(course_id, [user_id])
     db.session.commit()
+    analytics_cache.bump(course_id=course_id, user_id=user_id)
     
     return jsonify({
         'status': 'success',
@@ -139,38 +152,65 @@ def batch_enroll_students(course_id):
             'message': '未提供学生ID列表'
         }), 400
     
-    # 统计结果
-    success_count = 0
-    already_enrolled_count = 0
-    failed_ids = []
-    
-    for student_id in student_ids:
-        try:
-            student = User.query.filter_by(id=student_id, role='student').first()
-            if not student:
-                failed_ids.append(student_id)
-                continue
-                
-            if student in course.students:
-                already_enrolled_count += 1
-                continue
-                
-            course.students.append(student)
-            success_count += 1
-        except Exception as e:
-            failed_ids.append(student_id)
+    results, new_user_ids = enrollment.enroll_students(course_id, student_ids)
+    db.session.commit()
+    analytics_cache.bump(course_id=course_id, user_ids=new_user_ids)
+    
+    return batch_enroll_response(results)
+
+@api_bp.route('/courses/<int:course_id>/batch-enroll/csv', methods=['POST'])
+def batch_enroll_students_csv(course_id):
+    """上传CSV名单批量选课
+
+    以 multipart 表单的 file 字段或 text/csv 请求体上传，边读取边按块写入；
+    表头含 student_id/id 列时按用户ID匹配，含 account 列时按账号匹配，无表头时第一列为用户ID
+    """
+    course = Course.query.get_or_404(course_id)
+    
+    if 'file' in request.files:
+        stream = request.files['file'].stream
+    elif request.mimetype == 'text/csv':
+        stream = request.stream
+    else:
+        return jsonify({
+            'status': 'error',
+            'message': '未上传名单文件'
+        }), 400
+    
+    try:
+        by, keys = enrollment.read_roster_csv(io.TextIOWrapper(stream, encoding='utf-8-sig', newline=''))
+        results, new_user_ids = enrollment.enroll_students(course_id, keys, by=by)
+    except UnicodeDecodeError:
+        db.session.rollback()
+        return jsonify({
+            'status': 'error',
+            'message': '名单文件须为UTF-8编码'
+        }), 400
     
     db.session.commit()
+    analytics_cache.bump(course_id=course_id, user_ids=new_user_ids)
+    
+    return batch_enroll_response(results)
+
+def batch_enroll_response(results):
+    """汇总批量选课结果，保留原有的计数字段并附带逐条结果"""
+    success_count = sum(1 for result in results if result['status'] == enrollment.ENROLLED)
+    already_enrolled_count = sum(1 for result in results
+                                 if result['status'] in (enrollment.ALREADY_ENROLLED, enrollment.DUPLICATE))
+    failed_ids = [result['student_id'] for result in results
+                  if result['status'] in (enrollment.NOT_FOUND, enrollment.INVALID)]
     
     return jsonify({
         'status': 'success',
         'message': f'批量添加完成: {success_count}个学生添加成功, {already_enrolled_count}个学生已在课程中, {len(failed_ids)}个添加失败',
         'success_count': success_count,
         'already_enrolled_count': already_enrolled_count,
-        'failed_ids': failed_ids
+        'failed_ids': failed_ids,
+        'results': results
     })
 
 @api_bp.route('/courses/<int:course_id>/students', methods=['GET'])
+@query_budget(2)
 def get_course_students(course_id):
     """获取课程的所有学生"""
     course = Course.query.get_or_404(course_id)
@@ -227,7 +267,10 @@ def drop_student(course_id, user_id):
         }), 400
     
     course.students.remove(user)
+    counters.students_dropped(course_id)
+    sketches.students_dropped(course_id, [user_id])
     db.session.commit()
+    analytics_cache.bump(course_id=course_id, user_id=user_id)
     
     return jsonify({
         'status': 'success',
@@ -235,26 +278,23 @@ def drop_student(course_id, user_id):
     })
 
 @api_bp.route('/users/<int:user_id>/courses', methods=['GET'])
+@query_budget(3)
 def get_user_courses(user_id):
     """获取用户选修的所有课程"""
     user = User.query.get_or_404(user_id)
     
     # 根据用户角色返回不同类型的课程
     if user.role == 'teacher':
-        courses = Course.query.filter_by(instructor_id=user_id).all()
-        course_list = [course.to_dict() for course in courses]
+        courses = Course.query.options(*COURSE_OPTIONS).filter_by(instructor_id=user_id).all()
+        course_list = serialize_courses(courses)
     else:
-        courses = user.enrolled_courses
-        course_list = []
-        for course in courses:
-            course_dict = course.to_dict()
-            # 查询该用户在该课程的进度
-            progress = CourseProgress.query.filter_by(user_id=user_id, course_id=course.id).first()
-            if progress:
-                course_dict['progress'] = progress.progress_percent
-            else:
-                course_dict['progress'] = 0
-            course_list.append(course_dict)
+        courses = user.enrolled_courses.options(*COURSE_OPTIONS).all()
+        # 一次查询该用户在所有课程的进度
+        progress_map = dict(db.session.query(CourseProgress.course_id, CourseProgress.progress_percent)
+                            .filter(CourseProgress.user_id == user_id).all())
+        course_list = serialize_courses(courses)
+        for course_dict in course_list:
+            course_dict['progress'] = progress_map.get(course_dict['id']) or 0
     
     return jsonify({
         'status': 'success',
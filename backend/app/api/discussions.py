@@ -2,30 +2,42 @@ from flask import jsonify, request
 from . import api_bp
 from ..models import Course, User, Discussion, DiscussionReply
 from .. import db
+from ..services.cache import table_tag
+from ..services import counters
+from ..services.serializers import DISCUSSION_OPTIONS, serialize_discussions, serialize_discussion_with_replies
+from ..utils.etag import etag_versions
+from ..utils.query_budget import query_budget
 from datetime import datetime
 
 @api_bp.route('/courses/<int:course_id>/discussions', methods=['GET'])
+@query_budget(2)
+@etag_versions(lambda course_id: [
+    table_tag('courses', course_id), table_tag('discussions', course_id),
+    table_tag('discussion_replies'), table_tag('users')
+])
 def get_course_discussions(course_id):
     """获取课程的所有讨论话题"""
     course = Course.query.get_or_404(course_id)
     
     # 获取讨论列表，置顶的排在前面，然后按创建时间倒序排列
-    discussions = Discussion.query.filter_by(course_id=course_id) \
+    discussions = Discussion.query.options(*DISCUSSION_OPTIONS).filter_by(course_id=course_id) \
         .order_by(Discussion.is_pinned.desc(), Discussion.created_at.desc()).all()
     
     return jsonify({
         'status': 'success',
-        'discussions': [discussion.to_dict() for discussion in discussions]
+        'discussions': serialize_discussions(discussions)
     })
 
 @api_bp.route('/courses/<int:course_id>/discussions/<int:discussion_id>', methods=['GET'])
+@query_budget(2)
 def get_course_discussion(course_id, discussion_id):
     """获取课程的特定讨论话题及其回复"""
-    discussion = Discussion.query.filter_by(id=discussion_id, course_id=course_id).first_or_404()
+    discussion = Discussion.query.options(*DISCUSSION_OPTIONS) \
+        .filter_by(id=discussion_id, course_id=course_id).first_or_404()
     
     return jsonify({
         'status': 'success',
-        'discussion': discussion.to_dict_with_replies()
+        'discussion': serialize_discussion_with_replies(discussion)
     })
 
 @api_bp.route('/courses/<int:course_id>/discussions', methods=['POST'])
@@ -129,6 +141,7 @@ def create_discussion_reply(course_id, discussion_id):
     )
     
     db.session.add(new_reply)
+    counters.reply_added(discussion_id)
     db.session.commit()
     
     return jsonify({
@@ -171,6 +184,7 @@ def delete_discussion_reply(reply_id):
     
     # 可以添加权限检查
     
+    counters.reply_removed(reply.discussion_id)
     db.session.delete(reply)
     db.session.commit()
     
@@ -1,7 +1,12 @@
-from flask import jsonify, request
+from flask import jsonify, request, Response, stream_with_context
 from . import api_bp
 from ..models import GradeSetting, StudentGrade, Course, User
-from .. import db
+from .. import db, analytics_cache
+from ..services import gradebook
+from ..services.cache import table_tag
+from ..utils.etag import etag_versions
+from ..utils.query_budget import query_budget
+from sqlalchemy.orm import joinedload
 
 @api_bp.route('/courses/<int:course_id>/grade-settings', methods=['GET'])
 def get_grade_settings(course_id):
@@ -65,6 +70,7 @@ def update_grade_settings(course_id):
     
     # 更新所有学生的总评成绩
     update_all_total_scores(course_id)
+    analytics_cache.bump(course_id=course_id)
     
     return jsonify({
         'status': 'success',
@@ -142,6 +148,7 @@ def update_student_grade(course_id, student_id):
         grade.total_score = grade.calculate_total_score(settings)
     
     db.session.commit()
+    analytics_cache.bump(course_id=course_id, user_id=student_id)
     
     return jsonify({
         'status': 'success',
@@ -150,6 +157,11 @@ def update_student_grade(course_id, student_id):
     })
 
 @api_bp.route('/courses/<int:course_id>/grades', methods=['GET'])
+@query_budget(4)
+@etag_versions(lambda course_id: [
+    table_tag('courses', course_id), table_tag('student_grades', course_id),
+    table_tag('grade_settings', course_id), table_tag('course_students'), table_tag('users')
+])
 def get_course_grades(course_id):
     """获取课程所有学生的成绩"""
     course = Course.query.get_or_404(course_id)
@@ -204,6 +216,40 @@ def get_course_grades(course_id):
         'settings': settings.to_dict()
     })
 
+@api_bp.route('/courses/<int:course_id>/grades/export', methods=['GET'])
+def export_course_grades(course_id):
+    """流式导出课程成绩单
+
+    查询参数:
+    - format: csv（默认）或 ndjson
+    - include_total=1: 附加按当前成绩比重计算的总评 computed_total
+    - include_weights=1: 附加期末与平时成绩比重
+    """
+    course = Course.query.get_or_404(course_id)
+    
+    export_format = request.args.get('format', 'csv')
+    if export_format not in ('csv', 'ndjson'):
+        return jsonify({
+            'status': 'error',
+            'message': '不支持的导出格式'
+        }), 400
+    
+    include_total = request.args.get('include_total') == '1'
+    include_weights = request.args.get('include_weights') == '1'
+    batches = gradebook.iter_gradebook_batches(course_id, include_total, include_weights)
+    
+    if export_format == 'csv':
+        columns = gradebook.export_columns(include_total, include_weights)
+        body = gradebook.iter_csv(batches, columns)
+        mimetype = 'text/csv'
+    else:
+        body = gradebook.iter_ndjson(batches)
+        mimetype = 'application/x-ndjson'
+    
+    response = Response(stream_with_context(body), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename=course_{course_id}_grades.{export_format}'
+    return response
+
 @api_bp.route('/courses/<int:course_id>/grades/batch', methods=['POST'])
 def batch_update_grades(course_id):
     """批量更新学生成绩"""
@@ -220,57 +266,16 @@ def batch_update_grades(course_id):
     # 获取课程成绩设置
     settings = GradeSetting.query.filter_by(course_id=course_id).first()
     if not settings:
-        settings = GradeSetting(course_id=course_id)
+        settings = GradeSetting(course_id=course_id,
+                                final_exam_weight=gradebook.DEFAULT_FINAL_EXAM_WEIGHT,
+                                regular_grade_weight=gradebook.DEFAULT_REGULAR_GRADE_WEIGHT)
         db.session.add(settings)
     
-    # 统计结果
-    success_count = 0
-    failed_ids = []
-    
-    for grade_data in grades_data:
-        try:
-            student_id = grade_data.get('user_id')
-            if not student_id:
-                continue
-                
-            # 检查学生是否存在
-            student = User.query.get(student_id)
-            if not student:
-                failed_ids.append(student_id)
-                continue
-            
-            grade = StudentGrade.query.filter_by(course_id=course_id, user_id=student_id).first()
-            
-            if not grade:
-                # 创建新成绩记录
-                grade = StudentGrade(
-                    course_id=course_id,
-                    user_id=student_id,
-                    final_exam_score=grade_data.get('final_exam_score'),
-                    regular_grade=grade_data.get('regular_grade'),
-                    comment=grade_data.get('comment')
-                )
-                db.session.add(grade)
-            else:
-                # 更新现有成绩记录
-                if 'final_exam_score' in grade_data:
-                    grade.final_exam_score = grade_data['final_exam_score']
-                if 'regular_grade' in grade_data:
-                    grade.regular_grade = grade_data['regular_grade']
-                if 'comment' in grade_data:
-                    grade.comment = grade_data['comment']
-            
-            # 计算总评成绩
-            if grade.final_exam_score is not None and grade.regular_grade is not None:
-                grade.total_score = grade.calculate_total_score(settings)
-            
-            success_count += 1
-            
-        except Exception as e:
-            if student_id:
-                failed_ids.append(student_id)
+    # 一次读取现有成绩，批量计算总评后用一条upsert语句写回
+    success_count, failed_ids = gradebook.upsert_course_grades(course_id, grades_data, settings)
     
     db.session.commit()
+    analytics_cache.bump(course_id=course_id)
     
     return jsonify({
         'status': 'success',
@@ -280,6 +285,7 @@ def batch_update_grades(course_id):
     })
 
 @api_bp.route('/users/<int:user_id>/grades', methods=['GET'])
+@query_budget(4)
 def get_user_grades(user_id):
     """获取用户在所有课程中的成绩"""
     user = User.query.get_or_404(user_id)
@@ -287,13 +293,19 @@ def get_user_grades(user_id):
     # 查询用户的所有成绩
     grades = StudentGrade.query.filter_by(user_id=user_id).all()
     
-    # 获取用户选修的所有课程
-    courses = user.enrolled_courses.all()
+    # 获取用户选修的所有课程及其教师
+    courses = user.enrolled_courses.options(joinedload(Course.instructor)).all()
     course_ids = [course.id for course in courses]
     
     # 创建课程ID到成绩的映射
     grades_map = {grade.course_id: grade for grade in grades}
     
+    # 一次查询所有课程的成绩设置，每门课程取最早的一条
+    settings_map = {}
+    if course_ids:
+        for settings in GradeSetting.query.filter(GradeSetting.course_id.in_(course_ids)).order_by(GradeSetting.id):
+            settings_map.setdefault(settings.course_id, settings)
+    
     # 准备结果数据
     results = []
     for course in courses:
@@ -321,7 +333,7 @@ def get_user_grades(user_id):
         }
         
         # 获取课程成绩设置
-        settings = GradeSetting.query.filter_by(course_id=course.id).first()
+        settings = settings_map.get(course.id)
         if settings:
             grade_data['settings'] = settings.to_dict()
         else:
@@ -339,16 +351,5 @@ def get_user_grades(user_id):
 
 def update_all_total_scores(course_id):
     """更新课程中所有学生的总评成绩"""
-    # 获取课程成绩设置
-    settings = GradeSetting.query.filter_by(course_id=course_id).first()
-    if not settings:
-        return
-    
-    # 获取所有学生的成绩记录
-    grades = StudentGrade.query.filter_by(course_id=course_id).all()
-    
-    for grade in grades:
-        if grade.final_exam_score is not None and grade.regular_grade is not None:
-            grade.total_score = grade.calculate_total_score(settings)
-    
-    db.session.commit() 
\ No newline at end of file
+    gradebook.recompute_total_scores([course_id])
+    db.session.commit()
@@ -1,7 +1,11 @@
 from flask import jsonify, request, url_for, current_app
 from . import api_bp
 from ..models import CourseSection, CourseResource, Course, ResourceProgress
-from .. import db
+from .. import db, analytics_cache
+from ..services import progress_engine
+from ..services.cache import table_tag
+from ..utils.etag import etag_versions
+from ..utils.query_budget import query_budget
 import os
 from werkzeug.utils import secure_filename
 import uuid
@@ -64,6 +68,8 @@ def upload_file():
         }), 400
 
 @api_bp.route('/courses/<int:course_id>/sections', methods=['GET'])
+@query_budget(2)
+@etag_versions(lambda course_id: [table_tag('courses', course_id), table_tag('course_sections', course_id)])
 def get_course_sections(course_id):
     """获取课程的所有章节"""
     course = Course.query.get_or_404(course_id)
@@ -75,6 +81,7 @@ def get_course_sections(course_id):
     })
 
 @api_bp.route('/courses/<int:course_id>/sections/<int:section_id>', methods=['GET'])
+@query_budget(3)
 def get_course_section(course_id, section_id):
     """获取课程章节详情和资源"""
     course = Course.query.get_or_404(course_id)
@@ -141,7 +148,11 @@ def delete_course_section(course_id, section_id):
     CourseResource.query.filter_by(section_id=section_id).delete()
     
     db.session.delete(section)
+    
+    # 课程资源总数变化，批量重算所有学生的进度
+    progress_engine.on_course_content_changed(course_id)
     db.session.commit()
+    analytics_cache.bump(course_id=course_id)
     
     return jsonify({
         'status': 'success',
@@ -149,6 +160,7 @@ def delete_course_section(course_id, section_id):
     })
 
 @api_bp.route('/sections/<int:section_id>/resources', methods=['GET'])
+@query_budget(2)
 def get_section_resources(section_id):
     """获取章节的所有资源"""
     section = CourseSection.query.get_or_404(section_id)
@@ -191,7 +203,11 @@ def create_section_resource(section_id):
     )
     
     db.session.add(resource)
+    
+    # 课程资源总数变化，批量重算所有学生的进度
+    progress_engine.on_course_content_changed(section.course_id)
     db.session.commit()
+    analytics_cache.bump(course_id=section.course_id)
     
     return jsonify({
         'status': 'success',
@@ -236,11 +252,17 @@ def delete_section_resource(section_id, resource_id):
     """删除章节资源"""
     resource = CourseResource.query.filter_by(id=resource_id, section_id=section_id).first_or_404()
     
+    course_id = resource.section.course_id
+    
     # 首先删除与该资源相关的所有进度记录
     ResourceProgress.query.filter_by(resource_id=resource_id).delete()
     
     db.session.delete(resource)
+    
+    # 课程资源总数变化，批量重算所有学生的进度
+    progress_engine.on_course_content_changed(course_id)
     db.session.commit()
+    analytics_cache.bump(course_id=course_id)
     
     return jsonify({
         'status': 'success',
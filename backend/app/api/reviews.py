@@ -2,29 +2,31 @@ from flask import jsonify, request
 from . import api_bp
 from ..models import CourseReview, User, Course
 from .. import db
+from ..services.serializers import REVIEW_OPTIONS, serialize_reviews
+from ..utils.query_budget import query_budget
 from sqlalchemy.sql import func
 
 @api_bp.route('/courses/<int:course_id>/reviews', methods=['GET'])
+@query_budget(3)
 def get_course_reviews(course_id):
     """获取课程的所有评价"""
     course = Course.query.get_or_404(course_id)
     
     # 获取课程评价
-    reviews = CourseReview.query.filter_by(course_id=course_id).all()
+    reviews = CourseReview.query.options(*REVIEW_OPTIONS).filter_by(course_id=course_id).all()
     
-    # 计算平均评分
-    avg_rating = db.session.query(func.avg(CourseReview.rating))\
-        .filter(CourseReview.course_id == course_id).scalar() or 0
-    
-    # 统计各个评分的数量
-    rating_counts = {}
-    for i in range(1, 6):
-        count = CourseReview.query.filter_by(course_id=course_id, rating=i).count()
-        rating_counts[str(i)] = count
+    # 一次分组查询统计各个评分的数量，平均评分由分组结果计算
+    counts_by_rating = dict(db.session.query(CourseReview.rating, func.count(CourseReview.id))
+                            .filter(CourseReview.course_id == course_id)
+                            .group_by(CourseReview.rating).all())
+    rating_total = sum(counts_by_rating.values())
+    avg_rating = sum(rating * count for rating, count in counts_by_rating.items()) / rating_total \
+        if rating_total else 0
+    rating_counts = {str(i): counts_by_rating.get(i, 0) for i in range(1, 6)}
     
     return jsonify({
         'status': 'success',
-        'reviews': [review.to_dict() for review in reviews],
+        'reviews': serialize_reviews(reviews),
         'stats': {
             'average_rating': round(float(avg_rating), 1),
             'review_count': len(reviews),
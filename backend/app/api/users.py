@@ -2,6 +2,8 @@ from flask import jsonify, request, current_app
 from . import api_bp
 from ..models import User
 from .. import db
+from ..services import counters, sketches
+from ..utils.auth import invalidate_principal
 import os
 from werkzeug.utils import secure_filename
 import uuid
@@ -68,6 +70,7 @@ def update_user(user_id):
         user.bio = data['bio']
     
     db.session.commit()
+    invalidate_principal(user.id)
     return jsonify({
         'status': 'success',
         'message': '用户更新成功',
@@ -129,8 +132,11 @@ def upload_avatar(user_id):
 def delete_user(user_id):
     """删除用户"""
     user = User.query.get_or_404(user_id)
+    counters.user_removed(user_id)
+    sketches.user_removed(user_id)
     db.session.delete(user)
     db.session.commit()
+    invalidate_principal(user_id)
     return jsonify({
         'status': 'success',
         'message': '用户删除成功'
@@ -0,0 +1,137 @@
+import click
+from flask.cli import AppGroup
+
+# 学习活动日汇总维护命令：flask --app run rollups <command>
+rollups_cli = AppGroup('rollups', help='学习活动日汇总维护')
+
+
+@rollups_cli.command('backfill')
+def backfill_rollups_command():
+    """根据现有活动记录重建日汇总表，以及随日汇总一起维护的分位数草图和排行计数"""
+    from .services.rollups import backfill_rollups
+    from .services.sketches import rebuild_sketches
+    from .services.leaderboards import rebuild_leaderboards
+
+    count = backfill_rollups()
+    click.echo(f'已重建 {count} 条日汇总记录')
+    count = rebuild_sketches()
+    click.echo(f'已重建 {count} 个分位数草图分桶')
+    count = rebuild_leaderboards()
+    click.echo(f'已重建 {count} 条排行计数')
+
+
+# 分位数草图维护命令：flask --app run sketches <command>
+sketches_cli = AppGroup('sketches', help='课程分位数草图维护')
+
+
+@sketches_cli.command('rebuild')
+def rebuild_sketches_command():
+    """根据活动记录和日汇总重建课程分位数草图"""
+    from .services.sketches import rebuild_sketches
+
+    count = rebuild_sketches()
+    click.echo(f'已重建 {count} 个分位数草图分桶')
+
+
+# 活动排行计数维护命令：flask --app run leaderboards <command>
+leaderboards_cli = AppGroup('leaderboards', help='活动排行计数维护')
+
+
+@leaderboards_cli.command('rebuild')
+def rebuild_leaderboards_command():
+    """根据活动记录重建课程和学生的活动排行计数"""
+    from .services.leaderboards import rebuild_leaderboards
+
+    count = rebuild_leaderboards()
+    click.echo(f'已重建 {count} 条排行计数')
+
+
+# 课程进度计数维护命令：flask --app run progress <command>
+progress_cli = AppGroup('progress', help='课程进度计数维护')
+
+
+@progress_cli.command('check')
+@click.option('--course-id', type=int, default=None, help='只检查指定课程')
+@click.option('--fix', is_flag=True, help='将不一致的计数修正为全量重算结果')
+def check_progress_command(course_id, fix):
+    """对比进度计数与全量重算结果"""
+    from .services.progress_engine import check_progress_consistency
+
+    drift = check_progress_consistency(course_id, fix=fix)
+    for item in drift:
+        click.echo(f"用户{item['user_id']} 课程{item['course_id']}: "
+                   f"当前 {item['actual']} / 期望 {item['expected']}")
+    if not drift:
+        click.echo('进度计数与全量重算结果一致')
+    elif fix:
+        click.echo(f'已修正 {len(drift)} 条进度记录')
+    else:
+        click.echo(f'发现 {len(drift)} 条不一致的进度记录，可使用 --fix 修正')
+
+
+@progress_cli.command('recompute')
+@click.option('--course-id', type=int, default=None, help='只重算指定课程，默认重算全部课程')
+def recompute_progress_command(course_id):
+    """批量重算课程内所有学生的进度"""
+    from . import db
+    from .models import Course
+    from .services.progress_engine import recompute_course_progress
+
+    if course_id is not None:
+        course_ids = [course_id]
+    else:
+        course_ids = [cid for (cid,) in db.session.query(Course.id).all()]
+
+    total = 0
+    for cid in course_ids:
+        total += recompute_course_progress(cid)
+        db.session.commit()
+    click.echo(f'已重算 {len(course_ids)} 门课程的 {total} 条进度记录')
+
+
+# 反范式计数维护命令：flask --app run counters <command>
+counters_cli = AppGroup('counters', help='选课人数、回复数、提交数计数维护')
+
+
+@counters_cli.command('reconcile')
+@click.option('--fix', is_flag=True, help='将不一致的计数修正为实际数量')
+def reconcile_counters_command(fix):
+    """对比计数列与明细表中的实际数量"""
+    from .services.counters import check_counters
+
+    drift = check_counters(fix=fix)
+    for item in drift:
+        click.echo(f"{item['counter']} #{item['id']}: 当前 {item['actual']} / 实际 {item['expected']}")
+    if not drift:
+        click.echo('计数与明细数据一致')
+    elif fix:
+        click.echo(f'已修正 {len(drift)} 条计数')
+    else:
+        click.echo(f'发现 {len(drift)} 条不一致的计数，可使用 --fix 修正')
+
+
+# 活动写缓冲维护命令：flask --app run ingest <command>
+ingest_cli = AppGroup('ingest', help='活动写缓冲维护')
+
+
+@ingest_cli.command('recover')
+def recover_spool_command():
+    """将已退出进程残留的spool文件写入数据库"""
+    from . import activity_buffer
+    from .services.ingest_buffer import RecoveryIncomplete
+
+    try:
+        count = activity_buffer.recover()
+    except RecoveryIncomplete as e:
+        raise click.ClickException(f'数据库不可用，恢复未完成：{e}')
+    click.echo(f'已恢复 {count} 条活动事件')
+
+
+def register_commands(app):
+    """注册自定义命令行命令"""
+    app.cli.add_command(rollups_cli)
+    app.cli.add_command(sketches_cli)
+    app.cli.add_command(leaderboards_cli)
+    app.cli.add_command(progress_cli)
+    app.cli.add_command(counters_cli)
+    app.cli.add_command(ingest_cli)
@@ -1,7 +1,7 @@
 # 导入所有模型
 from .user import User
 from .course import Course
-from .activity import Activity
+from .activity import Activity, ActivityDailyRollup, CourseQuantileSketch, CourseUserActivityCount
 from .resource import CourseSection, CourseResource
 from .progress import CourseProgress, ResourceProgress
 from .feedback import CourseReview
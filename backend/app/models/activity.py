@@ -17,6 +17,15 @@ class Activity(db.Model):
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     data_json = db.Column(db.JSON)  # 其他元数据（如进度、正确答案数等），改名以避免冲突
 
+    # 与分析接口的查询条件对应的复合索引
+    __table_args__ = (
+        db.Index('ix_activities_course_user', 'course_id', 'user_id'),
+        db.Index('ix_activities_user_created', 'user_id', 'created_at'),
+        db.Index('ix_activities_course_created', 'course_id', 'created_at'),
+        db.Index('ix_activities_course_type', 'course_id', 'activity_type'),
+        db.Index('ix_activities_created_at', 'created_at'),
+    )
+
     def __repr__(self):
         return f'<Activity {self.id}: {self.activity_type}>'
 
@@ -33,4 +42,79 @@ class Activity(db.Model):
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None,
             'metadata': self.data_json
-        } 
\ No newline at end of file
+        } 
+
+class ActivityDailyRollup(db.Model):
+    """学习活动日汇总模型 - 按(日期, 用户, 课程, 活动类型)累计的活动统计"""
+    __tablename__ = 'activity_daily_rollups'
+
+    id = db.Column(db.Integer, primary_key=True)
+    date = db.Column(db.Date, nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    course_id = db.Column(db.Integer, db.ForeignKey('courses.id'), nullable=False)
+    activity_type = db.Column(db.String(50), nullable=False)
+    activity_count = db.Column(db.Integer, nullable=False, default=0)
+    duration_sum = db.Column(db.Integer, nullable=False, default=0)  # 持续时间总和（秒）
+    score_sum = db.Column(db.Float, nullable=False, default=0.0)  # 得分总和
+    score_count = db.Column(db.Integer, nullable=False, default=0)  # 有得分的活动数量，用于计算平均分
+    completed_count = db.Column(db.Integer, nullable=False, default=0)
+
+    # 每个(日期, 用户, 课程, 活动类型)只有一条汇总记录
+    __table_args__ = (
+        db.UniqueConstraint('date', 'user_id', 'course_id', 'activity_type', name='uq_activity_daily_rollup'),
+        db.Index('ix_activity_daily_rollups_user_date', 'user_id', 'date'),
+        db.Index('ix_activity_daily_rollups_course_date', 'course_id', 'date'),
+    )
+
+    def __repr__(self):
+        return f'<ActivityDailyRollup {self.date} {self.user_id}:{self.course_id} {self.activity_type} x{self.activity_count}>'
+
+    def to_dict(self):
+        return {
+            'date': self.date.isoformat() if self.date else None,
+            'user_id': self.user_id,
+            'course_id': self.course_id,
+            'activity_type': self.activity_type,
+            'activity_count': self.activity_count,
+            'duration_sum': self.duration_sum,
+            'score_sum': self.score_sum,
+            'score_count': self.score_count,
+            'completed_count': self.completed_count
+        }
+
+
+class CourseQuantileSketch(db.Model):
+    """课程分位数草图模型 - 按(课程, 指标, 分桶)累计的数值个数，用于O(1)估算中位数等分位数"""
+    __tablename__ = 'course_quantile_sketches'
+
+    id = db.Column(db.Integer, primary_key=True)
+    course_id = db.Column(db.Integer, db.ForeignKey('courses.id'), nullable=False)
+    metric = db.Column(db.String(50), nullable=False)  # activity_score, completion_rate
+    bin = db.Column(db.Integer, nullable=False)  # 数值 × services.sketches.BINS_PER_UNIT 四舍五入
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.UniqueConstraint('course_id', 'metric', 'bin', name='uq_course_quantile_sketch'),
+    )
+
+    def __repr__(self):
+        return f'<CourseQuantileSketch {self.course_id} {self.metric}[{self.bin}] x{self.count}>'
+
+
+class CourseUserActivityCount(db.Model):
+    """课程用户活动计数模型 - 每个用户在每门课程的活动数和完成数，用于最活跃学生排行和完成率草图"""
+    __tablename__ = 'course_user_activity_counts'
+
+    id = db.Column(db.Integer, primary_key=True)
+    course_id = db.Column(db.Integer, db.ForeignKey('courses.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    activity_count = db.Column(db.Integer, nullable=False, default=0)
+    completed_count = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.UniqueConstraint('course_id', 'user_id', name='uq_course_user_activity_count'),
+        db.Index('ix_course_user_activity_counts_rank', 'course_id', 'activity_count'),
+    )
+
+    def __repr__(self):
+        return f'<CourseUserActivityCount {self.course_id}:{self.user_id} x{self.activity_count}>'
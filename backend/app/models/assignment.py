@@ -15,6 +15,7 @@ class Assignment(db.Model):
     attachments = db.Column(JSON)  # 存储附件列表，包含文件名、路径等
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    submissions_count = db.Column(db.Integer, nullable=False, default=0)  # 提交数，由 services.counters 维护
     
     # 关系
     course = db.relationship('Course', backref=db.backref('assignments', lazy='dynamic'))
@@ -23,11 +24,14 @@ class Assignment(db.Model):
     def __repr__(self):
         return f'<Assignment {self.title}>'
     
-    def to_dict(self, user_id=None):
-        """返回作业字典表示，可选传入用户ID以返回针对该用户的作业状态"""
+    def to_dict(self, user_id=None, submitted=None):
+        """返回作业字典表示，可选传入用户ID以返回针对该用户的作业状态
+
+        该用户是否已提交（submitted）可由列表接口批量预先查询后传入，未传入时单独查询
+        """
         # 计算提交完成率
-        total_students = self.course.students.count()
-        submissions_count = self.submissions.count()
+        total_students = self.course.student_count
+        submissions_count = self.submissions_count
         completion_rate = (submissions_count / total_students * 100) if total_students > 0 else 0
         
         # 确定作业状态
@@ -42,8 +46,9 @@ class Assignment(db.Model):
             
         # 如果指定了用户ID，检查该用户的提交状态
         if user_id:
-            submission = self.submissions.filter_by(user_id=user_id).first()
-            if submission:
+            if submitted is None:
+                submitted = self.submissions.filter_by(user_id=user_id).first() is not None
+            if submitted:
                 # 用户已提交作业，标记为已完成
                 status = 'completed'
         
@@ -81,6 +86,11 @@ class AssignmentSubmission(db.Model):
     graded_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
     graded_at = db.Column(db.DateTime, nullable=True)
     
+    __table_args__ = (
+        db.Index('ix_assignment_submissions_assignment_user', 'assignment_id', 'user_id'),
+        db.Index('ix_assignment_submissions_user', 'user_id'),
+    )
+    
     # 关系
     user = db.relationship('User', foreign_keys=[user_id], backref=db.backref('submissions', lazy='dynamic'))
     grader = db.relationship('User', foreign_keys=[graded_by], backref=db.backref('graded_submissions', lazy='dynamic'))
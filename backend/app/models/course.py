@@ -21,6 +21,13 @@ class Course(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     status = db.Column(db.String(20), default='active')  # active, archived
+    student_count = db.Column(db.Integer, nullable=False, default=0)  # 选课人数，由 services.counters 维护
+    activity_count = db.Column(db.Integer, nullable=False, default=0)  # 活动数量，由 services.leaderboards 维护
+
+    # 最活跃课程排行按活动数量倒序读取
+    __table_args__ = (
+        db.Index('ix_courses_activity_count', 'activity_count'),
+    )
 
     # 关系
     instructor = db.relationship('User', backref='teaching_courses', foreign_keys=[instructor_id])
@@ -48,7 +55,7 @@ class Course(db.Model):
             'status': self.status,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None,
-            'student_count': self.students.count()
+            'student_count': self.student_count
         }
         
     def to_dict_with_students(self):
@@ -13,6 +13,7 @@ class Discussion(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     is_pinned = db.Column(db.Boolean, default=False)
+    replies_count = db.Column(db.Integer, nullable=False, default=0)  # 回复数，由 services.counters 维护
     
     # 关系
     course = db.relationship('Course', backref=db.backref('discussions', lazy='dynamic'))
@@ -38,7 +39,7 @@ class Discussion(db.Model):
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None,
             'is_pinned': self.is_pinned,
-            'replies_count': self.replies.count()
+            'replies_count': self.replies_count
         }
         
     def to_dict_with_replies(self):
@@ -9,6 +9,11 @@ class CourseProgress(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     course_id = db.Column(db.Integer, db.ForeignKey('courses.id'), nullable=False)
     progress_percent = db.Column(db.Float, default=0.0)  # 0-100
+    # 进度计数，由 services.progress_engine 按增量维护
+    completed_resources = db.Column(db.Integer, nullable=False, default=0)
+    total_resources = db.Column(db.Integer, nullable=False, default=0)
+    submitted_assignments = db.Column(db.Integer, nullable=False, default=0)
+    total_assignments = db.Column(db.Integer, nullable=False, default=0)
     last_activity_at = db.Column(db.DateTime, default=datetime.utcnow)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -16,6 +21,7 @@ class CourseProgress(db.Model):
     # 定义联合唯一约束，确保每个用户在每个课程中只有一条进度记录
     __table_args__ = (
         db.UniqueConstraint('user_id', 'course_id', name='uq_user_course_progress'),
+        db.Index('ix_course_progress_course', 'course_id', 'progress_percent'),
     )
 
     # 关系
@@ -31,6 +37,10 @@ class CourseProgress(db.Model):
             'user_id': self.user_id,
             'course_id': self.course_id,
             'progress_percent': self.progress_percent,
+            'completed_resources': self.completed_resources,
+            'total_resources': self.total_resources,
+            'submitted_assignments': self.submitted_assignments,
+            'total_assignments': self.total_assignments,
             'last_activity_at': self.last_activity_at.isoformat() if self.last_activity_at else None,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
@@ -54,6 +64,7 @@ class ResourceProgress(db.Model):
     # 定义联合唯一约束，确保每个用户对每个资源只有一条进度记录
     __table_args__ = (
         db.UniqueConstraint('user_id', 'resource_id', name='uq_user_resource_progress'),
+        db.Index('ix_resource_progress_resource', 'resource_id', 'completed'),
     )
 
     # 关系
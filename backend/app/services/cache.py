@@ -0,0 +1,327 @@
+"""
+分析接口响应缓存与数据版本号
+
+缓存键由 接口名 + 路由参数 + 查询参数 + 相关版本号 组成。
+写操作提交后调用 bump() 递增对应课程/用户的版本号，旧版本的缓存条目
+不会再被命中，随后由LRU淘汰或TTL过期清除。
+
+此外，每次事务提交后会按被修改的表（及行所属课程）自动递增表级版本号，
+供 utils.etag 计算条件响应的ETag。分析接口依赖的课程、选课名单和用户信息同样
+使用这些表级版本号（见 global_tags/course_tags），任何写入路径修改课程或用户后
+缓存自动失效；活动、进度等按课程/用户划分的统计数据仍由写路径调用 bump()。
+"""
+
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from functools import wraps
+from itertools import chain
+
+from flask import current_app, request, Response, has_app_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+GLOBAL_TAG = 'global'
+
+
+def course_tag(course_id):
+    return f'course:{course_id}'
+
+
+def user_tag(user_id):
+    return f'user:{user_id}'
+
+
+def table_tag(table, course_id=None):
+    """表级版本标签；传入 course_id 时为该表中属于该课程的行的版本标签"""
+    if course_id is None:
+        return f'table:{table}'
+    return f'table:{table}:course:{course_id}'
+
+
+# 课程、选课名单和用户信息的表级版本
+ENTITY_TAGS = (table_tag('courses'), table_tag('course_students'), table_tag('users'))
+
+
+def global_tags():
+    """全站分析接口的版本标签"""
+    return [GLOBAL_TAG, *ENTITY_TAGS]
+
+
+def course_tags(course_id, *tables):
+    """课程级分析接口的版本标签，tables 为响应还依赖的按课程划分的表"""
+    return [course_tag(course_id), table_tag('courses', course_id), table_tag('course_students'),
+            table_tag('users')] + [table_tag(table, course_id) for table in tables]
+
+
+class MemoryBackend:
+    """进程内缓存后端：LRU淘汰 + TTL过期，版本号单独保存不参与淘汰"""
+
+    # 版本号只在本进程内可见
+    shared = False
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._lock = threading.Lock()
+        # 版本号随进程重启归零，epoch 用于区分不同进程生命周期内的版本
+        self.epoch = uuid.uuid4().hex[:8]
+
+    def get(self, key):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at is not None and expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_versions(self, tags):
+        with self._lock:
+            return [self._versions.get(tag, 0) for tag in tags]
+
+    def incr_versions(self, tags):
+        with self._lock:
+            for tag in tags:
+                self._versions[tag] = self._versions.get(tag, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._versions.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class RedisBackend:
+    """多进程共享的缓存后端，需要安装redis并配置 ANALYTICS_CACHE_REDIS_URL
+
+    LRU淘汰交由Redis的 maxmemory-policy 处理
+    """
+
+    shared = True
+
+    def __init__(self, url, prefix='la:analytics:'):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError('使用 RedisBackend 需要先安装 redis: pip install redis')
+        self._client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self._client.setnx(prefix + 'epoch', uuid.uuid4().hex[:8])
+        self.epoch = self._client.get(prefix + 'epoch').decode()
+
+    def get(self, key):
+        return self._client.get(self.prefix + key)
+
+    def set(self, key, value, ttl=None):
+        self._client.set(self.prefix + key, value, ex=ttl or None)
+
+    def get_versions(self, tags):
+        values = self._client.mget([self.prefix + 'version:' + tag for tag in tags])
+        return [int(value) if value else 0 for value in values]
+
+    def incr_versions(self, tags):
+        pipe = self._client.pipeline()
+        for tag in tags:
+            pipe.incr(self.prefix + 'version:' + tag)
+        pipe.execute()
+
+    def clear(self):
+        keys = list(self._client.scan_iter(self.prefix + '*'))
+        if keys:
+            self._client.delete(*keys)
+
+
+class AnalyticsCache:
+    """分析接口缓存扩展，用法与 db、migrate 相同: analytics_cache.init_app(app)"""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('ANALYTICS_CACHE_ENABLED', True)
+        app.config.setdefault('ANALYTICS_CACHE_TTL', 60)
+        app.config.setdefault('ANALYTICS_CACHE_MAX_ENTRIES', 1024)
+        app.config.setdefault('ANALYTICS_CACHE_BACKEND', 'memory')
+        app.config.setdefault('ANALYTICS_CACHE_REDIS_URL', None)
+
+        backend = app.config['ANALYTICS_CACHE_BACKEND']
+        if backend == 'memory':
+            backend = MemoryBackend(app.config['ANALYTICS_CACHE_MAX_ENTRIES'])
+        elif backend == 'redis':
+            backend = RedisBackend(app.config['ANALYTICS_CACHE_REDIS_URL'])
+
+        if app.config.get('ETAG_ENABLED') and not getattr(backend, 'shared', False):
+            logger.warning('ETAG_ENABLED 使用的缓存后端不在进程间共享，多进程部署时其他进程的写入不会使本进程的ETag失效，'
+                           'ETag 将每 %s 秒轮换一次；请改用 ANALYTICS_CACHE_BACKEND=redis',
+                           app.config['ANALYTICS_CACHE_TTL'])
+
+        app.extensions['analytics_cache'] = {
+            'backend': backend,
+            'stats': {'hits': 0, 'misses': 0, 'bumps': 0},
+            'lock': threading.Lock()
+        }
+
+        _register_change_tracking()
+
+    @property
+    def _state(self):
+        return current_app.extensions['analytics_cache']
+
+    @property
+    def backend(self):
+        return self._state['backend']
+
+    def _count(self, name):
+        state = self._state
+        with state['lock']:
+            state['stats'][name] += 1
+
+    def stats(self):
+        state = self._state
+        with state['lock']:
+            stats = dict(state['stats'])
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else 0
+        if isinstance(self.backend, MemoryBackend):
+            stats['entries'] = len(self.backend)
+        return stats
+
+    def bump(self, course_id=None, user_id=None, course_ids=(), user_ids=()):
+        """写操作提交后调用，使相关课程、用户及全局的缓存失效
+
+        批量写入时通过 course_ids / user_ids 一次性传入涉及的全部课程和用户
+        """
+        if not current_app.config['ANALYTICS_CACHE_ENABLED']:
+            return
+        tags = [GLOBAL_TAG]
+        if course_id is not None:
+            tags.append(course_tag(course_id))
+        if user_id is not None:
+            tags.append(user_tag(user_id))
+        tags.extend(course_tag(cid) for cid in set(course_ids))
+        tags.extend(user_tag(uid) for uid in set(user_ids))
+        self.backend.incr_versions(tags)
+        self._count('bumps')
+
+    def clear(self):
+        self.backend.clear()
+
+    def cached(self, tags):
+        """缓存视图的JSON响应
+
+        tags 接收视图的路由参数，返回该响应依赖的版本标签列表
+        """
+        def decorator(f):
+            @wraps(f)
+            def decorated(*args, **kwargs):
+                if not current_app.config['ANALYTICS_CACHE_ENABLED']:
+                    return f(*args, **kwargs)
+
+                view_tags = tags(**kwargs)
+                versions = self.backend.get_versions(view_tags)
+                key = '|'.join([
+                    request.endpoint,
+                    ','.join(f'{k}={v}' for k, v in sorted(kwargs.items())),
+                    ','.join(f'{k}={v}' for k, v in sorted(request.args.items(multi=True))),
+                    ','.join(f'{tag}@{version}' for tag, version in zip(view_tags, versions))
+                ])
+
+                body = self.backend.get(key)
+                if body is not None:
+                    self._count('hits')
+                    return Response(body, mimetype='application/json')
+
+                self._count('misses')
+                response = current_app.make_response(f(*args, **kwargs))
+                if response.status_code == 200:
+                    self.backend.set(key, response.get_data(), current_app.config['ANALYTICS_CACHE_TTL'])
+                return response
+            return decorated
+        return decorator
+
+
+# ---- 表级版本号：根据会话中的写操作自动递增 ----
+
+_tracking_registered = False
+
+
+def _changed_tags(session):
+    return session.info.setdefault('changed_version_tags', set())
+
+
+def _collect_flushed_rows(session, flush_context):
+    """记录本次flush中新增、修改、删除的行所属的表和课程"""
+    tags = _changed_tags(session)
+    for obj in chain(session.new, session.dirty, session.deleted):
+        table = getattr(obj, '__tablename__', None)
+        if table is None:
+            continue
+        tags.add(table_tag(table))
+        course_id = obj.id if table == 'courses' else getattr(obj, 'course_id', None)
+        if course_id is not None:
+            tags.add(table_tag(table, course_id))
+
+
+def _collect_bulk_statements(orm_execute_state):
+    """批量 INSERT/UPDATE/DELETE 语句无法得知涉及的课程，只递增表级版本
+
+    只修改不影响任何响应内容的列（如内部计数）的语句可设置执行选项 version_tracking=False 跳过
+    """
+    if not orm_execute_state.execution_options.get('version_tracking', True):
+        return
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        table = getattr(orm_execute_state.statement, 'table', None)
+        if table is not None and hasattr(table, 'name'):
+            _changed_tags(orm_execute_state.session).add(table_tag(table.name))
+
+
+def mark_changed(session, table, course_ids=()):
+    """记录批量语句修改的表及所属课程，事务提交后递增对应版本号
+
+    批量语句只能自动递增表级版本，按课程划分的版本（如 table:student_grades:course:N）
+    需由执行语句的代码传入涉及的课程
+    """
+    tags = _changed_tags(session)
+    tags.add(table_tag(table))
+    tags.update(table_tag(table, course_id) for course_id in course_ids)
+
+
+def _publish_changed_tags(session):
+    tags = session.info.pop('changed_version_tags', None)
+    if tags and has_app_context() and 'analytics_cache' in current_app.extensions:
+        current_app.extensions['analytics_cache']['backend'].incr_versions(sorted(tags))
+
+
+def _discard_changed_tags(session):
+    session.info.pop('changed_version_tags', None)
+
+
+def _register_change_tracking():
+    global _tracking_registered
+    if _tracking_registered:
+        return
+    event.listen(Session, 'after_flush', _collect_flushed_rows)
+    event.listen(Session, 'do_orm_execute', _collect_bulk_statements)
+    event.listen(Session, 'after_commit', _publish_changed_tags)
+    event.listen(Session, 'after_rollback', _discard_changed_tags)
+    _tracking_registered = True
@@ -0,0 +1,89 @@
+"""
+反范式计数维护
+
+courses.student_count、discussions.replies_count、assignments.submissions_count
+在选课/退选、回复增删、作业提交的同一事务中用原子 UPDATE 累加，序列化时不再逐条 COUNT。
+绕过这些接口直接写库后，可用 flask counters reconcile 检查并修正偏差。
+"""
+
+from sqlalchemy import func
+
+from .. import db
+from ..models import Course, Discussion, DiscussionReply, Assignment, AssignmentSubmission, Activity
+from ..models.course import course_students
+
+# 计数名称 -> (模型, 计数列, 明细表中指向该模型的外键列)
+COUNTERS = {
+    'courses.student_count': (Course, Course.student_count, course_students.c.course_id),
+    # 由 services.leaderboards 在活动写入时维护
+    'courses.activity_count': (Course, Course.activity_count, Activity.course_id),
+    'discussions.replies_count': (Discussion, Discussion.replies_count, DiscussionReply.discussion_id),
+    'assignments.submissions_count': (Assignment, Assignment.submissions_count, AssignmentSubmission.assignment_id),
+}
+
+
+def _adjust(model, column, condition, delta):
+    """原子地累加计数，不提交事务"""
+    db.session.execute(
+        db.update(model).where(condition).values({column: column + delta}),
+        execution_options={'synchronize_session': 'fetch'}
+    )
+
+
+def students_enrolled(course_id, count=1):
+    if count:
+        _adjust(Course, Course.student_count, Course.id == course_id, count)
+
+
+def students_dropped(course_id, count=1):
+    if count:
+        _adjust(Course, Course.student_count, Course.id == course_id, -count)
+
+
+def user_removed(user_id):
+    """删除用户前调用，其选课记录会随用户一起删除"""
+    enrolled = db.select(course_students.c.course_id).where(course_students.c.user_id == user_id)
+    _adjust(Course, Course.student_count, Course.id.in_(enrolled), -1)
+
+
+def reply_added(discussion_id):
+    _adjust(Discussion, Discussion.replies_count, Discussion.id == discussion_id, 1)
+
+
+def reply_removed(discussion_id):
+    _adjust(Discussion, Discussion.replies_count, Discussion.id == discussion_id, -1)
+
+
+def submission_added(assignment_id):
+    _adjust(Assignment, Assignment.submissions_count, Assignment.id == assignment_id, 1)
+
+
+def _expected_count(model, foreign_key):
+    """与 model 行关联的明细数量（相关子查询）"""
+    return db.select(func.count()).select_from(foreign_key.table) \
+        .where(foreign_key == model.id) \
+        .correlate(model.__table__) \
+        .scalar_subquery()
+
+
+def check_counters(fix=False):
+    """将计数列与明细表实际数量对比，返回不一致的记录列表；fix=True 时修正并提交"""
+    drift = []
+    for name, (model, column, foreign_key) in COUNTERS.items():
+        expected = _expected_count(model, foreign_key)
+        rows = db.session.query(model.id, column, expected).filter(column != expected).all()
+        drift.extend({'counter': name, 'id': row_id, 'actual': actual, 'expected': count}
+                     for row_id, actual, count in rows)
+
+        if fix and rows:
+            db.session.execute(
+                db.update(model)
+                    .where(model.id.in_([row_id for row_id, _, _ in rows]))
+                    .values({column: expected}),
+                execution_options={'synchronize_session': False}
+            )
+
+    if fix and drift:
+        db.session.commit()
+
+    return drift
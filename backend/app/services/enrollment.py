@@ -0,0 +1,135 @@
+"""
+批量选课
+
+先一次查出课程现有名单，再按块（每块一条 IN 查询）校验学生并批量插入新的选课记录，
+查询数量只与名单长度/块大小有关，适合从教务系统导入数万人的名单。
+"""
+
+import csv
+from datetime import datetime
+from itertools import islice
+
+from .. import db
+from ..models import User
+from ..models.course import course_students
+from . import counters, sketches
+
+# 每条 IN 查询的参数个数上限（SQLite 默认最多 32766 个绑定参数）
+CHUNK_SIZE = 5000
+
+ENROLLED = 'enrolled'
+ALREADY_ENROLLED = 'already_enrolled'
+DUPLICATE = 'duplicate'
+NOT_FOUND = 'not_found'
+INVALID = 'invalid'
+
+
+def enrolled_user_ids(course_id):
+    """课程当前的学生ID集合"""
+    rows = db.session.execute(
+        db.select(course_students.c.user_id).where(course_students.c.course_id == course_id)
+    )
+    return {user_id for (user_id,) in rows}
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _resolve_students(keys, by):
+    """一次查询将一块学生ID或账号解析为 {key: user_id}"""
+    column = User.id if by == 'id' else User.account
+    rows = db.session.query(column, User.id) \
+        .filter(column.in_(keys), User.role == 'student') \
+        .all()
+    return dict(rows)
+
+
+def enroll_students(course_id, keys, by='id'):
+    """将一批学生加入课程，不提交事务
+
+    keys 可以是任意可迭代对象（如逐行读取的CSV），by='id' 按用户ID匹配、by='account' 按账号匹配。
+    返回 (与输入顺序一致的逐条结果 [{'student_id': key, 'status': ...}], 新加入课程的用户ID列表)
+    """
+    roster = enrolled_user_ids(course_id)
+    seen = set()
+    results = []
+    new_user_ids = []
+    now = datetime.utcnow()
+
+    for chunk in _chunks(keys, CHUNK_SIZE):
+        chunk_results = []
+        pending = []
+        for key in chunk:
+            if by == 'id':
+                try:
+                    key = int(key)
+                except (TypeError, ValueError):
+                    chunk_results.append({'student_id': key, 'status': INVALID})
+                    continue
+            elif not key:
+                chunk_results.append({'student_id': key, 'status': INVALID})
+                continue
+            if key in seen:
+                chunk_results.append({'student_id': key, 'status': DUPLICATE})
+                continue
+            seen.add(key)
+            result = {'student_id': key, 'status': None}
+            chunk_results.append(result)
+            pending.append(result)
+
+        user_ids = _resolve_students([result['student_id'] for result in pending], by) if pending else {}
+        rows = []
+        for result in pending:
+            user_id = user_ids.get(result['student_id'])
+            if user_id is None:
+                result['status'] = NOT_FOUND
+            elif user_id in roster:
+                result['status'] = ALREADY_ENROLLED
+            else:
+                result['status'] = ENROLLED
+                roster.add(user_id)
+                rows.append({'course_id': course_id, 'user_id': user_id, 'enrolled_at': now})
+        results.extend(chunk_results)
+
+        if rows:
+            db.session.execute(course_students.insert(), rows)
+            new_user_ids.extend(row['user_id'] for row in rows)
+
+    counters.students_enrolled(course_id, len(new_user_ids))
+    sketches.students_enrolled(course_id, new_user_ids)
+    return results, new_user_ids
+
+
+def read_roster_csv(stream):
+    """逐行读取名单CSV，返回 (匹配方式, 键的迭代器)
+
+    首行为表头时按 student_id/id 列匹配用户ID、按 account 列匹配账号；
+    没有可识别的表头时把每行第一列当作用户ID
+    """
+    reader = csv.reader(stream)
+    header = next(reader, None)
+    if header is None:
+        return 'id', iter(())
+
+    names = [name.strip().lower() for name in header]
+    for by, candidates in (('id', ('student_id', 'id')), ('account', ('account',))):
+        for candidate in candidates:
+            if candidate in names:
+                index = names.index(candidate)
+                return by, (row[index].strip() for row in reader if len(row) > index)
+
+    first = (row[0].strip() for row in reader if row)
+    if header:
+        first = _prepend(header[0].strip(), first)
+    return 'id', first
+
+
+def _prepend(value, iterator):
+    yield value
+    yield from iterator
@@ -0,0 +1,267 @@
+"""
+课程成绩单批量处理
+
+- 导出：按学生ID顺序用服务端游标（yield_per）分批读取 选课名单 + 成绩，逐批编码为 CSV 或 NDJSON，
+  配合流式响应使用时内存占用与课程人数无关
+- 批量录入：一次读出课程现有成绩，按列批量计算总评，再用一条 upsert 语句写回
+- 权重变更：用一条 UPDATE 语句在数据库中按各课程的成绩设置重算总评，可一次覆盖多门课程
+"""
+
+import csv
+import io
+import json
+from datetime import datetime
+from numbers import Real
+
+from .. import db
+from ..models import User, StudentGrade, GradeSetting
+from ..models.course import course_students
+from ..utils.upsert import upsert
+from .cache import mark_changed
+
+# 每批从数据库游标读取的行数
+EXPORT_BATCH_SIZE = 1000
+
+# 未设置成绩比重时的默认值，与 GradeSetting 的列默认值一致
+DEFAULT_FINAL_EXAM_WEIGHT = 60.0
+DEFAULT_REGULAR_GRADE_WEIGHT = 40.0
+
+BASE_COLUMNS = ['user_id', 'account', 'username', 'email',
+                'final_exam_score', 'regular_grade', 'total_score', 'comment']
+
+
+def grade_weights(course_id):
+    """课程的 (期末权重, 平时权重)，未设置时返回默认值"""
+    settings = GradeSetting.query.filter_by(course_id=course_id).first()
+    if not settings:
+        return DEFAULT_FINAL_EXAM_WEIGHT, DEFAULT_REGULAR_GRADE_WEIGHT
+    return settings.final_exam_weight, settings.regular_grade_weight
+
+
+def weighted_total(final_exam_score, regular_grade, final_weight, regular_weight):
+    """与 StudentGrade.calculate_total_score 相同的总评计算"""
+    if final_exam_score is None or regular_grade is None:
+        return None
+    return final_exam_score * (final_weight / 100) + regular_grade * (regular_weight / 100)
+
+
+def weighted_totals(final_exam_scores, regular_grades, final_weight, regular_weight):
+    """按列计算一组总评成绩，任一成绩为空时对应结果为None"""
+    final_factor = final_weight / 100
+    regular_factor = regular_weight / 100
+    return [
+        None if final is None or regular is None else final * final_factor + regular * regular_factor
+        for final, regular in zip(final_exam_scores, regular_grades)
+    ]
+
+
+def export_columns(include_total=False, include_weights=False):
+    columns = list(BASE_COLUMNS)
+    if include_total:
+        columns.append('computed_total')
+    if include_weights:
+        columns += ['final_exam_weight', 'regular_grade_weight']
+    return columns
+
+
+def iter_gradebook_batches(course_id, include_total=False, include_weights=False):
+    """逐批生成成绩单行（字典列表），未录入成绩的学生成绩列为空"""
+    final_weight, regular_weight = grade_weights(course_id)
+
+    stmt = db.select(
+            User.id, User.account, User.username, User.email,
+            StudentGrade.final_exam_score, StudentGrade.regular_grade,
+            StudentGrade.total_score, StudentGrade.comment
+        ) \
+        .select_from(course_students) \
+        .join(User, User.id == course_students.c.user_id) \
+        .outerjoin(StudentGrade, db.and_(StudentGrade.user_id == course_students.c.user_id,
+                                         StudentGrade.course_id == course_students.c.course_id)) \
+        .where(course_students.c.course_id == course_id) \
+        .order_by(User.id) \
+        .execution_options(yield_per=EXPORT_BATCH_SIZE)
+
+    result = db.session.execute(stmt)
+    for partition in result.partitions():
+        batch = []
+        for row in partition:
+            item = dict(zip(BASE_COLUMNS, row))
+            if include_total:
+                item['computed_total'] = weighted_total(
+                    item['final_exam_score'], item['regular_grade'], final_weight, regular_weight)
+            if include_weights:
+                item['final_exam_weight'] = final_weight
+                item['regular_grade_weight'] = regular_weight
+            batch.append(item)
+        yield batch
+
+
+def iter_csv(batches, columns):
+    """将成绩单批次编码为CSV文本块；首块带BOM，便于Excel识别UTF-8"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=columns, lineterminator='\n')
+    buffer.write('﻿')
+    writer.writeheader()
+    yield buffer.getvalue()
+
+    for batch in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(batch)
+        yield buffer.getvalue()
+
+
+def iter_ndjson(batches):
+    """将成绩单批次编码为NDJSON文本块（每行一个JSON对象）"""
+    for batch in batches:
+        yield ''.join(json.dumps(item, ensure_ascii=False) + '\n' for item in batch)
+
+
+GRADE_FIELDS = ('final_exam_score', 'regular_grade', 'comment')
+
+
+def _valid_score(value):
+    return value is None or (isinstance(value, Real) and not isinstance(value, bool))
+
+
+def upsert_course_grades(course_id, grades_data, settings):
+    """批量录入课程成绩，不提交事务
+
+    与逐条录入的语义一致：已有成绩只覆盖请求中出现的字段；两项成绩都不为空时重算总评，
+    否则保留原总评。同一学生出现多次时按顺序合并。返回 (成功数, 失败的学生ID列表)
+    """
+    # 按学生合并请求行，并校验成绩类型
+    changes = {}
+    failed_ids = []
+    for grade_data in grades_data:
+        student_id = grade_data.get('user_id') if isinstance(grade_data, dict) else None
+        if not student_id:
+            continue
+        try:
+            student_id = int(student_id)
+        except (TypeError, ValueError):
+            failed_ids.append(student_id)
+            continue
+        if not all(_valid_score(grade_data.get(name)) for name in ('final_exam_score', 'regular_grade')):
+            failed_ids.append(student_id)
+            continue
+        fields = {name: grade_data[name] for name in GRADE_FIELDS if name in grade_data}
+        changes.setdefault(student_id, {}).update(fields)
+
+    # 一次查询确认学生存在
+    if not changes:
+        return 0, failed_ids
+    existing_users = {user_id for (user_id,) in db.session.query(User.id).filter(User.id.in_(list(changes)))}
+    failed_ids += [student_id for student_id in changes if student_id not in existing_users]
+    student_ids = [student_id for student_id in changes if student_id in existing_users]
+    if not student_ids:
+        return 0, failed_ids
+
+    # 一次查询读出课程现有成绩
+    current = {
+        row.user_id: row for row in db.session.query(
+            StudentGrade.user_id, StudentGrade.final_exam_score, StudentGrade.regular_grade,
+            StudentGrade.total_score, StudentGrade.comment
+        ).filter(StudentGrade.course_id == course_id)
+    }
+
+    columns = {name: [] for name in GRADE_FIELDS + ('total_score',)}
+    for student_id in student_ids:
+        existing = current.get(student_id)
+        for name in GRADE_FIELDS + ('total_score',):
+            value = getattr(existing, name) if existing else None
+            columns[name].append(changes[student_id].get(name, value))
+
+    totals = weighted_totals(columns['final_exam_score'], columns['regular_grade'],
+                             settings.final_exam_weight, settings.regular_grade_weight)
+    columns['total_score'] = [
+        total if total is not None else previous
+        for total, previous in zip(totals, columns['total_score'])
+    ]
+
+    now = datetime.utcnow()
+    rows = [
+        {
+            'user_id': student_id,
+            'course_id': course_id,
+            'final_exam_score': columns['final_exam_score'][i],
+            'regular_grade': columns['regular_grade'][i],
+            'total_score': columns['total_score'][i],
+            'comment': columns['comment'][i],
+            'created_at': now,
+            'updated_at': now
+        }
+        for i, student_id in enumerate(student_ids)
+    ]
+    upsert(StudentGrade.__table__, rows, ['user_id', 'course_id'],
+           ['final_exam_score', 'regular_grade', 'total_score', 'comment', 'updated_at'])
+    mark_changed(db.session, 'student_grades', [course_id])
+
+    return len(rows), failed_ids
+
+
+def recompute_total_scores(course_ids=None):
+    """按成绩设置重算总评，不提交事务
+
+    用一条 UPDATE 语句完成，权重通过关联子查询取自各行所属课程的成绩设置，
+    与 StudentGrade.calculate_total_score 的运算顺序一致。course_ids 为None时处理
+    所有已设置成绩比重的课程；两项成绩不全的记录保持原总评。返回更新的行数
+    """
+    grades = StudentGrade.__table__
+    settings = GradeSetting.__table__
+
+    def weight(column):
+        return db.select(column) \
+            .where(settings.c.course_id == grades.c.course_id) \
+            .order_by(settings.c.id) \
+            .limit(1) \
+            .scalar_subquery()
+
+    has_settings = db.select(settings.c.id).where(settings.c.course_id == grades.c.course_id).exists()
+    stmt = grades.update() \
+        .where(grades.c.final_exam_score.isnot(None), grades.c.regular_grade.isnot(None), has_settings) \
+        .values(total_score=grades.c.final_exam_score * (weight(settings.c.final_exam_weight) / 100.0)
+                + grades.c.regular_grade * (weight(settings.c.regular_grade_weight) / 100.0))
+    if course_ids is not None:
+        course_ids = list(course_ids)
+        if not course_ids:
+            return 0
+        stmt = stmt.where(grades.c.course_id.in_(course_ids))
+    else:
+        course_ids = [course_id for (course_id,) in db.session.execute(db.select(settings.c.course_id).distinct())]
+
+    updated = db.session.execute(stmt).rowcount
+    mark_changed(db.session, 'student_grades', course_ids)
+    return updated
+
+
+def apply_grade_weights(course_ids, final_weight, regular_weight):
+    """将同一组成绩比重应用到多门课程并重算总评，不提交事务
+
+    已有成绩设置的课程用一条 UPDATE 修改，其余课程批量插入新设置，最后一条 UPDATE 重算总评。
+    返回重算总评的成绩记录数
+    """
+    course_ids = list(course_ids)
+    if not course_ids:
+        return 0
+    settings = GradeSetting.__table__
+    now = datetime.utcnow()
+
+    configured = {course_id for (course_id,) in db.session.execute(
+        db.select(settings.c.course_id).where(settings.c.course_id.in_(course_ids)))}
+    if configured:
+        db.session.execute(
+            settings.update()
+            .where(settings.c.course_id.in_(configured))
+            .values(final_exam_weight=final_weight, regular_grade_weight=regular_weight, updated_at=now)
+        )
+    missing = [course_id for course_id in course_ids if course_id not in configured]
+    if missing:
+        db.session.execute(settings.insert(), [
+            {'course_id': course_id, 'final_exam_weight': final_weight, 'regular_grade_weight': regular_weight,
+             'created_at': now, 'updated_at': now}
+            for course_id in missing
+        ])
+    mark_changed(db.session, 'grade_settings', course_ids)
+
+    return recompute_total_scores(course_ids)
@@ -0,0 +1,399 @@
+"""
+学习活动写缓冲
+
+开启 ACTIVITY_BUFFER_ENABLED 后，POST /activities 将校验通过的事件放入进程内有界队列并立即返回 202，
+由后台线程按数量或时间批量写入 activities 表，并在同一事务中更新日汇总。
+
+崩溃保护：事件入队前先追加到本地 spool 文件（每行一个JSON）。每次刷写时把当前 spool
+文件改名为分段文件，提交成功后删除；进程异常退出后残留的 spool 和分段文件会在下次启动
+时由刷写线程重新写入数据库，不占用请求。提交成功与删除分段之间崩溃时事件会被重复写入（至少一次语义）。
+
+只有数据库连接类错误（OperationalError 等）会重试；其他错误（如 IntegrityError、DataError）
+说明批次中有无法写入的事件，此时把批次二分后分别写入，最终无法写入的单条事件追加到
+spool 目录下的 dead_letter.jsonl 并记录日志，不再阻塞后续事件。
+"""
+
+import atexit
+import glob
+import json
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import exc as sa_exc
+
+try:
+    import fcntl
+except ImportError:  # Windows 下没有文件锁，只适用于单进程部署
+    fcntl = None
+
+
+class BufferFull(Exception):
+    """缓冲队列已满，调用方应稍后重试"""
+
+
+class RecoveryIncomplete(Exception):
+    """恢复spool文件时数据库不可用，未写入的事件保留在文件中"""
+
+
+def _serializable(row):
+    return {name: value.isoformat() if isinstance(value, datetime) else value for name, value in row.items()}
+
+
+def _encode_row(row):
+    return json.dumps(_serializable(row), ensure_ascii=False, separators=(',', ':'))
+
+
+def _decode_row(line):
+    row = json.loads(line)
+    for name in ('created_at', 'updated_at'):
+        if row.get(name):
+            row[name] = datetime.fromisoformat(row[name])
+    return row
+
+
+def write_rows(rows):
+    """批量插入活动并更新日汇总，需在应用上下文中调用"""
+    from .. import db, analytics_cache
+    from ..models import Activity
+    from .rollups import record_activities_inserted
+
+    try:
+        db.session.execute(Activity.__table__.insert(), rows)
+        record_activities_inserted(rows)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    finally:
+        db.session.remove()
+    analytics_cache.bump(
+        course_ids=[row['course_id'] for row in rows],
+        user_ids=[row['user_id'] for row in rows]
+    )
+
+
+def _is_transient(error):
+    """数据库连接类错误，稍后重试可能成功"""
+    if isinstance(error, sa_exc.DBAPIError) and error.connection_invalidated:
+        return True
+    return isinstance(error, (sa_exc.OperationalError, sa_exc.InterfaceError,
+                              sa_exc.DisconnectionError, sa_exc.TimeoutError))
+
+
+def read_spool(path):
+    """读取spool文件，跳过崩溃时写了一半的行"""
+    rows = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                rows.append(_decode_row(line))
+            except (ValueError, KeyError):
+                continue
+    return rows
+
+
+def _rewrite_spool(path, rows):
+    """用rows替换spool文件的内容；先写临时文件再改名，改写中途崩溃不会丢失事件"""
+    directory, name = os.path.split(path)
+    temp_path = os.path.join(directory, f'.{name}.tmp')
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        for row in rows:
+            f.write(_encode_row(row) + '\n')
+    os.replace(temp_path, path)
+
+
+class _BufferWorker:
+    """单个应用的缓冲队列、spool 文件和刷写线程"""
+
+    def __init__(self, app):
+        config = app.config
+        self.app = app
+        self.max_size = config['ACTIVITY_BUFFER_MAX_SIZE']
+        self.flush_size = config['ACTIVITY_BUFFER_FLUSH_SIZE']
+        self.flush_interval = config['ACTIVITY_BUFFER_FLUSH_INTERVAL']
+        self.spool_dir = config['ACTIVITY_BUFFER_SPOOL_DIR'] or os.path.join(app.instance_path, 'activity_spool')
+
+        self.queue = deque()
+        self.in_flight = 0
+        self.condition = threading.Condition()
+        self.stopping = False
+        self.thread = None
+        self.stats = {'accepted': 0, 'rejected': 0, 'flushed': 0, 'flushes': 0, 'errors': 0, 'dead_lettered': 0}
+        self.dead_letter_path = os.path.join(self.spool_dir, 'dead_letter.jsonl')
+
+        self.prefix = None
+        self.spool = None
+        self.lock_file = None
+        self.segment_seq = 0
+
+    # 生命周期
+
+    def ensure_started(self):
+        """打开本进程的spool文件并启动刷写线程；残留文件的恢复在刷写线程中进行"""
+        if self.thread is not None:
+            return
+        with self.condition:
+            if self.thread is not None:
+                return
+            try:
+                os.makedirs(self.spool_dir, exist_ok=True)
+                # 前缀带启动时间，进程号被复用（如容器重启）时不会与上一次运行的残留文件混在一起
+                self.prefix = os.path.join(self.spool_dir, f'activities-{os.getpid()}-{time.time_ns()}')
+                self.lock_file = open(self.prefix + '.lock', 'w')
+                if fcntl is not None:
+                    fcntl.flock(self.lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                self.spool = open(self.prefix + '.spool', 'a', encoding='utf-8')
+                thread = threading.Thread(target=self.run, name='activity-buffer-flusher', daemon=True)
+                thread.start()
+            except Exception:
+                self._close_files()
+                raise
+            self.thread = thread
+            atexit.register(self.stop)
+
+    def _close_files(self):
+        """启动失败时关闭已打开的文件并释放锁，下一次入队时重新尝试启动"""
+        for f in (self.spool, self.lock_file):
+            if f is not None:
+                f.close()
+        if self.prefix is not None:
+            for path in (self.prefix + '.spool', self.prefix + '.lock'):
+                if os.path.exists(path) and os.path.getsize(path) == 0:
+                    os.remove(path)
+        self.spool = self.lock_file = self.prefix = None
+
+    def stop(self, timeout=30):
+        """停止刷写线程，退出前写入队列中剩余的事件"""
+        if self.thread is None:
+            return
+        with self.condition:
+            self.stopping = True
+            self.condition.notify()
+        self.thread.join(timeout)
+
+    # 入队
+
+    def submit(self, row):
+        self.ensure_started()
+        with self.condition:
+            if self.stopping or len(self.queue) + self.in_flight >= self.max_size:
+                self.stats['rejected'] += 1
+                raise BufferFull()
+            self.spool.write(_encode_row(row) + '\n')
+            self.spool.flush()
+            self.queue.append(row)
+            self.stats['accepted'] += 1
+            if len(self.queue) >= self.flush_size:
+                self.condition.notify()
+
+    # 刷写
+
+    def run(self):
+        self._recover_on_start()
+        while True:
+            with self.condition:
+                if len(self.queue) < self.flush_size and not self.stopping:
+                    self.condition.wait(self.flush_interval)
+                stopping = self.stopping
+                segment, rows = self._rotate()
+            if rows:
+                self._write_segment(segment, rows, stopping)
+            if stopping:
+                with self.condition:
+                    if not self.queue:
+                        break
+
+    def _rotate(self):
+        """取出当前队列，并把对应的spool文件改名为分段文件；需持有锁"""
+        if not self.queue:
+            return None, []
+        self.segment_seq += 1
+        segment = f'{self.prefix}.spool.{self.segment_seq}'
+        self.spool.close()
+        os.replace(self.prefix + '.spool', segment)
+        self.spool = open(self.prefix + '.spool', 'a', encoding='utf-8')
+
+        rows = list(self.queue)
+        self.queue.clear()
+        self.in_flight += len(rows)
+        return segment, rows
+
+    def _write_segment(self, segment, rows, stopping):
+        """写入一个分段，数据库不可用时重试；停止时仍失败则把未写入的事件留在分段文件中待下次启动恢复"""
+        count = len(rows)
+        while True:
+            written, rows = self._store(rows, segment)
+            self.stats['flushed'] += written
+            if not rows:
+                os.remove(segment)
+                self.stats['flushes'] += 1
+                break
+            if stopping or self.stopping:
+                _rewrite_spool(segment, rows)
+                break
+            time.sleep(self.flush_interval)
+        with self.condition:
+            self.in_flight -= count
+
+    def _store(self, rows, source):
+        """写入rows并隔离无法写入的事件，返回 (写入条数, 因连接类错误未写入的事件)
+
+        非连接类错误时把批次二分重试，直到定位到单条事件并写入死信文件。
+        """
+        written = 0
+        pending = [rows] if rows else []
+        while pending:
+            batch = pending.pop()
+            try:
+                with self.app.app_context():
+                    write_rows(batch)
+            except Exception as error:
+                if _is_transient(error):
+                    self.stats['errors'] += 1
+                    remaining = [row for rest in [batch] + pending[::-1] for row in rest]
+                    self.app.logger.exception('活动缓冲写入失败，%s 条事件保留在 %s', len(remaining), source)
+                    return written, remaining
+                if len(batch) == 1:
+                    self._dead_letter(batch[0], error, source)
+                    continue
+                middle = len(batch) // 2
+                pending.append(batch[middle:])
+                pending.append(batch[:middle])
+                continue
+            written += len(batch)
+        return written, []
+
+    def _dead_letter(self, row, error, source):
+        """把无法写入的事件追加到死信文件"""
+        self.stats['dead_lettered'] += 1
+        self.app.logger.error('活动事件无法写入，已移入 %s（来源 %s）: %s; %s',
+                              self.dead_letter_path, source, _encode_row(row), error)
+        with open(self.dead_letter_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps({'source': os.path.basename(source), 'error': str(error), 'row': _serializable(row)},
+                               ensure_ascii=False, separators=(',', ':')) + '\n')
+
+    def flush(self):
+        """立即写入队列中的全部事件"""
+        if self.thread is None:
+            return
+        with self.condition:
+            segment, rows = self._rotate()
+        if rows:
+            self._write_segment(segment, rows, stopping=True)
+
+    # 崩溃恢复
+
+    def _recover_on_start(self):
+        """刷写线程启动后先写回残留文件，数据库暂不可用时稍后重试；新事件在恢复完成后写入"""
+        while not self.stopping:
+            try:
+                self.recover()
+                return
+            except Exception:
+                self.stats['errors'] += 1
+                self.app.logger.exception('活动缓冲恢复spool文件失败，稍后重试')
+            with self.condition:
+                if not self.stopping:
+                    self.condition.wait(self.flush_interval)
+
+    def recover(self):
+        """写回已退出进程残留的spool和分段文件，返回恢复的事件数
+
+        数据库连接类错误时未写入的事件留在原文件中，并抛出 RecoveryIncomplete。
+        """
+        recovered = 0
+        for lock_path in glob.glob(os.path.join(self.spool_dir, 'activities-*.lock')):
+            prefix = lock_path[:-len('.lock')]
+            if prefix == self.prefix:
+                continue  # 当前进程正在使用的缓冲
+            lock = self._try_lock(lock_path)
+            if lock is None:
+                continue  # 其他存活进程仍持有该缓冲
+            try:
+                recovered += self._replay(prefix)
+                os.remove(lock_path)
+            finally:
+                lock.close()
+        if recovered:
+            self.app.logger.warning('已从spool文件恢复 %s 条活动事件', recovered)
+        return recovered
+
+    def _replay(self, prefix):
+        recovered = 0
+        for path in sorted(glob.glob(prefix + '.spool*')):
+            written, rows = self._store(read_spool(path), path)
+            recovered += written
+            if rows:
+                _rewrite_spool(path, rows)
+                raise RecoveryIncomplete(f'{len(rows)} 条事件保留在 {path}')
+            os.remove(path)
+        return recovered
+
+    @staticmethod
+    def _try_lock(path):
+        """获取已退出进程的缓冲锁，返回打开的锁文件；锁被占用时返回None"""
+        f = open(path, 'a')
+        if fcntl is not None:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                f.close()
+                return None
+        return f
+
+
+class ActivityBuffer:
+    """活动写缓冲扩展，用法与 db、analytics_cache 相同: activity_buffer.init_app(app)
+
+    刷写线程在第一次入队时才启动，并在线程中恢复残留文件；命令行命令（如 flask db upgrade）
+    不会触发恢复或写入
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('ACTIVITY_BUFFER_ENABLED', False)
+        app.config.setdefault('ACTIVITY_BUFFER_MAX_SIZE', 50000)
+        app.config.setdefault('ACTIVITY_BUFFER_FLUSH_SIZE', 1000)
+        app.config.setdefault('ACTIVITY_BUFFER_FLUSH_INTERVAL', 1.0)
+        app.config.setdefault('ACTIVITY_BUFFER_SPOOL_DIR', None)
+
+        app.extensions['activity_buffer'] = _BufferWorker(app)
+
+    @property
+    def _worker(self):
+        return current_app.extensions['activity_buffer']
+
+    @property
+    def enabled(self):
+        return current_app.config['ACTIVITY_BUFFER_ENABLED']
+
+    def submit(self, row):
+        """事件入队，队列已满时抛出 BufferFull"""
+        self._worker.submit(row)
+
+    def flush(self):
+        self._worker.flush()
+
+    def stop(self):
+        self._worker.stop()
+
+    def recover(self):
+        """写回残留的spool文件，可在刷写线程未启动时由命令行调用"""
+        worker = self._worker
+        os.makedirs(worker.spool_dir, exist_ok=True)
+        return worker.recover()
+
+    def stats(self):
+        worker = self._worker
+        with worker.condition:
+            stats = dict(worker.stats)
+            stats['queued'] = len(worker.queue)
+            stats['in_flight'] = worker.in_flight
+        return stats
@@ -0,0 +1,285 @@
+"""
+请求埋点与指标
+
+每个请求记录耗时、SQL语句数和SQL耗时（SQLAlchemy 游标事件），按端点（路由的 endpoint 名）汇总，
+由 GET /metrics 以 Prometheus 文本格式导出。指标保存在进程内，多进程部署时由 Prometheus 分别抓取各进程。
+
+- 详细追踪：按 INSTRUMENTATION_TRACE_SAMPLE_RATE 抽样请求，记录每条SQL语句及耗时，请求结束时以一行JSON
+  写入 app.services.instrumentation 日志（INFO）；该日志级别未开启时不抽样，没有额外开销
+- 慢查询日志：单条SQL耗时达到 INSTRUMENTATION_SLOW_QUERY_MS 时写入
+  app.services.instrumentation.slow_query 日志（WARNING），请求外（命令行、写缓冲线程）的语句同样记录
+"""
+
+import json
+import logging
+import random
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+
+from flask import current_app, g, request, has_app_context, Response
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+slow_query_logger = logging.getLogger(__name__ + '.slow_query')
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)  # 秒
+STATEMENT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+# 单次追踪最多记录的语句数和每条语句保留的长度
+TRACE_MAX_STATEMENTS = 200
+STATEMENT_MAX_LENGTH = 1000
+
+UNMATCHED_ENDPOINT = 'unmatched'
+
+
+class Histogram:
+    """Prometheus 直方图：各桶计数（非累计）、总和与数量"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class _RequestRecord:
+    """单个请求的计时和SQL统计，保存在 g 上"""
+
+    __slots__ = ('start', 'statements', 'sql_seconds', 'status', 'trace')
+
+    def __init__(self, sampled):
+        self.start = time.perf_counter()
+        self.statements = 0
+        self.sql_seconds = 0.0
+        self.status = None
+        self.trace = [] if sampled else None
+
+
+class _Metrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = defaultdict(int)  # (endpoint, method, status) -> 数量
+        self.durations = defaultdict(lambda: Histogram(DURATION_BUCKETS))  # endpoint -> 请求耗时
+        self.statements = defaultdict(lambda: Histogram(STATEMENT_BUCKETS))  # endpoint -> 每请求SQL语句数
+        self.sql_seconds = defaultdict(float)  # endpoint -> SQL总耗时
+        self.slow_queries = 0
+        self.traces = 0
+
+    def record_request(self, endpoint, method, status, record, duration):
+        with self.lock:
+            self.requests[(endpoint, method, status)] += 1
+            self.durations[endpoint].observe(duration)
+            self.statements[endpoint].observe(record.statements)
+            self.sql_seconds[endpoint] += record.sql_seconds
+            if record.trace is not None:
+                self.traces += 1
+
+    def record_slow_query(self):
+        with self.lock:
+            self.slow_queries += 1
+
+
+class Instrumentation:
+    """请求埋点扩展，用法与 db、analytics_cache 相同: instrumentation.init_app(app)"""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('INSTRUMENTATION_ENABLED', True)
+        app.config.setdefault('INSTRUMENTATION_METRICS_ENABLED', True)
+        app.config.setdefault('INSTRUMENTATION_TRACE_SAMPLE_RATE', 0.0)
+        app.config.setdefault('INSTRUMENTATION_SLOW_QUERY_MS', 0)
+
+        if not app.config['INSTRUMENTATION_ENABLED']:
+            return
+        app.extensions['instrumentation'] = _Metrics()
+        _register_sql_hooks()
+
+        app.before_request(_start_request)
+        app.after_request(_record_status)
+        app.teardown_request(_finish_request)
+        if app.config['INSTRUMENTATION_METRICS_ENABLED']:
+            app.add_url_rule('/metrics', 'metrics', metrics_view)
+
+    def metrics(self):
+        """当前应用的指标，Prometheus 文本格式"""
+        return render_metrics(current_app.extensions['instrumentation'])
+
+
+# ---- 请求钩子 ----
+
+def _start_request():
+    rate = current_app.config['INSTRUMENTATION_TRACE_SAMPLE_RATE']
+    sampled = rate > 0 and logger.isEnabledFor(logging.INFO) and random.random() < rate
+    g._instrumentation = _RequestRecord(sampled)
+
+
+def _record_status(response):
+    record = g.get('_instrumentation')
+    if record is not None:
+        record.status = response.status_code
+    return response
+
+
+def _finish_request(exc):
+    record = g.pop('_instrumentation', None)
+    if record is None:
+        return
+    duration = time.perf_counter() - record.start
+    # 未处理的异常不会经过 after_request
+    status = record.status if record.status is not None else 500
+    endpoint = request.endpoint or UNMATCHED_ENDPOINT
+    current_app.extensions['instrumentation'].record_request(endpoint, request.method, status, record, duration)
+
+    if record.trace is not None:
+        logger.info('%s', json.dumps({
+            'endpoint': endpoint,
+            'method': request.method,
+            'path': request.full_path.rstrip('?'),
+            'status': status,
+            'duration_ms': round(duration * 1000, 3),
+            'sql_count': record.statements,
+            'sql_ms': round(record.sql_seconds * 1000, 3),
+            'statements': record.trace,
+            'statements_dropped': max(0, record.statements - len(record.trace))
+        }, ensure_ascii=False))
+
+
+# ---- SQL钩子 ----
+
+_hooks_registered = False
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('instrumentation_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get('instrumentation_start')
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    if not has_app_context() or 'instrumentation' not in current_app.extensions:
+        return
+
+    record = g.get('_instrumentation')
+    if record is not None:
+        record.statements += 1
+        record.sql_seconds += elapsed
+        if record.trace is not None and len(record.trace) < TRACE_MAX_STATEMENTS:
+            record.trace.append({'sql': statement[:STATEMENT_MAX_LENGTH], 'ms': round(elapsed * 1000, 3)})
+
+    threshold = current_app.config['INSTRUMENTATION_SLOW_QUERY_MS']
+    if threshold and elapsed * 1000 >= threshold:
+        current_app.extensions['instrumentation'].record_slow_query()
+        if slow_query_logger.isEnabledFor(logging.WARNING):
+            slow_query_logger.warning('慢查询 %.1f ms [%s]%s: %s', elapsed * 1000,
+                                      request.endpoint if record is not None else '-',
+                                      ' executemany' if executemany else '',
+                                      statement[:STATEMENT_MAX_LENGTH])
+
+
+def _handle_error(exception_context):
+    # 语句执行失败时不会触发 after_cursor_execute，丢弃对应的开始时间
+    connection = exception_context.connection
+    if connection is not None and connection.info.get('instrumentation_start'):
+        connection.info['instrumentation_start'].pop()
+
+
+def _register_sql_hooks():
+    global _hooks_registered
+    if _hooks_registered:
+        return
+    event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+    event.listen(Engine, 'handle_error', _handle_error)
+    _hooks_registered = True
+
+
+# ---- Prometheus 文本格式 ----
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels):
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + '}'
+
+
+def _format_bound(bound):
+    return f'{bound:g}'
+
+
+def _histogram_lines(name, endpoint, histogram):
+    lines = []
+    cumulative = 0
+    for bound, count in zip(histogram.buckets, histogram.counts):
+        cumulative += count
+        lines.append(f'{name}_bucket{_labels(endpoint=endpoint, le=_format_bound(bound))} {cumulative}')
+    lines.append(f'{name}_bucket{_labels(endpoint=endpoint, le="+Inf")} {histogram.count}')
+    lines.append(f'{name}_sum{_labels(endpoint=endpoint)} {histogram.sum:g}')
+    lines.append(f'{name}_count{_labels(endpoint=endpoint)} {histogram.count}')
+    return lines
+
+
+def render_metrics(metrics):
+    with metrics.lock:
+        requests = sorted(metrics.requests.items())
+        durations = sorted(metrics.durations.items())
+        statements = sorted(metrics.statements.items())
+        sql_seconds = sorted(metrics.sql_seconds.items())
+        slow_queries = metrics.slow_queries
+        traces = metrics.traces
+
+        lines = [
+            '# HELP http_requests_total 按端点、方法和状态码统计的请求数',
+            '# TYPE http_requests_total counter'
+        ]
+        for (endpoint, method, status), count in requests:
+            lines.append(f'http_requests_total{_labels(endpoint=endpoint, method=method, status=status)} {count}')
+
+        lines += [
+            '# HELP http_request_duration_seconds 请求耗时',
+            '# TYPE http_request_duration_seconds histogram'
+        ]
+        for endpoint, histogram in durations:
+            lines += _histogram_lines('http_request_duration_seconds', endpoint, histogram)
+
+        lines += [
+            '# HELP http_request_sql_statements 每个请求执行的SQL语句数',
+            '# TYPE http_request_sql_statements histogram'
+        ]
+        for endpoint, histogram in statements:
+            lines += _histogram_lines('http_request_sql_statements', endpoint, histogram)
+
+    lines += [
+        '# HELP http_request_sql_seconds_total 请求内SQL执行总耗时',
+        '# TYPE http_request_sql_seconds_total counter'
+    ]
+    for endpoint, seconds in sql_seconds:
+        lines.append(f'http_request_sql_seconds_total{_labels(endpoint=endpoint)} {seconds:g}')
+
+    lines += [
+        '# HELP sql_slow_queries_total 耗时达到 INSTRUMENTATION_SLOW_QUERY_MS 的SQL语句数',
+        '# TYPE sql_slow_queries_total counter',
+        f'sql_slow_queries_total {slow_queries}',
+        '# HELP instrumentation_traces_total 抽样记录的详细追踪数',
+        '# TYPE instrumentation_traces_total counter',
+        f'instrumentation_traces_total {traces}'
+    ]
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view():
+    return Response(render_metrics(current_app.extensions['instrumentation']),
+                    content_type='text/plain; version=0.0.4; charset=utf-8')
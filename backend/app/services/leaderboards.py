@@ -0,0 +1,106 @@
+"""
+活动排行榜
+
+最活跃学生（课程内）和最活跃课程（全站）排行读取按增量维护的计数:
+- course_user_activity_counts: 每个(课程, 用户)的活动数和完成数，(course_id, activity_count) 索引；
+  完成数供 services.sketches 维护完成率草图
+- courses.activity_count: 每门课程的活动数量，activity_count 索引
+读取前K名只需沿索引取K行，不再对原始活动记录 GROUP BY + ORDER BY count(*)。
+
+计数在 services.rollups 的活动写入路径中与日汇总一起更新，
+可用 flask leaderboards rebuild 根据活动记录全量重建，或用 flask counters reconcile 校正课程计数。
+"""
+
+from collections import defaultdict
+
+from sqlalchemy import func, case, bindparam
+
+from .. import db
+from ..models import Activity, Course, CourseUserActivityCount, User
+from ..utils.upsert import upsert
+
+DEFAULT_TOP_K = 5
+
+
+def apply_activity_count_deltas(pair_changes):
+    """累加活动数和完成数的变化，不提交事务
+
+    pair_changes 为 {(user_id, course_id): (活动数增量, 完成数增量)}
+    """
+    rows = [
+        {'course_id': course_id, 'user_id': user_id, 'activity_count': total_delta, 'completed_count': completed_delta}
+        for (user_id, course_id), (total_delta, completed_delta) in pair_changes.items()
+        if total_delta or completed_delta
+    ]
+    if not rows:
+        return
+    upsert(CourseUserActivityCount.__table__, rows, ['course_id', 'user_id'],
+           ['activity_count', 'completed_count'], increment=True)
+
+    course_deltas = defaultdict(int)
+    for row in rows:
+        course_deltas[row['course_id']] += row['activity_count']
+    params = [{'course_id': course_id, 'delta': delta} for course_id, delta in course_deltas.items() if delta]
+    if params:
+        # 显式保留 updated_at，活动写入不算课程本身的修改；activity_count 不出现在课程接口的响应中，
+        # 不递增 table:courses 版本，避免每次活动写入都使课程列表的ETag失效
+        courses = Course.__table__
+        db.session.execute(
+            courses.update()
+            .where(courses.c.id == bindparam('course_id'))
+            .values(activity_count=courses.c.activity_count + bindparam('delta'), updated_at=courses.c.updated_at)
+            .execution_options(version_tracking=False),
+            params
+        )
+
+    # 删除活动后可能留下计数为0的行
+    shrunk = {row['course_id'] for row in rows if row['activity_count'] < 0}
+    if shrunk:
+        CourseUserActivityCount.query.filter(
+            CourseUserActivityCount.activity_count <= 0,
+            CourseUserActivityCount.course_id.in_(shrunk)
+        ).delete(synchronize_session=False)
+
+
+def top_students(course_id, limit=DEFAULT_TOP_K):
+    """课程内活动最多的用户 [(user_id, username, activity_count)]"""
+    return db.session.query(User.id, User.username, CourseUserActivityCount.activity_count) \
+        .join(User, User.id == CourseUserActivityCount.user_id) \
+        .filter(CourseUserActivityCount.course_id == course_id, CourseUserActivityCount.activity_count > 0) \
+        .order_by(CourseUserActivityCount.activity_count.desc(), CourseUserActivityCount.user_id) \
+        .limit(limit) \
+        .all()
+
+
+def top_courses(limit=DEFAULT_TOP_K):
+    """全站活动最多的课程 [(course_id, title, activity_count)]"""
+    return db.session.query(Course.id, Course.title, Course.activity_count) \
+        .filter(Course.activity_count > 0) \
+        .order_by(Course.activity_count.desc(), Course.id) \
+        .limit(limit) \
+        .all()
+
+
+def rebuild_leaderboards():
+    """根据活动记录重建排行计数，返回(课程, 用户)计数行数"""
+    CourseUserActivityCount.query.delete(synchronize_session=False)
+    source = db.select(
+            Activity.course_id, Activity.user_id, func.count(Activity.id),
+            func.coalesce(func.sum(case((Activity.completed == True, 1), else_=0)), 0)
+        ) \
+        .group_by(Activity.course_id, Activity.user_id)
+    db.session.execute(
+        CourseUserActivityCount.__table__.insert().from_select(
+            ['course_id', 'user_id', 'activity_count', 'completed_count'], source)
+    )
+
+    activity_count = db.select(func.count(Activity.id)) \
+        .where(Activity.course_id == Course.id) \
+        .correlate(Course.__table__) \
+        .scalar_subquery()
+    db.session.execute(
+        Course.__table__.update().values(activity_count=activity_count, updated_at=Course.__table__.c.updated_at)
+    )
+    db.session.commit()
+
+    return CourseUserActivityCount.query.count()
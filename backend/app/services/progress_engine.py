@@ -0,0 +1,250 @@
+"""
+课程进度增量引擎
+
+在 course_progress 中为每个(用户, 课程)维护四个计数:
+已完成资源数、资源总数、已提交作业数、作业总数。
+资源完成、作业提交时按增量更新计数；资源/作业增删时批量重算整门课程。
+进度百分比由计数O(1)得出:
+- 资源完成权重: 70%
+- 作业完成权重: 30%
+- 如果课程没有资源或作业，则相应权重转移至另一部分
+"""
+
+from datetime import datetime
+
+from sqlalchemy import func
+
+from .. import db
+from ..models import CourseProgress, ResourceProgress, CourseResource, CourseSection
+from ..models.assignment import Assignment, AssignmentSubmission
+from ..models.course import course_students
+from ..utils.upsert import upsert
+
+RESOURCE_WEIGHT = 0.7
+ASSIGNMENT_WEIGHT = 0.3
+
+COUNTER_FIELDS = ['completed_resources', 'total_resources', 'submitted_assignments', 'total_assignments']
+
+
+def calculate_progress_percent(completed_resources, total_resources, submitted_assignments, total_assignments):
+    """根据计数计算课程总进度（0-100）"""
+    if total_resources > 0 and total_assignments > 0:
+        resource_percent = completed_resources / total_resources * 100
+        assignment_percent = submitted_assignments / total_assignments * 100
+        progress_percent = resource_percent * RESOURCE_WEIGHT + assignment_percent * ASSIGNMENT_WEIGHT
+    elif total_resources > 0:
+        progress_percent = completed_resources / total_resources * 100
+    elif total_assignments > 0:
+        progress_percent = submitted_assignments / total_assignments * 100
+    else:
+        progress_percent = 0
+
+    # 确保进度值在0-100范围内
+    return max(0, min(100, progress_percent))
+
+
+# ---- 全量计数（分组查询，不逐个资源/作业查询） ----
+
+def count_course_resources(course_id=None):
+    """每门课程的资源总数 {course_id: n}"""
+    query = db.session.query(CourseSection.course_id, func.count(CourseResource.id)) \
+        .join(CourseResource, CourseResource.section_id == CourseSection.id)
+    if course_id is not None:
+        query = query.filter(CourseSection.course_id == course_id)
+    return dict(query.group_by(CourseSection.course_id).all())
+
+
+def count_course_assignments(course_id=None):
+    """每门课程的作业总数 {course_id: n}"""
+    query = db.session.query(Assignment.course_id, func.count(Assignment.id))
+    if course_id is not None:
+        query = query.filter(Assignment.course_id == course_id)
+    return dict(query.group_by(Assignment.course_id).all())
+
+
+def count_completed_resources(course_id=None, user_id=None):
+    """每个(用户, 课程)已完成的资源数 {(user_id, course_id): n}"""
+    query = db.session.query(ResourceProgress.user_id, CourseSection.course_id, func.count(ResourceProgress.id)) \
+        .join(CourseResource, CourseResource.id == ResourceProgress.resource_id) \
+        .join(CourseSection, CourseSection.id == CourseResource.section_id) \
+        .filter(ResourceProgress.completed == True)
+    if course_id is not None:
+        query = query.filter(CourseSection.course_id == course_id)
+    if user_id is not None:
+        query = query.filter(ResourceProgress.user_id == user_id)
+    rows = query.group_by(ResourceProgress.user_id, CourseSection.course_id).all()
+    return {(uid, cid): n for uid, cid, n in rows}
+
+
+def count_submitted_assignments(course_id=None, user_id=None):
+    """每个(用户, 课程)已提交的作业数 {(user_id, course_id): n}"""
+    query = db.session.query(
+            AssignmentSubmission.user_id, Assignment.course_id,
+            func.count(func.distinct(AssignmentSubmission.assignment_id))
+        ) \
+        .join(Assignment, Assignment.id == AssignmentSubmission.assignment_id)
+    if course_id is not None:
+        query = query.filter(Assignment.course_id == course_id)
+    if user_id is not None:
+        query = query.filter(AssignmentSubmission.user_id == user_id)
+    rows = query.group_by(AssignmentSubmission.user_id, Assignment.course_id).all()
+    return {(uid, cid): n for uid, cid, n in rows}
+
+
+def recompute_counters(user_id, course_id):
+    """全量计算单个用户在课程中的进度计数"""
+    key = (user_id, course_id)
+    return {
+        'completed_resources': count_completed_resources(course_id, user_id).get(key, 0),
+        'total_resources': count_course_resources(course_id).get(course_id, 0),
+        'submitted_assignments': count_submitted_assignments(course_id, user_id).get(key, 0),
+        'total_assignments': count_course_assignments(course_id).get(course_id, 0)
+    }
+
+
+def _refresh_percent(progress):
+    progress.progress_percent = calculate_progress_percent(
+        progress.completed_resources, progress.total_resources,
+        progress.submitted_assignments, progress.total_assignments
+    )
+
+
+def rebuild_progress(user_id, course_id):
+    """全量重算并保存单个用户的课程进度（不提交事务）"""
+    counters = recompute_counters(user_id, course_id)
+
+    progress = CourseProgress.query.filter_by(user_id=user_id, course_id=course_id).first()
+    if not progress:
+        progress = CourseProgress(user_id=user_id, course_id=course_id)
+        db.session.add(progress)
+
+    for field, value in counters.items():
+        setattr(progress, field, value)
+    _refresh_percent(progress)
+    return progress
+
+
+def get_or_create_progress(user_id, course_id):
+    """获取进度记录，不存在时按全量计数初始化（不提交事务）"""
+    progress = CourseProgress.query.filter_by(user_id=user_id, course_id=course_id).first()
+    if progress:
+        return progress
+    return rebuild_progress(user_id, course_id)
+
+
+# ---- 单个用户的增量事件 ----
+
+def _apply_user_delta(user_id, course_id, completed_resources=0, submitted_assignments=0):
+    """按增量更新用户计数；记录不存在时全量初始化（此时事件已计入）"""
+    progress = CourseProgress.query.filter_by(user_id=user_id, course_id=course_id).first()
+    if not progress:
+        return rebuild_progress(user_id, course_id)
+
+    progress.completed_resources = max(0, (progress.completed_resources or 0) + completed_resources)
+    progress.submitted_assignments = max(0, (progress.submitted_assignments or 0) + submitted_assignments)
+    progress.last_activity_at = datetime.utcnow()
+    _refresh_percent(progress)
+    return progress
+
+
+def on_resource_completion_changed(user_id, course_id, completed):
+    """资源完成状态变化（未完成->完成 或 完成->未完成）后调用，需在flush资源进度之后"""
+    return _apply_user_delta(user_id, course_id, completed_resources=1 if completed else -1)
+
+
+def on_submission_created(user_id, course_id):
+    """新建作业提交后调用，需在flush提交记录之后"""
+    return _apply_user_delta(user_id, course_id, submitted_assignments=1)
+
+
+# ---- 课程内容变化：批量重算整门课程 ----
+
+def recompute_course_progress(course_id):
+    """批量重算课程内所有学生的进度（不提交事务），返回写入的记录数
+
+    覆盖所有已选课学生以及已有进度记录的用户；计数通过几条分组查询取得，
+    结果以一条批量upsert写回，没有进度记录的学生会同时补建记录。
+    """
+    enrolled = db.session.query(course_students.c.user_id) \
+        .filter(course_students.c.course_id == course_id)
+    tracked = db.session.query(CourseProgress.user_id) \
+        .filter(CourseProgress.course_id == course_id)
+    user_ids = [user_id for (user_id,) in enrolled.union(tracked).all()]
+    if not user_ids:
+        return 0
+
+    total_resources = count_course_resources(course_id).get(course_id, 0)
+    total_assignments = count_course_assignments(course_id).get(course_id, 0)
+    completed = count_completed_resources(course_id)
+    submitted = count_submitted_assignments(course_id)
+
+    now = datetime.utcnow()
+    rows = []
+    for user_id in user_ids:
+        key = (user_id, course_id)
+        counters = {
+            'completed_resources': completed.get(key, 0),
+            'total_resources': total_resources,
+            'submitted_assignments': submitted.get(key, 0),
+            'total_assignments': total_assignments
+        }
+        rows.append(dict(
+            counters,
+            user_id=user_id,
+            course_id=course_id,
+            progress_percent=calculate_progress_percent(**counters),
+            updated_at=now
+        ))
+
+    upsert(CourseProgress.__table__, rows, ['user_id', 'course_id'],
+           COUNTER_FIELDS + ['progress_percent', 'updated_at'])
+    return len(rows)
+
+
+def on_course_content_changed(course_id):
+    """课程资源或作业增删后调用（在同一事务中、提交之前）"""
+    return recompute_course_progress(course_id)
+
+
+# ---- 一致性检查 ----
+
+def check_progress_consistency(course_id=None, fix=False):
+    """将计数与全量重算结果对比，返回不一致的记录列表；fix=True 时修正并提交"""
+    query = CourseProgress.query
+    if course_id is not None:
+        query = query.filter(CourseProgress.course_id == course_id)
+    progresses = query.all()
+
+    resource_totals = count_course_resources(course_id)
+    assignment_totals = count_course_assignments(course_id)
+    completed = count_completed_resources(course_id)
+    submitted = count_submitted_assignments(course_id)
+
+    drift = []
+    for progress in progresses:
+        key = (progress.user_id, progress.course_id)
+        expected = {
+            'completed_resources': completed.get(key, 0),
+            'total_resources': resource_totals.get(progress.course_id, 0),
+            'submitted_assignments': submitted.get(key, 0),
+            'total_assignments': assignment_totals.get(progress.course_id, 0)
+        }
+        actual = {field: getattr(progress, field) for field in COUNTER_FIELDS}
+        expected_percent = calculate_progress_percent(**expected)
+
+        if actual != expected or abs((progress.progress_percent or 0) - expected_percent) > 0.01:
+            drift.append({
+                'user_id': progress.user_id,
+                'course_id': progress.course_id,
+                'actual': dict(actual, progress_percent=progress.progress_percent),
+                'expected': dict(expected, progress_percent=expected_percent)
+            })
+            if fix:
+                for field, value in expected.items():
+                    setattr(progress, field, value)
+                progress.progress_percent = expected_percent
+
+    if fix and drift:
+        db.session.commit()
+
+    return drift
@@ -0,0 +1,149 @@
+"""
+学习活动日汇总维护
+
+在活动写入的同一事务中按增量更新 activity_daily_rollups
+（以及 services.sketches 的分位数草图、services.leaderboards 的排行计数），
+趋势类和按用户汇总的分析接口读取汇总表，不再扫描原始活动记录。
+"""
+
+from collections import defaultdict
+from datetime import datetime
+
+from sqlalchemy import func, case, or_, and_
+
+from .. import db
+from ..models import Activity, ActivityDailyRollup
+from ..utils.upsert import upsert
+from . import sketches, leaderboards
+
+KEY_COLUMNS = ['date', 'user_id', 'course_id', 'activity_type']
+COUNTER_COLUMNS = ['activity_count', 'duration_sum', 'score_sum', 'score_count', 'completed_count']
+
+
+def rollup_key(activity):
+    """活动所属的汇总键 (日期, 用户, 课程, 活动类型)"""
+    created_at = activity.created_at or datetime.utcnow()
+    return (created_at.date(), activity.user_id, activity.course_id, activity.activity_type)
+
+
+def activity_counters(activity, sign=1):
+    """单条活动对汇总计数的贡献，sign=-1 表示撤销"""
+    return {
+        'activity_count': sign,
+        'duration_sum': sign * (activity.duration or 0),
+        'score_sum': sign * (activity.score or 0.0),
+        'score_count': sign if activity.score is not None else 0,
+        'completed_count': sign if activity.completed else 0
+    }
+
+
+def aggregate_activity_deltas(activities, sign=1):
+    """将一批活动按汇总键合并为增量"""
+    deltas = defaultdict(lambda: dict.fromkeys(COUNTER_COLUMNS, 0))
+    for activity in activities:
+        counters = deltas[rollup_key(activity)]
+        for name, value in activity_counters(activity, sign).items():
+            counters[name] += value
+    return deltas
+
+
+def apply_rollup_deltas(deltas, score_changes=()):
+    """将增量累加到汇总表并同步更新分位数草图，不提交事务
+
+    score_changes 为 [(course_id, 得分, ±1)]，记录各条活动得分的增减
+    """
+    # 完成率草图需要各(用户, 课程)更新前的计数，须在更新排行计数之前计算
+    pair_changes = defaultdict(lambda: [0, 0])
+    for (_, user_id, course_id, _), counters in deltas.items():
+        change = pair_changes[(user_id, course_id)]
+        change[0] += counters['activity_count']
+        change[1] += counters['completed_count']
+    sketch_deltas = sketches.new_deltas()
+    sketches.add_completion_rate_deltas(sketch_deltas, pair_changes)
+    for course_id, score, sign in score_changes:
+        sketches.add_score_delta(sketch_deltas, course_id, score, sign)
+
+    rows = []
+    pruned_keys = []
+    for key, counters in deltas.items():
+        if not any(counters.values()):
+            continue
+        rows.append(dict(zip(KEY_COLUMNS, key), **counters))
+        if counters['activity_count'] < 0:
+            pruned_keys.append(key)
+
+    upsert(ActivityDailyRollup.__table__, rows, KEY_COLUMNS, COUNTER_COLUMNS, increment=True)
+
+    # 删除活动后可能留下计数为0的汇总行
+    if pruned_keys:
+        ActivityDailyRollup.query.filter(
+            ActivityDailyRollup.activity_count <= 0,
+            or_(*[
+                and_(*[getattr(ActivityDailyRollup, name) == value for name, value in zip(KEY_COLUMNS, key)])
+                for key in pruned_keys
+            ])
+        ).delete(synchronize_session=False)
+
+    sketches.apply_sketch_deltas(sketch_deltas)
+    leaderboards.apply_activity_count_deltas(pair_changes)
+
+
+def record_activity_created(activity):
+    """新增活动后调用，需在活动flush之后、提交之前执行"""
+    apply_rollup_deltas(aggregate_activity_deltas([activity]), [(activity.course_id, activity.score, 1)])
+
+
+def record_activities_inserted(rows):
+    """批量插入活动后调用，rows 为插入时使用的字段字典列表（需包含 created_at）"""
+    deltas = defaultdict(lambda: dict.fromkeys(COUNTER_COLUMNS, 0))
+    for row in rows:
+        counters = deltas[(row['created_at'].date(), row['user_id'], row['course_id'], row['activity_type'])]
+        counters['activity_count'] += 1
+        counters['duration_sum'] += row['duration'] or 0
+        if row['score'] is not None:
+            counters['score_sum'] += row['score']
+            counters['score_count'] += 1
+        if row['completed']:
+            counters['completed_count'] += 1
+    apply_rollup_deltas(deltas, [(row['course_id'], row['score'], 1) for row in rows])
+
+
+def record_activity_deleted(activity):
+    """删除活动时调用，需在提交之前执行"""
+    apply_rollup_deltas(aggregate_activity_deltas([activity], sign=-1), [(activity.course_id, activity.score, -1)])
+
+
+def record_activity_updated(activity, before):
+    """更新活动后调用，before 为修改前 activity_counters(activity) 的结果"""
+    after = activity_counters(activity)
+    delta = {name: after[name] - before[name] for name in COUNTER_COLUMNS}
+    previous_score = before['score_sum'] if before['score_count'] else None
+    apply_rollup_deltas({rollup_key(activity): delta},
+                        [(activity.course_id, previous_score, -1), (activity.course_id, activity.score, 1)])
+
+
+def backfill_rollups():
+    """根据原始活动记录重建全部日汇总，返回汇总行数"""
+    ActivityDailyRollup.query.delete(synchronize_session=False)
+
+    day = func.date(Activity.created_at)
+    source = db.select(
+            day,
+            Activity.user_id,
+            Activity.course_id,
+            Activity.activity_type,
+            func.count(Activity.id),
+            func.coalesce(func.sum(Activity.duration), 0),
+            func.coalesce(func.sum(Activity.score), 0),
+            func.count(Activity.score),
+            func.coalesce(func.sum(case((Activity.completed == True, 1), else_=0)), 0)
+        ) \
+        .where(Activity.created_at.isnot(None)) \
+        .group_by(day, Activity.user_id, Activity.course_id, Activity.activity_type)
+
+    db.session.execute(
+        ActivityDailyRollup.__table__.insert().from_select(KEY_COLUMNS + COUNTER_COLUMNS, source)
+    )
+    db.session.commit()
+
+    return ActivityDailyRollup.query.count()
@@ -0,0 +1,65 @@
+"""
+列表接口的序列化配置
+
+每种模型对应一组查询加载选项（*_OPTIONS，用 joinedload 预加载关联对象）和一个批量序列化函数
+（serialize_*）。选课人数、回复数、提交数读取反范式计数列（见 services.counters），
+其余需要按页统计的数据用一次查询取出后传入 to_dict，列表接口的查询数量因此与返回条数无关。
+
+用法:
+    courses = Course.query.options(*COURSE_OPTIONS).all()
+    data = serialize_courses(courses)
+"""
+
+from sqlalchemy.orm import joinedload
+
+from .. import db
+from ..models import Course, Discussion, DiscussionReply, Assignment, AssignmentSubmission, CourseReview
+
+COURSE_OPTIONS = (joinedload(Course.instructor),)
+ASSIGNMENT_OPTIONS = (joinedload(Assignment.course),)
+DISCUSSION_OPTIONS = (joinedload(Discussion.user),)
+REPLY_OPTIONS = (joinedload(DiscussionReply.user),)
+SUBMISSION_OPTIONS = (joinedload(AssignmentSubmission.user),)
+REVIEW_OPTIONS = (joinedload(CourseReview.user),)
+
+
+def serialize_courses(courses):
+    """授课教师需通过 COURSE_OPTIONS 预加载"""
+    return [course.to_dict() for course in courses]
+
+
+def serialize_assignments(assignments, user_id=None):
+    """user_id 不为空时返回针对该用户的作业状态；所属课程需通过 ASSIGNMENT_OPTIONS 预加载"""
+    assignment_ids = [assignment.id for assignment in assignments]
+
+    submitted_ids = set()
+    if user_id and assignment_ids:
+        submitted_ids = {assignment_id for (assignment_id,) in db.session.query(AssignmentSubmission.assignment_id)
+                         .filter(AssignmentSubmission.user_id == user_id,
+                                 AssignmentSubmission.assignment_id.in_(assignment_ids))
+                         .distinct()}
+
+    return [assignment.to_dict(user_id=user_id, submitted=assignment.id in submitted_ids)
+            for assignment in assignments]
+
+
+def serialize_discussions(discussions):
+    """发帖用户需通过 DISCUSSION_OPTIONS 预加载"""
+    return [discussion.to_dict() for discussion in discussions]
+
+
+def serialize_discussion_with_replies(discussion):
+    """发帖用户需通过 DISCUSSION_OPTIONS 预加载，回复及回复者一次查询取出"""
+    result = discussion.to_dict()
+    result['replies'] = [reply.to_dict() for reply in discussion.replies.options(*REPLY_OPTIONS)]
+    return result
+
+
+def serialize_submissions(submissions):
+    """提交者需通过 SUBMISSION_OPTIONS 预加载"""
+    return [submission.to_dict() for submission in submissions]
+
+
+def serialize_reviews(reviews):
+    """评价者需通过 REVIEW_OPTIONS 预加载"""
+    return [review.to_dict() for review in reviews]
@@ -0,0 +1,286 @@
+"""
+课程分位数草图
+
+把 0-100 范围内的指标按 1/BINS_PER_UNIT 的固定精度分桶计数，每门课程每个指标至多 MAX_BIN+1 个桶，
+中位数、p90 等分位数由桶的累计计数得出，与课程人数和活动数量无关，误差不超过半个桶宽。
+固定分桶可直接相加合并（院系视图一条 GROUP BY 查询合并多门课程），并且支持撤销，
+活动修改、删除时也能精确维护；t-digest/KLL 只支持插入，修改和删除后只能定期全量重建。
+
+指标:
+- activity_score: 课程内每条有得分的活动的得分
+- completion_rate: 课程每个选课学生的活动完成率（完成数/活动数×100，没有活动时为0），
+  与班级表现分析中的 completion_stats 统计同一批学生
+
+草图在 services.rollups 的活动写入路径中与日汇总一起按增量更新，选课、退选和删除用户时
+同步增减完成率；可用 flask sketches rebuild 根据选课名单、活动和日汇总全量重建。
+"""
+
+from collections import defaultdict
+
+from sqlalchemy import func
+
+from .. import db
+from ..models import Activity, ActivityDailyRollup, CourseQuantileSketch, CourseUserActivityCount
+from ..models.course import course_students
+from ..utils.upsert import upsert
+
+ACTIVITY_SCORE = 'activity_score'
+COMPLETION_RATE = 'completion_rate'
+METRICS = (ACTIVITY_SCORE, COMPLETION_RATE)
+
+BINS_PER_UNIT = 10
+MAX_VALUE = 100
+MAX_BIN = MAX_VALUE * BINS_PER_UNIT
+
+DEFAULT_QUANTILES = (0.25, 0.5, 0.75, 0.9)
+
+KEY_COLUMNS = ['course_id', 'metric', 'bin']
+
+# 按(用户, 课程)查询现有计数时每条 IN 查询的用户数
+USER_CHUNK_SIZE = 5000
+
+
+def score_bin(score):
+    """得分所在的分桶，超出 0-100 的得分计入两端的桶"""
+    if score <= 0:
+        return 0
+    if score >= MAX_VALUE:
+        return MAX_BIN
+    return int(score * BINS_PER_UNIT + 0.5)
+
+
+def rate_bin(completed, total):
+    """完成率 completed/total 所在的分桶，没有活动时完成率为0"""
+    if not total:
+        return 0
+    return int(completed * MAX_BIN / total + 0.5)
+
+
+class QuantileSketch:
+    """内存中的分桶草图，可与其他草图合并"""
+
+    def __init__(self, counts=None):
+        self.counts = defaultdict(int)
+        for bin_, count in (counts or {}).items():
+            if count:
+                self.counts[bin_] += count
+
+    @property
+    def count(self):
+        return sum(self.counts.values())
+
+    def add(self, value, count=1):
+        self.counts[score_bin(value)] += count
+
+    def merge(self, other):
+        for bin_, count in other.counts.items():
+            self.counts[bin_] += count
+        return self
+
+    def _value_at(self, bins, rank):
+        """第 rank 个（从0开始）最小值所在桶的代表值"""
+        seen = 0
+        for bin_ in bins:
+            seen += self.counts[bin_]
+            if seen > rank:
+                return bin_ / BINS_PER_UNIT
+        return bins[-1] / BINS_PER_UNIT
+
+    def quantile(self, q):
+        """q 分位数（0-1），相邻两个秩之间线性插值，与 statistics.median 的取法一致；没有数据时返回None"""
+        n = self.count
+        if n <= 0:
+            return None
+        bins = sorted(bin_ for bin_, count in self.counts.items() if count > 0)
+        rank = q * (n - 1)
+        lower = int(rank)
+        low = self._value_at(bins, lower)
+        if rank == lower:
+            return low
+        high = self._value_at(bins, lower + 1)
+        return low + (high - low) * (rank - lower)
+
+    def quantiles(self, qs=DEFAULT_QUANTILES):
+        return {q: self.quantile(q) for q in qs}
+
+
+def percentile_label(q):
+    return f'p{q * 100:g}'
+
+
+def summarize(sketch, qs=DEFAULT_QUANTILES):
+    """草图的数量和各分位数 {'count': n, 'p50': ..., 'p90': ...}"""
+    summary = {'count': sketch.count}
+    for q, value in sketch.quantiles(qs).items():
+        summary[percentile_label(q)] = value
+    return summary
+
+
+def load_sketches(course_ids, metrics=METRICS):
+    """读取多门课程的草图并按桶合并，一条查询，返回 {metric: QuantileSketch}"""
+    course_ids = list(course_ids)
+    sketches = {metric: QuantileSketch() for metric in metrics}
+    if not course_ids:
+        return sketches
+    rows = db.session.query(
+            CourseQuantileSketch.metric, CourseQuantileSketch.bin, func.sum(CourseQuantileSketch.count)
+        ) \
+        .filter(CourseQuantileSketch.course_id.in_(course_ids), CourseQuantileSketch.metric.in_(metrics)) \
+        .group_by(CourseQuantileSketch.metric, CourseQuantileSketch.bin) \
+        .all()
+    for metric, bin_, count in rows:
+        if count:
+            sketches[metric].counts[bin_] += count
+    return sketches
+
+
+# ---- 增量维护 ----
+
+def new_deltas():
+    """{(course_id, metric, bin): 计数增量}"""
+    return defaultdict(int)
+
+
+def add_score_delta(deltas, course_id, score, sign=1):
+    if score is not None:
+        deltas[(course_id, ACTIVITY_SCORE, score_bin(score))] += sign
+
+
+def _enrolled_counts(course_id, user_ids):
+    """课程中已选课的学生当前的 {user_id: (活动数, 完成数)}，未选课的学生不在结果中
+
+    每批一条 course_id = ? AND user_id IN (...) 查询，沿选课表主键和 (course_id, user_id) 唯一索引查找
+    """
+    counts = {}
+    for start in range(0, len(user_ids), USER_CHUNK_SIZE):
+        rows = db.session.execute(
+            db.select(course_students.c.user_id, CourseUserActivityCount.activity_count,
+                      CourseUserActivityCount.completed_count)
+            .select_from(course_students)
+            .outerjoin(CourseUserActivityCount, db.and_(
+                CourseUserActivityCount.course_id == course_students.c.course_id,
+                CourseUserActivityCount.user_id == course_students.c.user_id
+            ))
+            .where(course_students.c.course_id == course_id,
+                   course_students.c.user_id.in_(user_ids[start:start + USER_CHUNK_SIZE]))
+        )
+        for user_id, total, completed in rows:
+            counts[user_id] = (total or 0, completed or 0)
+    return counts
+
+
+def add_completion_rate_deltas(deltas, pair_changes):
+    """根据选课学生的活动数和完成数变化记录完成率的移动，未选课的用户（如教师）不计入
+
+    需在 services.leaderboards 更新 course_user_activity_counts 之前调用；
+    pair_changes 为 {(user_id, course_id): (活动数增量, 完成数增量)}
+    """
+    users_by_course = defaultdict(list)
+    for (user_id, course_id), change in pair_changes.items():
+        if any(change):
+            users_by_course[course_id].append(user_id)
+
+    for course_id, user_ids in users_by_course.items():
+        for user_id, (total, completed) in _enrolled_counts(course_id, user_ids).items():
+            total_delta, completed_delta = pair_changes[(user_id, course_id)]
+            deltas[(course_id, COMPLETION_RATE, rate_bin(completed, total))] -= 1
+            deltas[(course_id, COMPLETION_RATE,
+                    rate_bin(completed + completed_delta, total + total_delta))] += 1
+
+
+def _enrollment_deltas(course_id, user_ids, sign):
+    """选课(sign=1)或退选(sign=-1)的学生按当前活动计数增减完成率"""
+    counts = {}
+    for start in range(0, len(user_ids), USER_CHUNK_SIZE):
+        rows = db.session.execute(
+            db.select(CourseUserActivityCount.user_id, CourseUserActivityCount.activity_count,
+                      CourseUserActivityCount.completed_count)
+            .where(CourseUserActivityCount.course_id == course_id,
+                   CourseUserActivityCount.user_id.in_(user_ids[start:start + USER_CHUNK_SIZE]))
+        )
+        for user_id, total, completed in rows:
+            counts[user_id] = (total, completed)
+
+    deltas = new_deltas()
+    for user_id in user_ids:
+        total, completed = counts.get(user_id, (0, 0))
+        deltas[(course_id, COMPLETION_RATE, rate_bin(completed, total))] += sign
+    return deltas
+
+
+def students_enrolled(course_id, user_ids):
+    """学生选课后计入完成率草图，不提交事务"""
+    apply_sketch_deltas(_enrollment_deltas(course_id, list(user_ids), 1))
+
+
+def students_dropped(course_id, user_ids):
+    """学生退选后移出完成率草图，不提交事务"""
+    apply_sketch_deltas(_enrollment_deltas(course_id, list(user_ids), -1))
+
+
+def user_removed(user_id):
+    """删除用户前调用，从其选修的各门课程的完成率草图中移除"""
+    deltas = new_deltas()
+    rows = db.session.execute(
+        db.select(course_students.c.course_id, CourseUserActivityCount.activity_count,
+                  CourseUserActivityCount.completed_count)
+        .select_from(course_students)
+        .outerjoin(CourseUserActivityCount, db.and_(
+            CourseUserActivityCount.course_id == course_students.c.course_id,
+            CourseUserActivityCount.user_id == course_students.c.user_id
+        ))
+        .where(course_students.c.user_id == user_id)
+    )
+    for course_id, total, completed in rows:
+        deltas[(course_id, COMPLETION_RATE, rate_bin(completed or 0, total or 0))] -= 1
+    apply_sketch_deltas(deltas)
+
+
+def apply_sketch_deltas(deltas):
+    """将增量累加到草图表，不提交事务"""
+    rows = [
+        {'course_id': course_id, 'metric': metric, 'bin': bin_, 'count': count}
+        for (course_id, metric, bin_), count in deltas.items() if count
+    ]
+    upsert(CourseQuantileSketch.__table__, rows, KEY_COLUMNS, ['count'], increment=True)
+
+    # 撤销后可能留下计数为0的桶
+    shrunk = {row['course_id'] for row in rows if row['count'] < 0}
+    if shrunk:
+        CourseQuantileSketch.query.filter(
+            CourseQuantileSketch.count <= 0,
+            CourseQuantileSketch.course_id.in_(shrunk)
+        ).delete(synchronize_session=False)
+
+
+# ---- 全量重建 ----
+
+def rebuild_sketches():
+    """根据活动记录和日汇总重建全部草图，返回草图桶数"""
+    CourseQuantileSketch.query.delete(synchronize_session=False)
+    deltas = new_deltas()
+
+    scores = db.session.query(Activity.course_id, Activity.score, func.count()) \
+        .filter(Activity.score.isnot(None)) \
+        .group_by(Activity.course_id, Activity.score)
+    for course_id, score, count in scores:
+        deltas[(course_id, ACTIVITY_SCORE, score_bin(score))] += count
+
+    totals = db.session.query(
+            ActivityDailyRollup.user_id,
+            ActivityDailyRollup.course_id,
+            func.sum(ActivityDailyRollup.activity_count).label('total'),
+            func.sum(ActivityDailyRollup.completed_count).label('completed')
+        ) \
+        .group_by(ActivityDailyRollup.user_id, ActivityDailyRollup.course_id) \
+        .subquery()
+    rates = db.session.query(course_students.c.course_id, totals.c.total, totals.c.completed) \
+        .outerjoin(totals, db.and_(totals.c.course_id == course_students.c.course_id,
+                                   totals.c.user_id == course_students.c.user_id))
+    for course_id, total, completed in rates:
+        deltas[(course_id, COMPLETION_RATE, rate_bin(completed or 0, total or 0))] += 1
+
+    apply_sketch_deltas(deltas)
+    db.session.commit()
+
+    return CourseQuantileSketch.query.count()
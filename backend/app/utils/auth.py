@@ -1,61 +1,176 @@
 from functools import wraps
-from flask import request, jsonify
+from flask import request, jsonify, current_app
+from .. import db
 from ..models import User
 import jwt
+import logging
 import os
+import threading
+import time
 
 # 获取密钥，保持与auth.py中相同
 SECRET_KEY = os.environ.get('SECRET_KEY', 'dev_secret_key')
 
+# 认证日志默认不输出，需要排查时将 app.utils.auth 的日志级别设为 DEBUG
+logger = logging.getLogger(__name__)
+
+
+class Principal:
+    """已验证的请求身份，只包含鉴权需要的字段，不绑定数据库会话"""
+
+    __slots__ = ('id', 'account', 'username', 'role')
+
+    def __init__(self, id, account, username, role):
+        self.id = id
+        self.account = account
+        self.username = username
+        self.role = role
+
+    @classmethod
+    def from_user(cls, user):
+        return cls(user.id, user.account, user.username, user.role)
+
+
+class PrincipalCache:
+    """按 (用户ID, 令牌签发时间iat) 缓存已验证的身份
+
+    - 条目在 TTL 后过期，过期前用户被修改或删除时由 invalidate() 显式失效
+    - invalidate() 同时记录失效时间，此前签发的令牌不再直接信任其中的角色声明
+    - 缓存在进程内，多进程部署时其他进程最多在 TTL 内读到旧身份
+    """
+
+    def __init__(self):
+        self._entries = {}  # user_id -> {iat: (principal, expires_at)}
+        self._size = 0
+        self._invalidated = {}  # user_id -> 失效时间（秒）
+        self._lock = threading.Lock()
+
+    def get(self, user_id, iat):
+        with self._lock:
+            entry = self._entries.get(user_id, {}).get(iat)
+        if entry is None or entry[1] <= time.monotonic():
+            return None
+        return entry[0]
+
+    def put(self, principal, iat, ttl, max_entries):
+        with self._lock:
+            if self._size >= max_entries:
+                self._evict(max_entries)
+            tokens = self._entries.setdefault(principal.id, {})
+            if iat not in tokens:
+                self._size += 1
+            tokens[iat] = (principal, time.monotonic() + ttl)
+
+    def _evict(self, max_entries):
+        """先清理过期条目，仍然超限时清空"""
+        now = time.monotonic()
+        for user_id in list(self._entries):
+            tokens = self._entries[user_id]
+            for iat in [iat for iat, (_, expires_at) in tokens.items() if expires_at <= now]:
+                del tokens[iat]
+                self._size -= 1
+            if not tokens:
+                del self._entries[user_id]
+        if self._size >= max_entries:
+            self._entries.clear()
+            self._size = 0
+
+    def invalidate(self, user_id):
+        """用户被修改或删除后调用，使其所有令牌对应的缓存身份失效"""
+        with self._lock:
+            self._size -= len(self._entries.pop(user_id, {}))
+            self._invalidated[user_id] = time.time()
+
+    def invalidated_since(self, user_id, iat):
+        """令牌是否签发于该用户最近一次失效之前（无iat的令牌视为旧令牌）"""
+        invalidated_at = self._invalidated.get(user_id)
+        return invalidated_at is not None and (iat is None or iat <= invalidated_at)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._invalidated.clear()
+            self._size = 0
+
+
+def principal_cache():
+    """当前应用的身份缓存"""
+    return current_app.extensions.setdefault('principal_cache', PrincipalCache())
+
+
+def invalidate_principal(user_id):
+    """用户信息（角色、密码等）修改或用户删除后调用"""
+    principal_cache().invalidate(user_id)
+
+
+def _auth_error(message):
+    return jsonify({
+        'status': 'error',
+        'message': message
+    }), 401
+
+
+def resolve_principal(payload):
+    """由已验证的令牌载荷得到请求身份，用户不存在时返回None
+
+    - AUTH_TRUST_TOKEN_ROLE 开启且令牌带角色声明时直接使用令牌中的身份，不访问数据库；
+      用户在令牌签发后被修改或删除过的，回退到下面的查询
+    - 否则先查身份缓存，未命中再查询用户并缓存 AUTH_PRINCIPAL_CACHE_TTL 秒
+    """
+    config = current_app.config
+    cache = principal_cache()
+    user_id = payload['user_id']
+    iat = payload.get('iat')
+
+    if config['AUTH_TRUST_TOKEN_ROLE'] and 'role' in payload and not cache.invalidated_since(user_id, iat):
+        return Principal(user_id, payload.get('account'), payload.get('username'), payload['role'])
+
+    ttl = config['AUTH_PRINCIPAL_CACHE_TTL']
+    if ttl > 0:
+        principal = cache.get(user_id, iat)
+        if principal is not None:
+            return principal
+
+    user = db.session.get(User, user_id)
+    if not user:
+        return None
+    principal = Principal.from_user(user)
+    if ttl > 0:
+        cache.put(principal, iat, ttl, config['AUTH_PRINCIPAL_CACHE_MAX_ENTRIES'])
+    return principal
+
+
 def authenticate(f):
     """身份验证装饰器"""
     @wraps(f)
     def decorated(*args, **kwargs):
-        print(f"认证开始: {request.path}")
         auth_header = request.headers.get('Authorization')
         if not auth_header or not auth_header.startswith('Bearer '):
-            print(f"认证失败: 未提供有效令牌 - {request.path}")
-            return jsonify({
-                'status': 'error',
-                'message': '未提供有效的认证令牌'
-            }), 401
-        
+            logger.info('认证失败: 未提供有效令牌 - %s', request.path)
+            return _auth_error('未提供有效的认证令牌')
+
         token = auth_header.split(' ')[1]
-        print(f"获取令牌: {token[:10]}... - {request.path}")
-        
+
         try:
             # 使用JWT解码令牌
             payload = jwt.decode(token, SECRET_KEY, algorithms=['HS256'])
-            user_id = payload['user_id']
-            role = payload.get('role', 'unknown')
-            print(f"令牌解码成功: 用户ID={user_id}, 角色={role} - {request.path}")
-            
-            # 检查用户是否存在
-            user = User.query.get(user_id)
-            if not user:
-                print(f"认证失败: 用户不存在(ID={user_id}) - {request.path}")
-                return jsonify({
-                    'status': 'error',
-                    'message': '认证失败：用户不存在'
-                }), 401
-            
-            print(f"认证成功: 用户={user.username}, 角色={user.role} - {request.path}")
-            # 将用户信息添加到请求上下文
-            request.current_user = user
-            
-            return f(*args, **kwargs)
+            principal = resolve_principal(payload)
         except jwt.ExpiredSignatureError:
-            print(f"认证失败: 令牌已过期 - {request.path}")
-            return jsonify({
-                'status': 'error',
-                'message': '认证令牌已过期'
-            }), 401
-        except (jwt.InvalidTokenError, Exception) as e:
-            print(f"认证失败: 令牌无效 - {str(e)} - {request.path}")
-            return jsonify({
-                'status': 'error',
-                'message': f'无效的认证令牌: {str(e)}'
-            }), 401
+            logger.info('认证失败: 令牌已过期 - %s', request.path)
+            return _auth_error('认证令牌已过期')
+        except (jwt.InvalidTokenError, KeyError) as e:
+            logger.info('认证失败: 令牌无效 - %s - %s', e, request.path)
+            return _auth_error(f'无效的认证令牌: {str(e)}')
+
+        if principal is None:
+            logger.info('认证失败: 用户不存在(ID=%s) - %s', payload['user_id'], request.path)
+            return _auth_error('认证失败：用户不存在')
+
+        logger.debug('认证成功: 用户=%s, 角色=%s - %s', principal.username, principal.role, request.path)
+        # 将用户信息添加到请求上下文
+        request.current_user = principal
+
+        return f(*args, **kwargs)
     return decorated
 
 def require_role(role):
@@ -65,22 +180,21 @@ def require_role(role):
         def decorated_function(*args, **kwargs):
             # 确保用户已认证
             if not hasattr(request, 'current_user'):
-                print(f"权限检查失败: 用户未认证 - {request.path}")
+                logger.info('权限检查失败: 用户未认证 - %s', request.path)
                 return jsonify({
                     'status': 'error',
                     'message': '请先进行身份验证'
                 }), 401
-            
+
             # 检查角色
-            print(f"检查权限: 用户={request.current_user.username}, 角色={request.current_user.role}, 需要角色={role} - {request.path}")
             if request.current_user.role != role and request.current_user.role != 'admin':
-                print(f"权限检查失败: 用户={request.current_user.username}, 角色={request.current_user.role}, 需要角色={role} - {request.path}")
+                logger.info('权限检查失败: 用户=%s, 角色=%s, 需要角色=%s - %s',
+                            request.current_user.username, request.current_user.role, role, request.path)
                 return jsonify({
                     'status': 'error',
                     'message': f'需要 {role} 角色权限'
                 }), 403
-            
-            print(f"权限检查通过: 用户={request.current_user.username}, 角色={request.current_user.role} - {request.path}")
+
             return f(*args, **kwargs)
         return decorated_function
-    return decorator 
\ No newline at end of file
+    return decorator
@@ -0,0 +1,51 @@
+from functools import wraps
+import hashlib
+import time
+
+from flask import current_app, request, Response
+
+from .. import analytics_cache
+
+
+def etag_versions(tags):
+    """基于数据版本号的条件响应装饰器
+
+    tags 接收视图的路由参数，返回响应所依赖的版本标签列表（见 services.cache.table_tag）。
+    ETag 只由版本号计算，不需要先生成响应内容；请求的 If-None-Match 命中时
+    直接返回304，跳过数据库查询和序列化。
+
+    缓存后端不在进程间共享时，ETag 另含按 ANALYTICS_CACHE_TTL 划分的时间段，
+    其他进程的写入最多在一个TTL后生效。
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            if not current_app.config.get('ETAG_ENABLED', True):
+                return f(*args, **kwargs)
+
+            backend = analytics_cache.backend
+            view_tags = tags(**kwargs)
+            versions = backend.get_versions(view_tags)
+            epoch = backend.epoch
+            if not getattr(backend, 'shared', False):
+                epoch += f":{int(time.time() // max(current_app.config['ANALYTICS_CACHE_TTL'], 1))}"
+            source = '|'.join([
+                request.endpoint,
+                ','.join(f'{k}={v}' for k, v in sorted(kwargs.items())),
+                ','.join(f'{k}={v}' for k, v in sorted(request.args.items(multi=True))),
+                epoch,
+                ','.join(f'{tag}@{version}' for tag, version in zip(view_tags, versions))
+            ])
+            etag = hashlib.sha1(source.encode('utf-8')).hexdigest()
+
+            if etag in request.if_none_match:
+                response = Response(status=304)
+                response.set_etag(etag)
+                return response
+
+            response = current_app.make_response(f(*args, **kwargs))
+            if response.status_code == 200:
+                response.set_etag(etag)
+            return response
+        return decorated
+    return decorator
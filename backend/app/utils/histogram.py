@@ -0,0 +1,65 @@
+"""
+分布直方图
+
+分桶配置是 [(标签, 上界), ...] 列表，按上界递增排列：值小于等于上界即落入该桶，
+最后一个桶的上界为 None，表示收纳其余所有值。
+histogram() 在数据库中用 CASE 表达式分桶并 GROUP BY，只取回每个桶一行；
+已经把数值取到内存中时用 bucket_counts() 按同一配置计数。
+"""
+
+from bisect import bisect_left
+
+from sqlalchemy import case, func
+
+from .. import db
+
+PERCENT_BUCKETS = [('0-20%', 20), ('21-40%', 40), ('41-60%', 60), ('61-80%', 80), ('81-100%', None)]
+
+
+def _upper_edges(buckets):
+    edges = [upper for _, upper in buckets[:-1]]
+    if not buckets or buckets[-1][1] is not None:
+        raise ValueError('最后一个分桶的上界必须为 None')
+    if None in edges or any(a >= b for a, b in zip(edges, edges[1:])):
+        raise ValueError('分桶上界必须递增')
+    return edges
+
+
+def empty_histogram(buckets):
+    return {label: 0 for label, _ in buckets}
+
+
+def bucket_index(value, buckets):
+    """value 所属分桶序号的SQL表达式"""
+    edges = _upper_edges(buckets)
+    if not edges:
+        return db.literal(0)
+    return case(*[(value <= upper, i) for i, upper in enumerate(edges)], else_=len(edges))
+
+
+def histogram(value, buckets, *criteria):
+    """在数据库中统计 value 的分布，返回 {标签: 数量}
+
+    value 为列或SQL表达式，FROM 子句由其推断；criteria 为附加的过滤条件。
+    值为 NULL 的行不计入，需要计入时由调用方用 coalesce 指定替代值
+    """
+    index = bucket_index(value, buckets).label('bucket')
+    rows = db.session.query(index, func.count()) \
+        .filter(value.isnot(None), *criteria) \
+        .group_by(index) \
+        .all()
+
+    result = empty_histogram(buckets)
+    for i, count in rows:
+        result[buckets[i][0]] = count
+    return result
+
+
+def bucket_counts(values, buckets):
+    """按与 histogram() 相同的分桶规则统计内存中的数值，忽略 None"""
+    edges = _upper_edges(buckets)
+    result = empty_histogram(buckets)
+    for value in values:
+        if value is not None:
+            result[buckets[bisect_left(edges, value)][0]] += 1
+    return result
@@ -0,0 +1,32 @@
+import base64
+import json
+from datetime import datetime
+
+
+class InvalidCursor(ValueError):
+    """分页游标无法解析"""
+
+
+def encode_cursor(created_at, row_id):
+    """将 (created_at, id) 编码为不透明的分页游标"""
+    payload = json.dumps({'t': created_at.isoformat() if created_at else None, 'i': row_id},
+                         separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """解析分页游标，返回 (created_at, id)"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        created_at = datetime.fromisoformat(payload['t']) if payload['t'] else None
+        return created_at, int(payload['i'])
+    except (ValueError, KeyError, TypeError) as e:
+        raise InvalidCursor(str(e))
+
+
+def parse_datetime_arg(value):
+    """解析ISO格式的时间查询参数，未提供时返回None"""
+    if not value:
+        return None
+    return datetime.fromisoformat(value)
@@ -0,0 +1,182 @@
+"""
+每请求SQL语句预算
+
+用 @query_budget(n) 标注路由最多执行的SQL语句数（含认证查询），
+预算应与数据规模无关，超出通常意味着出现了逐条查询（N+1）。
+
+QUERY_BUDGET_MODE:
+- 'off'（默认）：不统计
+- 'report'（预发布环境）：响应带 X-Query-Count 和 X-Query-Budget 头，超出预算时记录警告日志和语句列表
+- 'enforce'（测试、CI）：在 report 的基础上，超出预算的请求抛出 QueryBudgetExceeded
+
+未标注的路由使用 QUERY_BUDGET_DEFAULT（None 表示不限）。
+pytest 中使用 app.utils.query_budget_pytest 插件，超出预算的测试失败并列出执行的语句。
+"""
+
+import logging
+import threading
+from contextlib import contextmanager
+
+from flask import current_app, g, request, has_app_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+MODES = ('off', 'report', 'enforce')
+
+STATEMENT_MAX_LENGTH = 1000
+
+
+class QueryBudgetExceeded(Exception):
+    """请求执行的SQL语句数超出预算"""
+
+    def __init__(self, violation):
+        self.violation = violation
+        super().__init__(format_violation(violation))
+
+
+def query_budget(max_queries):
+    """标注视图最多执行的SQL语句数，放在 @api_bp.route 下方"""
+    def decorator(f):
+        # 外层装饰器经 functools.wraps 复制 __dict__，属性会保留在最终注册的视图上
+        f.query_budget = max_queries
+        return f
+    return decorator
+
+
+def format_violation(violation):
+    lines = [
+        f"{violation['method']} {violation['path']} ({violation['endpoint']}) "
+        f"执行了 {violation['count']} 条SQL语句，预算 {violation['budget']} 条:"
+    ]
+    lines += [f'  {index}. {statement}' for index, statement in enumerate(violation['statements'], 1)]
+    return '\n'.join(lines)
+
+
+# ---- 违规监听：供 pytest 插件收集 ----
+
+_listeners = []
+_listeners_lock = threading.Lock()
+
+
+def add_violation_listener(callback):
+    with _listeners_lock:
+        _listeners.append(callback)
+
+
+def remove_violation_listener(callback):
+    with _listeners_lock:
+        _listeners.remove(callback)
+
+
+def _notify(violation):
+    with _listeners_lock:
+        listeners = list(_listeners)
+    for callback in listeners:
+        callback(violation)
+
+
+# ---- 语句计数 ----
+
+class StatementRecorder:
+    """记录执行的SQL语句"""
+
+    def __init__(self):
+        self.statements = []
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    def add(self, statement):
+        self.statements.append(statement[:STATEMENT_MAX_LENGTH])
+
+
+_recorders = threading.local()
+_hook_registered = False
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    for recorder in getattr(_recorders, 'stack', ()):
+        recorder.add(statement)
+    if has_app_context():
+        recorder = g.get('_query_budget')
+        if recorder is not None:
+            recorder.add(statement)
+
+
+def _register_hook():
+    global _hook_registered
+    if not _hook_registered:
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        _hook_registered = True
+
+
+@contextmanager
+def record_statements():
+    """记录上下文中当前线程执行的SQL语句，用于请求之外的代码"""
+    _register_hook()
+    recorder = StatementRecorder()
+    stack = _recorders.__dict__.setdefault('stack', [])
+    stack.append(recorder)
+    try:
+        yield recorder
+    finally:
+        stack.remove(recorder)
+
+
+# ---- 请求钩子 ----
+
+def _view_budget():
+    view = current_app.view_functions.get(request.endpoint)
+    budget = getattr(view, 'query_budget', None)
+    if budget is None:
+        budget = current_app.config['QUERY_BUDGET_DEFAULT']
+    return budget
+
+
+def _start_request():
+    g._query_budget = StatementRecorder()
+
+
+def _check_budget(response):
+    recorder = g.pop('_query_budget', None)
+    if recorder is None:
+        return response
+    response.headers['X-Query-Count'] = str(recorder.count)
+    budget = _view_budget() if request.endpoint else None
+    if budget is None:
+        return response
+    response.headers['X-Query-Budget'] = str(budget)
+    if recorder.count <= budget:
+        return response
+
+    violation = {
+        'endpoint': request.endpoint,
+        'method': request.method,
+        'path': request.full_path.rstrip('?'),
+        'budget': budget,
+        'count': recorder.count,
+        'statements': recorder.statements
+    }
+    logger.warning('%s', format_violation(violation))
+    _notify(violation)
+    if current_app.config['QUERY_BUDGET_MODE'] == 'enforce':
+        raise QueryBudgetExceeded(violation)
+    return response
+
+
+def register_query_budget(app):
+    """按 QUERY_BUDGET_MODE 注册请求钩子"""
+    app.config.setdefault('QUERY_BUDGET_MODE', 'off')
+    app.config.setdefault('QUERY_BUDGET_DEFAULT', None)
+
+    mode = app.config['QUERY_BUDGET_MODE']
+    if mode not in MODES:
+        raise ValueError(f'QUERY_BUDGET_MODE 只能是 {", ".join(MODES)} 之一，当前为 {mode!r}')
+    if mode == 'off':
+        return
+    _register_hook()
+    app.before_request(_start_request)
+    app.after_request(_check_budget)
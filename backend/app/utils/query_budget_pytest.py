@@ -0,0 +1,73 @@
+"""
+SQL语句预算 pytest 插件
+
+启用: pytest -p app.utils.query_budget_pytest，或在 conftest.py 中写 pytest_plugins = ['app.utils.query_budget_pytest']
+
+- 未设置 QUERY_BUDGET_MODE 环境变量时设为 enforce，--query-budget 选项可覆盖；
+  配置在 create_app 时读取，插件需在创建应用之前加载
+- 测试期间有请求超出预算时测试失败，并列出该请求执行的SQL语句
+  （report 模式或视图的异常被捕获时同样失败）
+- @pytest.mark.query_budget(n): 测试函数本身（不含夹具）最多执行 n 条SQL语句
+- 夹具 assert_max_queries: with assert_max_queries(n): ...
+"""
+
+import os
+from contextlib import contextmanager
+
+import pytest
+
+from . import query_budget
+
+
+def pytest_addoption(parser):
+    parser.addoption('--query-budget', choices=query_budget.MODES, default=None,
+                     help='每请求SQL语句预算模式，默认为 QUERY_BUDGET_MODE 环境变量或 enforce')
+
+
+def pytest_configure(config):
+    mode = config.getoption('--query-budget')
+    if mode:
+        os.environ['QUERY_BUDGET_MODE'] = mode
+    else:
+        os.environ.setdefault('QUERY_BUDGET_MODE', 'enforce')
+    config.addinivalue_line('markers', 'query_budget(n): 测试函数最多执行 n 条SQL语句')
+
+
+def _statement_report(header, statements):
+    lines = [header]
+    lines += [f'  {index}. {statement}' for index, statement in enumerate(statements, 1)]
+    return '\n'.join(lines)
+
+
+@pytest.hookimpl(wrapper=True)
+def pytest_runtest_call(item):
+    violations = []
+    marker = item.get_closest_marker('query_budget')
+    query_budget.add_violation_listener(violations.append)
+    try:
+        # 测试本身失败时异常直接向上传递
+        with query_budget.record_statements() as recorder:
+            result = yield
+    finally:
+        query_budget.remove_violation_listener(violations.append)
+
+    if violations:
+        pytest.fail('\n\n'.join(query_budget.format_violation(violation) for violation in violations),
+                    pytrace=False)
+    if marker is not None and recorder.count > marker.args[0]:
+        pytest.fail(_statement_report(f'测试执行了 {recorder.count} 条SQL语句，预算 {marker.args[0]} 条:',
+                                      recorder.statements), pytrace=False)
+    return result
+
+
+@pytest.fixture
+def assert_max_queries():
+    """with assert_max_queries(n): 代码块最多执行 n 条SQL语句"""
+    @contextmanager
+    def check(max_queries):
+        with query_budget.record_statements() as recorder:
+            yield recorder
+        if recorder.count > max_queries:
+            pytest.fail(_statement_report(f'执行了 {recorder.count} 条SQL语句，预算 {max_queries} 条:',
+                                          recorder.statements), pytrace=False)
+    return check
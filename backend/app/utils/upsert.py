@@ -0,0 +1,51 @@
+from .. import db
+
+
+def upsert(table, rows, index_elements, update_columns, increment=False):
+    """按唯一键批量插入或更新
+
+    - SQLite/MySQL 使用原生的 ON CONFLICT / ON DUPLICATE KEY 语句，一条语句完成
+    - 其他数据库逐行先更新，未命中再插入
+    - increment=True 时冲突行的 update_columns 在原值上累加，否则直接覆盖
+    """
+    if not rows:
+        return
+
+    dialect = db.session.get_bind().dialect.name
+
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+        stmt = insert(table)
+        new_values = stmt.excluded
+    elif dialect == 'mysql':
+        from sqlalchemy.dialects.mysql import insert
+        stmt = insert(table)
+        new_values = stmt.inserted
+    else:
+        _upsert_fallback(table, rows, index_elements, update_columns, increment)
+        return
+
+    if increment:
+        set_ = {name: table.c[name] + new_values[name] for name in update_columns}
+    else:
+        set_ = {name: new_values[name] for name in update_columns}
+
+    if dialect == 'sqlite':
+        stmt = stmt.on_conflict_do_update(index_elements=index_elements, set_=set_)
+    else:
+        stmt = stmt.on_duplicate_key_update(set_)
+
+    db.session.execute(stmt, rows)
+
+
+def _upsert_fallback(table, rows, index_elements, update_columns, increment):
+    """不支持原生upsert的数据库：逐行更新，未命中时插入"""
+    for row in rows:
+        condition = db.and_(*[table.c[name] == row[name] for name in index_elements])
+        if increment:
+            values = {name: table.c[name] + row[name] for name in update_columns}
+        else:
+            values = {name: row[name] for name in update_columns}
+        result = db.session.execute(table.update().where(condition).values(values))
+        if result.rowcount == 0:
+            db.session.execute(table.insert().values(row))
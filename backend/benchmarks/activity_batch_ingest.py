@@ -0,0 +1,107 @@
+"""
+活动批量上报吞吐基准
+
+构造一门课程和一批选课学生，通过 POST /api/activities/batch 上报 video_watch 心跳事件，
+测量单进程每秒写入的事件数，并核对日汇总表与原始活动记录一致。
+
+用法: python benchmarks/activity_batch_ingest.py [--events 100000] [--batch 5000] [--target 15000]
+"""
+
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+from common import create_bench_app, count_queries
+
+
+def seed(db, student_count=500):
+    from app.models import User, Course
+    from app.models.course import course_students
+
+    course = Course(title='视频课程')
+    db.session.add(course)
+    db.session.flush()
+
+    now = datetime.utcnow()
+    db.session.execute(User.__table__.insert(), [
+        {'account': f'viewer{i}', 'username': f'学生{i}', 'email': f'viewer{i}@example.com',
+         'password_hash': 'x', 'role': 'student', 'created_at': now, 'updated_at': now}
+        for i in range(student_count)
+    ])
+    student_ids = [uid for (uid,) in db.session.query(User.id).filter(User.role == 'student').all()]
+    db.session.execute(course_students.insert(), [
+        {'course_id': course.id, 'user_id': uid, 'enrolled_at': now} for uid in student_ids
+    ])
+    db.session.commit()
+    return course.id, student_ids
+
+
+def make_events(rng, course_id, student_ids, count, start):
+    """生成一批心跳事件，时间戳落在 start 之后的一小时内（与实时上报的顺序接近）"""
+    return [{
+        'user_id': rng.choice(student_ids),
+        'course_id': course_id,
+        'activity_type': 'video_watch',
+        'resource_id': f'video-{rng.randint(1, 40)}',
+        'duration': 10,
+        'completed': rng.random() < 0.05,
+        'metadata': {'position': rng.randint(0, 3600)},
+        'timestamp': (start + timedelta(seconds=rng.randint(0, 3600))).isoformat()
+    } for _ in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='活动批量上报吞吐基准')
+    parser.add_argument('--events', type=int, default=100000)
+    parser.add_argument('--batch', type=int, default=5000)
+    parser.add_argument('--target', type=int, default=15000, help='要求的最低吞吐（事件/秒）')
+    args = parser.parse_args()
+
+    import json
+    from sqlalchemy import func
+    from app import db
+    from app.models import Activity, ActivityDailyRollup
+
+    app = create_bench_app()
+    client = app.test_client()
+    rng = random.Random(args.events)
+
+    with app.app_context():
+        course_id, student_ids = seed(db)
+        db.session.remove()
+
+        start = datetime.utcnow() - timedelta(days=7)
+        batches = [make_events(rng, course_id, student_ids, min(args.batch, args.events - offset),
+                               start + timedelta(hours=offset // args.batch))
+                   for offset in range(0, args.events, args.batch)]
+        # 混入一个未选课用户的事件，验证逐条错误返回
+        batches[0].append({'user_id': -1, 'course_id': course_id, 'activity_type': 'video_watch'})
+
+        # 请求体预先序列化，只计服务端处理时间
+        bodies = [json.dumps({'events': batch}) for batch in batches]
+
+        elapsed = 0.0
+        inserted = 0
+        with count_queries(db.engine) as counter:
+            for body in bodies:
+                start = time.perf_counter()
+                response = client.post('/api/activities/batch', data=body, content_type='application/json')
+                elapsed += time.perf_counter() - start
+                assert response.status_code == 201, response.data
+                payload = response.get_json()
+                inserted += payload['inserted']
+        assert inserted == args.events, f'写入 {inserted} 条，预期 {args.events} 条'
+
+        rate = inserted / elapsed
+        print(f'{inserted} 条事件, {len(batches)} 个批次, SQL语句 {counter.count} 条, '
+              f'耗时 {elapsed:.2f} s, 吞吐 {rate:.0f} 事件/秒')
+
+        rolled_up = db.session.query(func.sum(ActivityDailyRollup.activity_count)).scalar()
+        assert rolled_up == Activity.query.count() == inserted, '日汇总与活动记录数量不一致'
+        assert rate >= args.target, f'吞吐 {rate:.0f} 事件/秒 低于目标 {args.target}'
+        print('通过: 吞吐达标，日汇总与活动记录一致')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,258 @@
+"""
+接口基准套件
+
+在合成数据集上通过 Flask 测试客户端请求全部 /analytics/* 接口、课程成绩接口、学习进度接口和活动上报接口，
+每个用例预热一次后重复 --repeat 次，统计 p50/p95 延迟和SQL语句数，结果写入 JSON 基线文件；
+--compare 与另一次提交生成的基线对比，p95 延迟或SQL语句数回归时以非零状态退出。
+
+- 关闭分析缓存和 ETag，测量的是每次都查询数据库的路径
+- 上报和进度更新用例会写入数据，--reuse 重复使用同一数据库时活动数会略有增长
+- 仓库没有 pytest 测试套件（也未安装 pytest-benchmark），因此与其他基准一样实现为独立脚本
+
+用法:
+    python benchmarks/api_suite.py --scale small --db /tmp/bench.db --output baseline.json
+    python benchmarks/api_suite.py --db /tmp/bench.db --reuse --output new.json --compare baseline.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+from common import create_bench_app, count_queries
+from synthetic_data import ADMIN_ACCOUNT, ADMIN_PASSWORD, add_scale_arguments, generate, scale_params
+
+# 上报批量接口每次请求的事件数
+BATCH_EVENTS = 100
+
+# 对比时小于该值的 p95 变化视为噪声（毫秒）
+MIN_REGRESSION_MS = 1.0
+
+
+def create_suite_app(db_path, reuse):
+    """创建测量用的应用，reuse 为 False 时清空数据库"""
+    os.environ.update(ANALYTICS_CACHE_ENABLED='0', ETAG_ENABLED='0', ACTIVITY_BUFFER_ENABLED='0',
+                      INSTRUMENTATION_TRACE_SAMPLE_RATE='0', INSTRUMENTATION_SLOW_QUERY_MS='0')
+    if not reuse:
+        return create_bench_app(db_path)
+
+    from app import create_app
+
+    os.environ['DATABASE_URL'] = f'sqlite:///{db_path}'
+    app = create_app('development')
+    app.config['DEBUG'] = False
+    return app
+
+
+def sample_ids(db):
+    """选取活动最多的课程及其中一名有资源进度的学生"""
+    from app.models import CourseResource, CourseSection, ResourceProgress
+    from app.models.course import course_students
+    from app.services import leaderboards
+
+    top = leaderboards.top_courses(limit=5)
+    assert top, '数据库中没有活动记录，请先生成数据'
+    course_id = top[0][0]
+
+    student_id, resource_id = db.session.query(ResourceProgress.user_id, ResourceProgress.resource_id) \
+        .join(CourseResource, CourseResource.id == ResourceProgress.resource_id) \
+        .join(CourseSection, CourseSection.id == CourseResource.section_id) \
+        .join(course_students, db.and_(course_students.c.course_id == CourseSection.course_id,
+                                       course_students.c.user_id == ResourceProgress.user_id)) \
+        .filter(CourseSection.course_id == course_id, ResourceProgress.completed == True) \
+        .order_by(ResourceProgress.id) \
+        .first()
+    members = [user_id for (user_id,) in db.session.query(course_students.c.user_id)
+               .filter(course_students.c.course_id == course_id)
+               .order_by(course_students.c.user_id)
+               .limit(BATCH_EVENTS)]
+    return {
+        'course_id': course_id,
+        'course_ids': ','.join(str(row[0]) for row in top),
+        'student_id': student_id,
+        'resource_id': resource_id,
+        'members': members
+    }
+
+
+def _event(user_id, course_id, index):
+    return {
+        'user_id': user_id, 'course_id': course_id, 'activity_type': 'quiz',
+        'duration': 60 + index % 300, 'score': float(index % 101), 'completed': True
+    }
+
+
+def build_cases(ids):
+    """(名称, 方法, URL, 请求体生成函数)，请求体函数的参数为第几次请求"""
+    c, s, r = ids['course_id'], ids['student_id'], ids['resource_id']
+    members = ids['members']
+    return [
+        ('analytics.user', 'GET', f'/api/analytics/user/{s}', None),
+        ('analytics.course', 'GET', f'/api/analytics/course/{c}', None),
+        ('analytics.overview', 'GET', '/api/analytics/overview', None),
+        ('analytics.student_learning', 'GET', f'/api/analytics/student-learning/{s}', None),
+        ('analytics.class_performance', 'GET', f'/api/analytics/class-performance/{c}', None),
+        ('analytics.course_percentiles', 'GET', f'/api/analytics/course/{c}/percentiles', None),
+        ('analytics.percentiles', 'GET', f"/api/analytics/percentiles?course_ids={ids['course_ids']}", None),
+        ('grades.course', 'GET', f'/api/courses/{c}/grades', None),
+        ('grades.export', 'GET', f'/api/courses/{c}/grades/export', None),
+        ('grades.student', 'GET', f'/api/courses/{c}/students/{s}/grades', None),
+        ('grades.user', 'GET', f'/api/users/{s}/grades', None),
+        ('grades.settings', 'GET', f'/api/courses/{c}/grade-settings', None),
+        ('progress.course', 'GET', f'/api/users/{s}/courses/{c}/progress', None),
+        ('progress.resource', 'GET', f'/api/users/{s}/resources/{r}/progress', None),
+        ('progress.resource_update', 'PUT', f'/api/users/{s}/resources/{r}/progress',
+         lambda i: {'progress_percent': 100, 'completed': True, 'last_position': i}),
+        ('ingest.single', 'POST', '/api/activities', lambda i: _event(s, c, i)),
+        ('ingest.batch', 'POST', '/api/activities/batch',
+         lambda i: {'events': [_event(members[j % len(members)], c, i + j) for j in range(BATCH_EVENTS)]}),
+    ]
+
+
+def percentile(sorted_values, q):
+    """线性插值分位数"""
+    position = (len(sorted_values) - 1) * q
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def measure(client, engine, headers, method, url, body, repeat):
+    timings = []
+    queries = []
+    for i in range(repeat + 1):
+        payload = body(i) if body else None
+        with count_queries(engine) as counter:
+            start = time.perf_counter()
+            response = client.open(url, method=method, json=payload, headers=headers)
+            # 流式响应（成绩导出）在读取时才执行查询
+            response.get_data()
+            elapsed = (time.perf_counter() - start) * 1000
+        assert response.status_code < 300, (method, url, response.status_code, response.get_data(as_text=True))
+        # 第一次为预热
+        if i:
+            timings.append(elapsed)
+            queries.append(counter.count)
+
+    timings.sort()
+    queries.sort()
+    return {
+        'method': method,
+        'url': url,
+        'repeat': repeat,
+        'p50_ms': round(percentile(timings, 0.5), 3),
+        'p95_ms': round(percentile(timings, 0.95), 3),
+        'mean_ms': round(sum(timings) / len(timings), 3),
+        'min_ms': round(timings[0], 3),
+        'max_ms': round(timings[-1], 3),
+        'queries': queries[len(queries) // 2],
+        'queries_max': queries[-1]
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def dataset_counts(db):
+    from app.models import User, Course, Activity, StudentGrade, ResourceProgress, AssignmentSubmission
+
+    return {model.__tablename__: model.query.count()
+            for model in (User, Course, Activity, StudentGrade, ResourceProgress, AssignmentSubmission)}
+
+
+def compare(results, baseline, tolerance):
+    """打印与基线的差异，返回回归的用例名"""
+    regressions = []
+    for name, result in results.items():
+        old = baseline['results'].get(name)
+        if old is None:
+            print(f'{name:<32} 基线中没有该用例')
+            continue
+        delta = result['p95_ms'] - old['p95_ms']
+        ratio = delta / old['p95_ms'] if old['p95_ms'] else 0.0
+        slower = delta > MIN_REGRESSION_MS and ratio > tolerance
+        more_queries = result['queries'] > old['queries']
+        flag = '  <-- 回归' if slower or more_queries else ''
+        print(f"{name:<32} p95 {old['p95_ms']:9.2f} -> {result['p95_ms']:9.2f} ms ({ratio:+7.1%}), "
+              f"SQL {old['queries']} -> {result['queries']}{flag}")
+        if flag:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='接口基准套件')
+    parser.add_argument('--db', required=True, help='SQLite 数据库文件路径')
+    parser.add_argument('--reuse', action='store_true', help='直接使用已生成的数据库，不重新生成数据')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--only', default=None, help='只运行名称以该前缀开头的用例，如 analytics')
+    parser.add_argument('--output', default=None, help='结果写入的 JSON 基线文件')
+    parser.add_argument('--compare', default=None, help='对比的 JSON 基线文件')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='允许的 p95 延迟增长比例')
+    add_scale_arguments(parser)
+    args = parser.parse_args()
+
+    from app import db
+
+    app = create_suite_app(args.db, args.reuse)
+    meta = {
+        'commit': git_commit(),
+        'timestamp': datetime.utcnow().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'repeat': args.repeat
+    }
+    with app.app_context():
+        if not args.reuse:
+            meta.update(scale=args.scale, seed=args.seed, params=scale_params(args))
+            generate(db, seed=args.seed, anchor=args.anchor, **scale_params(args))
+        meta['dataset'] = dataset_counts(db)
+        ids = sample_ids(db)
+        engine = db.engine
+        db.session.remove()
+
+    client = app.test_client()
+    token = client.post('/api/auth/login', json={'account': ADMIN_ACCOUNT, 'password': ADMIN_PASSWORD}) \
+        .get_json().get('token')
+    headers = {'Authorization': f'Bearer {token}'} if token else {}
+
+    # 在应用上下文之外请求，使每个请求像线上一样使用独立的会话
+    results = {}
+    for name, method, url, body in build_cases(ids):
+        if args.only and not name.startswith(args.only):
+            continue
+        result = measure(client, engine, headers, method, url, body, args.repeat)
+        results[name] = result
+        print(f"{name:<32} p50 {result['p50_ms']:9.2f} ms  p95 {result['p95_ms']:9.2f} ms  "
+              f"SQL {result['queries']}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'meta': meta, 'results': results}, f, ensure_ascii=False, indent=2)
+        print(f'结果已写入 {args.output}')
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        print(f"对比基线 {baseline['meta'].get('commit')} ({baseline['meta'].get('timestamp')})")
+        if baseline['meta'].get('dataset') != meta['dataset']:
+            print(f"注意: 数据集不同 {baseline['meta'].get('dataset')} -> {meta['dataset']}")
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f'回归 {len(regressions)} 项: ' + ', '.join(regressions))
+            sys.exit(1)
+        print('通过: 未发现回归')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""
+认证身份缓存基准
+
+对需要管理员权限的接口连续发起请求，分别在以下配置下统计每个请求的SQL语句数和耗时:
+- 不缓存（AUTH_PRINCIPAL_CACHE_TTL=0）：每个请求查询一次用户
+- 身份缓存：同一令牌只在首个请求查询用户
+- 信任令牌角色（AUTH_TRUST_TOKEN_ROLE）：不查询用户
+并核对管理员修改、删除用户后，该用户已签发的令牌立即按新身份鉴权。
+
+用法: python benchmarks/auth_principal_cache.py [--requests 2000]
+"""
+
+import argparse
+import time
+
+from common import create_bench_app, count_queries
+
+# 该接口本身不访问数据库，语句数即认证的开销
+URL = '/api/admin/analytics-cache'
+
+
+def seed(db):
+    from werkzeug.security import generate_password_hash
+    from app.models import User
+
+    password_hash = generate_password_hash('secret')
+    users = [
+        User(account=account, username=account, email=f'{account}@example.com',
+             password_hash=password_hash, role='admin')
+        for account in ('root', 'deputy')
+    ]
+    db.session.add_all(users)
+    db.session.commit()
+    return [user.id for user in users]
+
+
+def login(client, account):
+    response = client.post('/api/auth/login', json={'account': account, 'password': 'secret'})
+    assert response.status_code == 200, response.data
+    return {'Authorization': f'Bearer {response.get_json()["token"]}'}
+
+
+def measure(app, client, headers, count):
+    from app import db
+
+    with count_queries(db.engine) as counter:
+        start = time.perf_counter()
+        for _ in range(count):
+            response = client.get(URL, headers=headers)
+            assert response.status_code == 200, response.data
+        elapsed = time.perf_counter() - start
+    return counter.count, elapsed * 1e6 / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description='认证身份缓存基准')
+    parser.add_argument('--requests', type=int, default=2000)
+    args = parser.parse_args()
+
+    from app import db
+    from app.utils.auth import principal_cache
+
+    app = create_bench_app()
+    client = app.test_client()
+
+    with app.app_context():
+        root_id, deputy_id = seed(db)
+        headers = login(client, 'root')
+
+        modes = [
+            ('不缓存', {'AUTH_PRINCIPAL_CACHE_TTL': 0, 'AUTH_TRUST_TOKEN_ROLE': False}, args.requests),
+            ('身份缓存', {'AUTH_PRINCIPAL_CACHE_TTL': 30, 'AUTH_TRUST_TOKEN_ROLE': False}, 1),
+            ('信任令牌角色', {'AUTH_PRINCIPAL_CACHE_TTL': 30, 'AUTH_TRUST_TOKEN_ROLE': True}, 0),
+        ]
+        for label, config, expected in modes:
+            app.config.update(config)
+            principal_cache().clear()
+            statements, per_request = measure(app, client, headers, args.requests)
+            assert statements == expected, f'{label}: 预期 {expected} 条SQL语句，实际 {statements} 条'
+            print(f'{label}: {args.requests} 个请求共 {statements} 条SQL语句, 每请求 {per_request:.0f} µs')
+
+        # 修改、删除用户后，已签发的令牌按新身份鉴权
+        for trust in (False, True):
+            app.config.update(AUTH_PRINCIPAL_CACHE_TTL=30, AUTH_TRUST_TOKEN_ROLE=trust)
+            principal_cache().clear()
+            deputy = login(client, 'deputy')
+            assert client.get(URL, headers=deputy).status_code == 200
+            response = client.put(f'/api/admin/users/{deputy_id}', json={'role': 'student'}, headers=headers)
+            assert response.status_code == 200, response.data
+            assert client.get(URL, headers=deputy).status_code == 403, '降级后的令牌仍有管理员权限'
+            client.put(f'/api/admin/users/{deputy_id}', json={'role': 'admin'}, headers=headers)
+            assert client.get(URL, headers=deputy).status_code == 200, '恢复角色后的令牌仍被拒绝'
+
+        response = client.delete(f'/api/admin/users/{deputy_id}', headers=headers)
+        assert response.status_code == 200, response.data
+        assert client.get(URL, headers=deputy).status_code == 401, '已删除用户的令牌仍能通过认证'
+
+    print('通过: 缓存和信任令牌角色时认证不查询数据库，用户修改、删除后立即生效')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""
+批量选课导入基准
+
+生成大量学生后分别测量:
+- POST /api/courses/<id>/batch-enroll 导入 2000 个学生ID
+- POST /api/courses/<id>/batch-enroll/csv 上传按账号匹配的大名单CSV（含已选课、重复和无效行）
+并核对选课人数计数与 course_students 一致。
+
+用法: python benchmarks/batch_enroll_roster.py [--students 50000] [--budget 5.0]
+"""
+
+import argparse
+import io
+import time
+from datetime import datetime
+
+from common import create_bench_app, count_queries
+
+
+def seed(db, student_count):
+    from app.models import User, Course
+
+    now = datetime.utcnow()
+    db.session.execute(User.__table__.insert(), [
+        {'account': f'2024{i:06d}', 'username': f'学生{i}', 'email': f'roster{i}@example.com',
+         'password_hash': 'x', 'role': 'student', 'created_at': now, 'updated_at': now}
+        for i in range(student_count)
+    ])
+    courses = [Course(title='小班课程'), Course(title='大班课程')]
+    db.session.add_all(courses)
+    db.session.commit()
+    student_ids = [uid for (uid,) in db.session.query(User.id).order_by(User.id).all()]
+    return courses[0].id, courses[1].id, student_ids
+
+
+def timed_post(db, client, url, **kwargs):
+    with count_queries(db.engine) as counter:
+        start = time.perf_counter()
+        response = client.post(url, **kwargs)
+        elapsed = time.perf_counter() - start
+    assert response.status_code == 200, response.data
+    return response.get_json(), elapsed, counter.count
+
+
+def main():
+    parser = argparse.ArgumentParser(description='批量选课导入基准')
+    parser.add_argument('--students', type=int, default=50000)
+    parser.add_argument('--budget', type=float, default=5.0, help='CSV导入允许的最长耗时（秒）')
+    args = parser.parse_args()
+
+    from app import db
+    from app.services.counters import check_counters
+
+    app = create_bench_app()
+    client = app.test_client()
+
+    with app.app_context():
+        small_course_id, course_id, student_ids = seed(db, args.students)
+        db.session.remove()
+
+        payload, elapsed, statements = timed_post(
+            db, client, f'/api/courses/{small_course_id}/batch-enroll',
+            json={'student_ids': student_ids[:2000]})
+        assert payload['success_count'] == 2000
+        print(f'JSON 2000 人: SQL语句 {statements} 条, 耗时 {elapsed * 1000:.0f} ms')
+
+        # 先选入一部分学生，CSV中再混入重复行和不存在的账号
+        client.post(f'/api/courses/{course_id}/batch-enroll', json={'student_ids': student_ids[:1000]})
+        lines = ['account,name'] + [f'2024{i:06d},学生{i}' for i in range(args.students)]
+        lines += ['2024000000,重复', 'nobody,不存在']
+        body = ('\n'.join(lines) + '\n').encode('utf-8')
+
+        payload, elapsed, statements = timed_post(
+            db, client, f'/api/courses/{course_id}/batch-enroll/csv',
+            data={'file': (io.BytesIO(body), 'roster.csv')}, content_type='multipart/form-data')
+        assert payload['success_count'] == args.students - 1000, payload['message']
+        assert payload['already_enrolled_count'] == 1001
+        assert payload['failed_ids'] == ['nobody']
+        print(f'CSV {args.students} 行: SQL语句 {statements} 条, 耗时 {elapsed * 1000:.0f} ms')
+        assert elapsed < args.budget, f'CSV导入耗时 {elapsed:.2f}s 超出预算 {args.budget}s'
+
+        drift = check_counters()
+        assert not drift, f'选课人数计数不一致: {drift}'
+        print('通过: 导入结果与选课人数计数一致')
+
+
+if __name__ == '__main__':
+    main()
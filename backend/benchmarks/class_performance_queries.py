@@ -0,0 +1,143 @@
+"""
+班级表现分析查询数量基准
+
+验证 /api/analytics/class-performance/<id> 的SQL语句数量不随学生人数增长，
+并与逐个学生查询的旧实现结果进行对比。
+
+用法: python benchmarks/class_performance_queries.py
+"""
+
+import random
+import time
+from datetime import datetime, timedelta
+
+from common import create_bench_app, count_queries
+
+STUDENT_COUNTS = [5, 50, 600]
+ACTIVITIES_PER_STUDENT = 8
+
+
+def seed_course(db, student_count):
+    """创建一门课程及其学生、活动和进度数据，返回课程ID"""
+    from app.models import User, Course, Activity, CourseProgress
+    from app.models.course import course_students
+
+    rng = random.Random(student_count)
+    teacher = User(account=f't{student_count}', username=f'teacher{student_count}',
+                   email=f't{student_count}@example.com', password_hash='x', role='teacher')
+    db.session.add(teacher)
+    db.session.flush()
+
+    course = Course(title=f'课程{student_count}', instructor_id=teacher.id)
+    db.session.add(course)
+    db.session.flush()
+
+    students = [
+        User(account=f's{student_count}_{i}', username=f'student{student_count}_{i}',
+             email=f's{student_count}_{i}@example.com', password_hash='x', role='student')
+        for i in range(student_count)
+    ]
+    db.session.add_all(students)
+    db.session.flush()
+
+    db.session.execute(course_students.insert(), [
+        {'course_id': course.id, 'user_id': s.id, 'enrolled_at': datetime.utcnow()}
+        for s in students
+    ])
+
+    now = datetime.utcnow()
+    activities = []
+    progresses = []
+    for i, student in enumerate(students):
+        # 部分学生没有任何活动或进度记录，覆盖空值分支
+        if i % 7 == 0:
+            continue
+        progresses.append({'user_id': student.id, 'course_id': course.id,
+                           'progress_percent': rng.uniform(0, 100)})
+        for _ in range(rng.randint(1, ACTIVITIES_PER_STUDENT)):
+            activities.append({
+                'user_id': student.id,
+                'course_id': course.id,
+                'activity_type': rng.choice(['video_watch', 'quiz', 'assignment']),
+                'duration': rng.randint(60, 3600),
+                'score': rng.choice([None, rng.uniform(0, 100)]),
+                'completed': rng.random() < 0.6,
+                'created_at': now - timedelta(minutes=rng.randint(0, 60 * 24 * 30)),
+            })
+    db.session.bulk_insert_mappings(Activity, activities)
+    db.session.bulk_insert_mappings(CourseProgress, progresses)
+    db.session.commit()
+    return course.id
+
+
+def reference_progress_data(db, course_id):
+    """逐个学生查询的旧实现，作为结果对照"""
+    from sqlalchemy import func
+    from app.models import Course, Activity, CourseProgress
+
+    course = db.session.get(Course, course_id)
+    result = []
+    for student in course.students.order_by('id').all():
+        progress = CourseProgress.query.filter_by(user_id=student.id, course_id=course_id).first()
+        avg_score = db.session.query(func.avg(Activity.score)) \
+            .filter(Activity.user_id == student.id, Activity.course_id == course_id) \
+            .scalar() or 0
+        activity_count = Activity.query.filter_by(user_id=student.id, course_id=course_id).count()
+        completed = Activity.query.filter_by(user_id=student.id, course_id=course_id, completed=True).count()
+        result.append({
+            'user_id': student.id,
+            'username': student.username,
+            'progress_percent': progress.progress_percent if progress else 0,
+            'avg_score': avg_score,
+            'activity_count': activity_count,
+            'completion_rate': (completed / activity_count) * 100 if activity_count > 0 else 0
+        })
+    return result
+
+
+def same_rows(actual, expected):
+    if len(actual) != len(expected):
+        return False
+    for a, e in zip(actual, expected):
+        for key, value in e.items():
+            if isinstance(value, float):
+                if abs(a[key] - value) > 1e-6:
+                    return False
+            elif a[key] != value:
+                return False
+    return True
+
+
+def main():
+    from app import db
+
+    app = create_bench_app()
+    client = app.test_client()
+    query_counts = []
+
+    with app.app_context():
+        for student_count in STUDENT_COUNTS:
+            course_id = seed_course(db, student_count)
+            db.session.remove()
+
+            with count_queries(db.engine) as counter:
+                start = time.perf_counter()
+                response = client.get(f'/api/analytics/class-performance/{course_id}')
+                elapsed = (time.perf_counter() - start) * 1000
+
+            assert response.status_code == 200, response.data
+            payload = response.get_json()
+            assert payload['student_count'] == student_count
+
+            expected = reference_progress_data(db, course_id)
+            assert same_rows(payload['progress_data'], expected), '分组聚合结果与逐个查询结果不一致'
+
+            query_counts.append(counter.count)
+            print(f'学生数 {student_count:>5}: SQL语句 {counter.count} 条, 耗时 {elapsed:.1f} ms')
+
+    assert len(set(query_counts)) == 1, f'SQL语句数量随学生人数变化: {query_counts}'
+    print('通过: SQL语句数量与学生人数无关')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""
+基准测试公共工具
+
+提供临时数据库应用、SQL语句计数等辅助功能，供 benchmarks 目录下的脚本复用
+"""
+
+import os
+import sys
+import tempfile
+from contextlib import contextmanager
+
+# 将 backend 目录添加到 Python 路径
+basedir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, basedir)
+
+
+def create_bench_app(db_path=None):
+    """创建使用临时SQLite数据库的应用，避免污染开发数据库"""
+    if db_path is None:
+        fd, db_path = tempfile.mkstemp(prefix='la_bench_', suffix='.db')
+        os.close(fd)
+    os.environ['DATABASE_URL'] = f'sqlite:///{db_path}'
+
+    from app import create_app, db
+
+    app = create_app('development')
+    app.config['DEBUG'] = False
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+    return app
+
+
+class QueryCounter:
+    """记录执行期间发出的SQL语句"""
+
+    def __init__(self):
+        self.statements = []
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+
+@contextmanager
+def count_queries(engine):
+    """在上下文中统计 engine 执行的SQL语句数量"""
+    from sqlalchemy import event
+
+    counter = QueryCounter()
+    event.listen(engine, 'before_cursor_execute', counter)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, 'before_cursor_execute', counter)
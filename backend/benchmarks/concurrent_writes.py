@@ -0,0 +1,159 @@
+"""
+并发写入吞吐基准
+
+模拟多个 gunicorn 工作进程：每个进程独立创建应用，同时持续请求 POST /api/activities，
+另有若干进程读取 /api/analytics/course/<id>（关闭缓存）。分别在默认回滚日志（SQLITE_PRAGMAS_ENABLED=0）
+和 SQLITE_PRAGMAS 调优（WAL 等）下运行，对比写入吞吐、延迟和 database is locked 错误数。
+
+每种模式使用同一份合成数据的副本，WAL 模式写入数据库文件后持久生效，因此不能共用文件。
+
+用法: python benchmarks/concurrent_writes.py [--writers 4] [--readers 2] [--seconds 10]
+"""
+
+import argparse
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+
+from synthetic_data import generate
+
+MODES = (('默认', '0'), ('调优', '1'))
+
+ENV = {
+    'ANALYTICS_CACHE_ENABLED': '0', 'ETAG_ENABLED': '0', 'ACTIVITY_BUFFER_ENABLED': '0',
+    'INSTRUMENTATION_SLOW_QUERY_MS': '0', 'INSTRUMENTATION_TRACE_SAMPLE_RATE': '0'
+}
+
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(int(len(sorted_values) * q), len(sorted_values) - 1)]
+
+
+def worker(role, index, db_path, pragmas_enabled, pairs, course_id, start_event, deadline_seconds, results):
+    """工作进程：在 deadline_seconds 内循环请求，结果放入 results 队列"""
+    os.environ.update(ENV, DATABASE_URL=f'sqlite:///{db_path}', SQLITE_PRAGMAS_ENABLED=pragmas_enabled)
+
+    from sqlalchemy.exc import OperationalError
+    from app import create_app
+
+    app = create_app('development')
+    app.config.update(DEBUG=False, PROPAGATE_EXCEPTIONS=True)
+    client = app.test_client()
+
+    latencies = []
+    locked = 0
+    count = 0
+    start_event.wait()
+    deadline = time.perf_counter() + deadline_seconds
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            if role == 'writer':
+                course, user = pairs[(index * 7919 + count) % len(pairs)]
+                response = client.post('/api/activities', json={
+                    'user_id': user, 'course_id': course, 'activity_type': 'video_watch',
+                    'duration': 60 + count % 600, 'completed': count % 3 == 0
+                })
+            else:
+                response = client.get(f'/api/analytics/course/{course_id}')
+            assert response.status_code < 300, response.get_data(as_text=True)
+            latencies.append((time.perf_counter() - start) * 1000)
+        except OperationalError as exc:
+            if 'locked' not in str(exc):
+                raise
+            locked += 1
+        count += 1
+    results.put((role, latencies, locked))
+
+
+def run_mode(template, pragmas_enabled, pairs, course_id, args):
+    fd, db_path = tempfile.mkstemp(prefix='la_concurrent_', suffix='.db')
+    os.close(fd)
+    shutil.copyfile(template, db_path)
+
+    ctx = multiprocessing.get_context('spawn')
+    start_event = ctx.Event()
+    results = ctx.Queue()
+    roles = ['writer'] * args.writers + ['reader'] * args.readers
+    processes = [
+        ctx.Process(target=worker, args=(role, index, db_path, pragmas_enabled, pairs, course_id,
+                                         start_event, args.seconds, results))
+        for index, role in enumerate(roles)
+    ]
+    for process in processes:
+        process.start()
+    # 等待各进程完成导入和建应用
+    time.sleep(args.warmup)
+    start_event.set()
+    collected = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(db_path + suffix):
+            os.remove(db_path + suffix)
+
+    summary = {}
+    for role in ('writer', 'reader'):
+        latencies = sorted(value for r, values, _ in collected if r == role for value in values)
+        summary[role] = {
+            'ok': len(latencies),
+            'locked': sum(locked for r, _, locked in collected if r == role),
+            'per_second': len(latencies) / args.seconds,
+            'p50': _percentile(latencies, 0.5),
+            'p95': _percentile(latencies, 0.95),
+            'max': latencies[-1] if latencies else 0.0
+        }
+    return summary
+
+
+def seed(template):
+    """生成合成数据模板库，返回 (选课关系, 活动最多的课程ID)"""
+    os.environ.update(ENV, SQLITE_PRAGMAS_ENABLED='0')
+
+    from common import create_bench_app
+    from app import db
+    from app.models.course import course_students
+    from app.services import leaderboards
+
+    app = create_bench_app(template)
+    with app.app_context():
+        generate(db, students=500, teachers=20, courses=20, enrollments_per_student=4, sections_per_course=4,
+                 resources_per_section=4, assignments_per_course=5, activities=50000, days=90)
+        pairs = [tuple(row) for row in db.session.query(course_students.c.course_id, course_students.c.user_id)
+                 .order_by(course_students.c.course_id, course_students.c.user_id)]
+        course_id = leaderboards.top_courses(limit=1)[0][0]
+        db.session.remove()
+        db.engine.dispose()
+    return pairs, course_id
+
+
+def main():
+    parser = argparse.ArgumentParser(description='并发写入吞吐基准')
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--readers', type=int, default=2)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--warmup', type=float, default=3, help='等待工作进程启动的秒数')
+    args = parser.parse_args()
+
+    fd, template = tempfile.mkstemp(prefix='la_concurrent_template_', suffix='.db')
+    os.close(fd)
+    try:
+        pairs, course_id = seed(template)
+        print(f'{args.writers} 个写进程、{args.readers} 个读进程，各运行 {args.seconds:g} 秒')
+        for name, pragmas_enabled in MODES:
+            summary = run_mode(template, pragmas_enabled, pairs, course_id, args)
+            writer, reader = summary['writer'], summary['reader']
+            print(f"{name}: 写入 {writer['per_second']:7.1f} 次/秒 p50 {writer['p50']:6.1f} ms "
+                  f"p95 {writer['p95']:7.1f} ms 最大 {writer['max']:7.1f} ms locked {writer['locked']}; "
+                  f"读取 {reader['per_second']:6.1f} 次/秒 p95 {reader['p95']:7.1f} ms locked {reader['locked']}")
+    finally:
+        os.remove(template)
+
+
+if __name__ == '__main__':
+    main()
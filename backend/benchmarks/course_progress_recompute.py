@@ -0,0 +1,97 @@
+"""
+课程进度批量重算基准
+
+为一门课程生成大量学生、资源进度和作业提交，测量 recompute_course_progress
+首次（批量插入）和再次（批量更新）执行的耗时，并用一致性检查核对结果。
+
+用法: python benchmarks/course_progress_recompute.py [--students 10000] [--budget 1.0]
+"""
+
+import argparse
+import random
+import time
+from datetime import datetime
+
+from common import create_bench_app, count_queries
+
+
+def seed(db, student_count, resource_count=40, assignment_count=10):
+    from app.models import User, Course, CourseSection, CourseResource, ResourceProgress
+    from app.models.assignment import Assignment, AssignmentSubmission
+    from app.models.course import course_students
+
+    rng = random.Random(student_count)
+    course = Course(title='大班课程')
+    db.session.add(course)
+    db.session.flush()
+
+    sections = [CourseSection(course_id=course.id, title=f'章节{i}', order=i) for i in range(4)]
+    db.session.add_all(sections)
+    db.session.flush()
+    resources = [CourseResource(section_id=sections[i % 4].id, title=f'资源{i}', resource_type='video', order=i)
+                 for i in range(resource_count)]
+    assignments = [Assignment(course_id=course.id, title=f'作业{i}') for i in range(assignment_count)]
+    db.session.add_all(resources + assignments)
+    db.session.flush()
+
+    now = datetime.utcnow()
+    db.session.execute(User.__table__.insert(), [
+        {'account': f'bulk{i}', 'username': f'学生{i}', 'email': f'bulk{i}@example.com',
+         'password_hash': 'x', 'role': 'student', 'created_at': now, 'updated_at': now}
+        for i in range(student_count)
+    ])
+    student_ids = [uid for (uid,) in db.session.query(User.id).filter(User.role == 'student').all()]
+    db.session.execute(course_students.insert(), [
+        {'course_id': course.id, 'user_id': uid, 'enrolled_at': now} for uid in student_ids
+    ])
+
+    progress_rows = []
+    submission_rows = []
+    for uid in student_ids:
+        for resource in rng.sample(resources, rng.randint(0, resource_count)):
+            progress_rows.append({'user_id': uid, 'resource_id': resource.id,
+                                  'progress_percent': 100, 'completed': rng.random() < 0.8})
+        for assignment in rng.sample(assignments, rng.randint(0, assignment_count)):
+            submission_rows.append({'assignment_id': assignment.id, 'user_id': uid, 'submit_time': now})
+    db.session.execute(ResourceProgress.__table__.insert(), progress_rows)
+    db.session.execute(AssignmentSubmission.__table__.insert(), submission_rows)
+    db.session.commit()
+    return course.id
+
+
+def timed_recompute(db, course_id):
+    from app.services.progress_engine import recompute_course_progress
+
+    with count_queries(db.engine) as counter:
+        start = time.perf_counter()
+        written = recompute_course_progress(course_id)
+        db.session.commit()
+        elapsed = time.perf_counter() - start
+    return written, elapsed, counter.count
+
+
+def main():
+    parser = argparse.ArgumentParser(description='课程进度批量重算基准')
+    parser.add_argument('--students', type=int, default=10000)
+    parser.add_argument('--budget', type=float, default=1.0, help='允许的最长耗时（秒）')
+    args = parser.parse_args()
+
+    from app import db
+    from app.services.progress_engine import check_progress_consistency
+
+    app = create_bench_app()
+    with app.app_context():
+        course_id = seed(db, args.students)
+
+        for label in ('首次（插入）', '再次（更新）'):
+            written, elapsed, statements = timed_recompute(db, course_id)
+            print(f'{label}: {written} 条进度记录, SQL语句 {statements} 条, 耗时 {elapsed * 1000:.0f} ms')
+            assert elapsed < args.budget, f'批量重算耗时 {elapsed:.2f}s 超出预算 {args.budget}s'
+
+        drift = check_progress_consistency(course_id)
+        assert not drift, f'{len(drift)} 条进度记录与全量重算不一致'
+        print('通过: 结果与全量重算一致')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+"""
+打印 /api/analytics/* 接口所发出SQL的执行计划
+
+两种用法:
+  python benchmarks/explain_analytics_queries.py
+      针对当前配置的数据库（DATABASE_URL）输出执行计划，
+      可在 `flask db upgrade` 前后各运行一次进行对比
+  python benchmarks/explain_analytics_queries.py --compare
+      使用临时SQLite数据库，分别在删除和创建复合索引后输出执行计划
+"""
+
+import argparse
+import os
+import sys
+from datetime import datetime
+
+from sqlalchemy import event
+
+basedir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, basedir)
+
+# 需要对比执行计划的表
+INDEXED_TABLES = ['activities', 'course_progress', 'resource_progress', 'assignment_submissions']
+
+
+def analytics_urls(user_id, course_id):
+    return [
+        f'/api/analytics/user/{user_id}',
+        f'/api/analytics/course/{course_id}',
+        '/api/analytics/overview',
+        f'/api/analytics/student-learning/{user_id}',
+        f'/api/analytics/class-performance/{course_id}',
+    ]
+
+
+def capture_statements(app, engine, url):
+    """请求接口并记录其发出的SELECT语句及参数"""
+    captured = []
+
+    def listener(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT'):
+            captured.append((statement, parameters))
+
+    event.listen(engine, 'before_cursor_execute', listener)
+    try:
+        response = app.test_client().get(url)
+    finally:
+        event.remove(engine, 'before_cursor_execute', listener)
+    return response.status_code, captured
+
+
+def explain(engine, statement, parameters):
+    """根据数据库方言返回执行计划的文本行"""
+    prefix = 'EXPLAIN QUERY PLAN ' if engine.dialect.name == 'sqlite' else 'EXPLAIN '
+    with engine.connect() as conn:
+        rows = conn.exec_driver_sql(prefix + statement, parameters).fetchall()
+    return [' | '.join(str(col) for col in row) for row in rows]
+
+
+def print_plans(app, engine, user_id, course_id, title):
+    print('=' * 80)
+    print(title)
+    print('=' * 80)
+    for url in analytics_urls(user_id, course_id):
+        status, statements = capture_statements(app, engine, url)
+        print(f'\nGET {url} -> {status}, {len(statements)} 条查询')
+        seen = set()
+        for statement, parameters in statements:
+            if statement in seen:
+                continue
+            seen.add(statement)
+            print('\n  ' + ' '.join(statement.split())[:200])
+            for line in explain(engine, statement, parameters):
+                print(f'    {line}')
+
+
+def model_indexes(db):
+    return [index for table in INDEXED_TABLES for index in db.metadata.tables[table].indexes]
+
+
+def seed_minimal(db):
+    """写入最少量的数据，保证各分析接口返回200"""
+    from app.models import User, Course, Activity, CourseProgress
+
+    teacher = User(account='explain_t', username='teacher', email='t@example.com', password_hash='x', role='teacher')
+    student = User(account='explain_s', username='student', email='s@example.com', password_hash='x', role='student')
+    db.session.add_all([teacher, student])
+    db.session.flush()
+    course = Course(title='执行计划', instructor_id=teacher.id)
+    db.session.add(course)
+    db.session.flush()
+    course.students.append(student)
+    db.session.add(Activity(user_id=student.id, course_id=course.id, activity_type='quiz',
+                            duration=600, score=80, completed=True, created_at=datetime.utcnow()))
+    db.session.add(CourseProgress(user_id=student.id, course_id=course.id, progress_percent=50))
+    db.session.commit()
+    return student.id, course.id
+
+
+def run_compare():
+    from common import create_bench_app
+    from app import db
+
+    app = create_bench_app()
+    with app.app_context():
+        user_id, course_id = seed_minimal(db)
+        indexes = model_indexes(db)
+
+        for index in indexes:
+            index.drop(db.engine)
+        print_plans(app, db.engine, user_id, course_id, '迁移前（无复合索引）')
+
+        for index in indexes:
+            index.create(db.engine)
+        print_plans(app, db.engine, user_id, course_id, '迁移后（已创建复合索引）')
+
+
+def run_current():
+    from app import create_app, db
+    from app.models import User, Course
+
+    app = create_app(os.getenv('FLASK_ENV', 'development'))
+    with app.app_context():
+        student = User.query.filter_by(role='student').first()
+        course = Course.query.first()
+        if not student or not course:
+            print('数据库中没有学生或课程数据，无法生成执行计划')
+            return
+        existing = {ix['name'] for table in INDEXED_TABLES
+                    for ix in db.inspect(db.engine).get_indexes(table)}
+        missing = [ix.name for ix in model_indexes(db) if ix.name not in existing]
+        title = '当前数据库' + (f'（缺少索引: {", ".join(missing)}）' if missing else '（复合索引已就绪）')
+        print_plans(app, db.engine, student.id, course.id, title)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='打印分析接口SQL的执行计划')
+    parser.add_argument('--compare', action='store_true', help='在临时数据库上对比索引创建前后的执行计划')
+    args = parser.parse_args()
+
+    if args.compare:
+        run_compare()
+    else:
+        run_current()
@@ -0,0 +1,78 @@
+"""
+批量录入成绩基准
+
+分别以 100、1000、10000 行请求 POST /api/courses/<id>/grades/batch（一半为新成绩、一半更新已有成绩），
+确认SQL语句数量与行数无关，并核对总评与 StudentGrade.calculate_total_score 一致。
+
+用法: python benchmarks/grade_batch_update.py
+"""
+
+import random
+import time
+from datetime import datetime
+
+from common import create_bench_app, count_queries
+
+ROW_COUNTS = (100, 1000, 10000)
+
+
+def seed(db, student_count):
+    from app.models import User, Course, GradeSetting, StudentGrade
+
+    now = datetime.utcnow()
+    db.session.execute(User.__table__.insert(), [
+        {'account': f'gb{i}', 'username': f'学生{i}', 'email': f'gb{i}@example.com',
+         'password_hash': 'x', 'role': 'student', 'created_at': now, 'updated_at': now}
+        for i in range(student_count)
+    ])
+    course = Course(title='成绩录入课程')
+    db.session.add(course)
+    db.session.flush()
+    db.session.add(GradeSetting(course_id=course.id, final_exam_weight=65.0, regular_grade_weight=35.0))
+    student_ids = [uid for (uid,) in db.session.query(User.id).order_by(User.id)]
+    # 一半学生已有成绩
+    db.session.execute(StudentGrade.__table__.insert(), [
+        {'user_id': uid, 'course_id': course.id, 'final_exam_score': 50.0, 'regular_grade': 50.0,
+         'total_score': 50.0, 'created_at': now, 'updated_at': now}
+        for uid in student_ids[::2]
+    ])
+    db.session.commit()
+    return course.id, student_ids
+
+
+def main():
+    from app import db
+    from app.models import StudentGrade, GradeSetting
+
+    app = create_bench_app()
+    client = app.test_client()
+    rng = random.Random(0)
+    statement_counts = []
+
+    with app.app_context():
+        course_id, student_ids = seed(db, max(ROW_COUNTS))
+        db.session.remove()
+
+        for row_count in ROW_COUNTS:
+            grades = [{'user_id': uid, 'final_exam_score': rng.randint(0, 100), 'regular_grade': rng.randint(0, 100)}
+                      for uid in student_ids[:row_count]]
+            with count_queries(db.engine) as counter:
+                start = time.perf_counter()
+                response = client.post(f'/api/courses/{course_id}/grades/batch', json={'grades': grades})
+                elapsed = (time.perf_counter() - start) * 1000
+            assert response.status_code == 200, response.data
+            assert response.get_json()['success_count'] == row_count
+            statement_counts.append(counter.count)
+            print(f'{row_count:>6} 行: SQL语句 {counter.count} 条, 耗时 {elapsed:.0f} ms')
+
+        settings = GradeSetting.query.filter_by(course_id=course_id).first()
+        mismatched = [grade.user_id for grade in StudentGrade.query.filter_by(course_id=course_id)
+                      if grade.total_score != grade.calculate_total_score(settings)]
+        assert not mismatched, f'{len(mismatched)} 条总评与逐条计算结果不一致'
+
+    assert len(set(statement_counts)) == 1, f'SQL语句数量随行数变化: {statement_counts}'
+    print('通过: SQL语句数量与行数无关，总评与逐条计算一致')
+
+
+if __name__ == '__main__':
+    main()
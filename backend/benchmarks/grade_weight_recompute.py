@@ -0,0 +1,143 @@
+"""
+成绩权重变更后重算总评的基准
+
+生成多门课程共 10 万条成绩，分别测量:
+- 旧实现: 逐门课程加载全部 StudentGrade 对象，在Python中逐条 calculate_total_score
+- 单课程 UPDATE: 逐门课程调用 recompute_total_scores([course_id])
+- 多课程 UPDATE: PUT /api/admin/grade-settings 一次应用到所有课程
+并核对 UPDATE 的结果与 calculate_total_score 逐条计算完全一致。
+
+用法: python benchmarks/grade_weight_recompute.py [--grades 100000] [--courses 20]
+"""
+
+import argparse
+import random
+import time
+from datetime import datetime
+
+from common import create_bench_app, count_queries
+
+
+def seed(db, grade_count, course_count):
+    from app.models import User, Course, GradeSetting, StudentGrade
+
+    rng = random.Random(0)
+    now = datetime.utcnow()
+    per_course = grade_count // course_count
+
+    db.session.execute(User.__table__.insert(), [
+        {'account': f'w{i}', 'username': f'学生{i}', 'email': f'w{i}@example.com',
+         'password_hash': 'x', 'role': 'student', 'created_at': now, 'updated_at': now}
+        for i in range(per_course)
+    ])
+    admin = User(account='admin', username='管理员', email='admin@example.com', password_hash='x', role='admin')
+    courses = [Course(title=f'课程{i}') for i in range(course_count)]
+    db.session.add(admin)
+    db.session.add_all(courses)
+    db.session.flush()
+    db.session.add_all(GradeSetting(course_id=course.id) for course in courses)
+
+    student_ids = [uid for (uid,) in db.session.query(User.id).filter(User.role == 'student')]
+    for course in courses:
+        db.session.execute(StudentGrade.__table__.insert(), [
+            {'user_id': uid, 'course_id': course.id,
+             # 约5%的记录只有一项成绩，总评应保持不变
+             'final_exam_score': rng.uniform(30, 100) if rng.random() > 0.05 else None,
+             'regular_grade': rng.uniform(30, 100), 'total_score': None,
+             'created_at': now, 'updated_at': now}
+            for uid in student_ids
+        ])
+    db.session.commit()
+    return admin.id, [course.id for course in courses]
+
+
+def orm_loop(db, course_ids):
+    """重算总评的旧实现"""
+    from app.models import GradeSetting, StudentGrade
+
+    for course_id in course_ids:
+        settings = GradeSetting.query.filter_by(course_id=course_id).first()
+        for grade in StudentGrade.query.filter_by(course_id=course_id).all():
+            if grade.final_exam_score is not None and grade.regular_grade is not None:
+                grade.total_score = grade.calculate_total_score(settings)
+        db.session.commit()
+
+
+def set_weights(db, final_weight, regular_weight):
+    from app.models import GradeSetting
+
+    GradeSetting.query.update({'final_exam_weight': final_weight, 'regular_grade_weight': regular_weight})
+    db.session.commit()
+
+
+def reset_totals(db):
+    from app.models import StudentGrade
+
+    StudentGrade.query.update({'total_score': None})
+    db.session.commit()
+
+
+def snapshot(db):
+    from app.models import StudentGrade
+
+    return dict(db.session.query(StudentGrade.id, StudentGrade.total_score))
+
+
+def timed(db, f):
+    db.session.expunge_all()
+    with count_queries(db.engine) as counter:
+        start = time.perf_counter()
+        f()
+        elapsed = time.perf_counter() - start
+    return elapsed, counter.count
+
+
+def main():
+    parser = argparse.ArgumentParser(description='重算总评基准')
+    parser.add_argument('--grades', type=int, default=100000)
+    parser.add_argument('--courses', type=int, default=20)
+    args = parser.parse_args()
+
+    import jwt
+    from app import db
+    from app.services.gradebook import recompute_total_scores
+    from app.utils.auth import SECRET_KEY
+
+    app = create_bench_app()
+    client = app.test_client()
+
+    with app.app_context():
+        admin_id, course_ids = seed(db, args.grades, args.courses)
+        token = jwt.encode({'user_id': admin_id, 'role': 'admin'}, SECRET_KEY, algorithm='HS256')
+
+        set_weights(db, 70.0, 30.0)
+        elapsed, statements = timed(db, lambda: orm_loop(db, course_ids))
+        expected = snapshot(db)
+        print(f'ORM逐条计算:  SQL语句 {statements} 条, 耗时 {elapsed * 1000:.0f} ms')
+
+        def per_course():
+            for course_id in course_ids:
+                recompute_total_scores([course_id])
+            db.session.commit()
+
+        reset_totals(db)
+        elapsed, statements = timed(db, per_course)
+        assert snapshot(db) == expected, '单课程 UPDATE 的总评与逐条计算不一致'
+        print(f'单课程UPDATE: SQL语句 {statements} 条, 耗时 {elapsed * 1000:.0f} ms')
+
+        set_weights(db, 60.0, 40.0)
+        orm_loop(db, course_ids)
+        expected = snapshot(db)
+        set_weights(db, 70.0, 30.0)
+        reset_totals(db)
+        elapsed, statements = timed(db, lambda: client.put(
+            '/api/admin/grade-settings', headers={'Authorization': f'Bearer {token}'},
+            json={'final_exam_weight': 60, 'regular_grade_weight': 40}))
+        assert snapshot(db) == expected, '多课程 UPDATE 的总评与逐条计算不一致'
+        print(f'多课程UPDATE: SQL语句 {statements} 条（含认证）, 耗时 {elapsed * 1000:.0f} ms')
+
+    print('通过: UPDATE 的结果与逐条计算一致')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""
+成绩单流式导出基准
+
+为不同人数的课程生成选课名单和成绩，逐块读取 /api/courses/<id>/grades/export 的响应，
+用 tracemalloc 记录导出期间的内存峰值，确认峰值不随课程人数增长。
+
+用法: python benchmarks/gradebook_export.py [--sizes 5000 50000] [--format csv]
+"""
+
+import argparse
+import json
+import random
+import time
+import tracemalloc
+from datetime import datetime
+
+from common import create_bench_app
+
+
+def seed(db, student_count, offset):
+    from app.models import User, Course, StudentGrade, GradeSetting
+    from app.models.course import course_students
+
+    rng = random.Random(student_count)
+    now = datetime.utcnow()
+    course = Course(title=f'{student_count}人课程')
+    db.session.add(course)
+    db.session.flush()
+    db.session.add(GradeSetting(course_id=course.id, final_exam_weight=70.0, regular_grade_weight=30.0))
+
+    db.session.execute(User.__table__.insert(), [
+        {'account': f'g{offset + i}', 'username': f'学生{offset + i}', 'email': f'g{offset + i}@example.com',
+         'password_hash': 'x', 'role': 'student', 'created_at': now, 'updated_at': now}
+        for i in range(student_count)
+    ])
+    student_ids = [uid for (uid,) in db.session.query(User.id)
+                   .filter(User.account.in_([f'g{offset}', f'g{offset + student_count - 1}']))
+                   .order_by(User.id)]
+    student_ids = range(student_ids[0], student_ids[-1] + 1)
+    db.session.execute(course_students.insert(), [
+        {'course_id': course.id, 'user_id': uid, 'enrolled_at': now} for uid in student_ids
+    ])
+    db.session.execute(StudentGrade.__table__.insert(), [
+        {'user_id': uid, 'course_id': course.id, 'final_exam_score': rng.uniform(40, 100),
+         'regular_grade': rng.uniform(40, 100), 'comment': '良好', 'created_at': now, 'updated_at': now}
+        for uid in student_ids if rng.random() < 0.9
+    ])
+    db.session.commit()
+    return course.id
+
+
+def measure_export(client, course_id, export_format):
+    tracemalloc.start()
+    start = time.perf_counter()
+    response = client.get(f'/api/courses/{course_id}/grades/export?format={export_format}'
+                          '&include_total=1&include_weights=1', buffered=False)
+    lines = 0
+    for chunk in response.response:
+        lines += chunk.count(b'\n')
+    response.close()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return lines, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description='成绩单流式导出基准')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[5000, 50000])
+    parser.add_argument('--format', choices=['csv', 'ndjson'], default='csv')
+    parser.add_argument('--tolerance', type=float, default=2.0, help='最大人数与最小人数的内存峰值之比上限')
+    args = parser.parse_args()
+
+    from app import db
+
+    app = create_bench_app()
+    client = app.test_client()
+    peaks = []
+
+    with app.app_context():
+        offset = 0
+        course_ids = []
+        for size in args.sizes:
+            course_ids.append(seed(db, size, offset))
+            offset += size
+        db.session.remove()
+
+        for size, course_id in zip(args.sizes, course_ids):
+            lines, elapsed, peak = measure_export(client, course_id, args.format)
+            expected = size + 1 if args.format == 'csv' else size
+            assert lines == expected, f'导出 {lines} 行，预期 {expected} 行'
+            peaks.append(peak)
+            print(f'{size:>6} 人: {lines} 行, 耗时 {elapsed * 1000:.0f} ms, 内存峰值 {peak / 1024:.0f} KiB')
+
+    ratio = peaks[-1] / peaks[0]
+    assert ratio < args.tolerance, f'内存峰值随人数增长: {json.dumps(peaks)}'
+    print(f'通过: 内存峰值与课程人数无关（比值 {ratio:.2f}）')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+"""
+分布直方图基准
+
+生成大量进度和活动记录（含恰好落在分桶边界上的值），对比:
+- 旧实现: 取回全部数值后在Python中逐个分桶
+- histogram(): 数据库中 CASE 分桶 + GROUP BY，只取回每个桶一行
+并核对 /api/analytics/course 与 /api/analytics/student-learning 返回的分布。
+
+用法: python benchmarks/histogram_queries.py [--rows 200000]
+"""
+
+import argparse
+import random
+import time
+from datetime import datetime
+
+from common import create_bench_app, count_queries
+
+
+def seed(db, row_count):
+    from app.models import User, Course, Activity, CourseProgress
+
+    rng = random.Random(0)
+    now = datetime.utcnow()
+    student = User(account='s0', username='学生', email='s0@example.com', password_hash='x', role='student')
+    course = Course(title='分布课程')
+    db.session.add_all([student, course])
+    db.session.flush()
+
+    edges = [0, 20, 40, 60, 80, 100]
+    db.session.execute(User.__table__.insert(), [
+        {'account': f'p{i}', 'username': f'学生{i}', 'email': f'p{i}@example.com',
+         'password_hash': 'x', 'role': 'student', 'created_at': now, 'updated_at': now}
+        for i in range(row_count // 10)
+    ])
+    user_ids = [uid for (uid,) in db.session.query(User.id).filter(User.account.like('p%'))]
+    db.session.execute(CourseProgress.__table__.insert(), [
+        {'user_id': uid, 'course_id': course.id,
+         'progress_percent': rng.choice(edges) if i % 10 == 0 else rng.uniform(0, 100)}
+        for i, uid in enumerate(user_ids)
+    ])
+
+    durations = [900, 1800, 3600, 7200, None, 0]
+    db.session.execute(Activity.__table__.insert(), [
+        {'user_id': student.id, 'course_id': course.id, 'activity_type': 'video_watch',
+         'duration': rng.choice(durations) if i % 10 == 0 else rng.randint(0, 4 * 3600),
+         'completed': False, 'created_at': now, 'updated_at': now}
+        for i in range(row_count)
+    ])
+    db.session.commit()
+    return student.id, course.id
+
+
+def python_progress(db, course_id):
+    """进度分布的旧实现"""
+    from app.models import CourseProgress
+
+    distribution = {"0-20%": 0, "21-40%": 0, "41-60%": 0, "61-80%": 0, "81-100%": 0}
+    for (progress,) in db.session.query(CourseProgress.progress_percent).filter(CourseProgress.course_id == course_id):
+        if progress <= 20:
+            distribution["0-20%"] += 1
+        elif progress <= 40:
+            distribution["21-40%"] += 1
+        elif progress <= 60:
+            distribution["41-60%"] += 1
+        elif progress <= 80:
+            distribution["61-80%"] += 1
+        else:
+            distribution["81-100%"] += 1
+    return distribution
+
+
+def python_duration(db, user_id):
+    """学习持续时间分布的旧实现"""
+    from app.models import Activity
+
+    distribution = {"0-15分钟": 0, "16-30分钟": 0, "31-60分钟": 0, "1-2小时": 0, "2小时以上": 0}
+    for activity in Activity.query.filter(Activity.user_id == user_id).all():
+        minutes = (activity.duration or 0) / 60
+        if minutes <= 15:
+            distribution["0-15分钟"] += 1
+        elif minutes <= 30:
+            distribution["16-30分钟"] += 1
+        elif minutes <= 60:
+            distribution["31-60分钟"] += 1
+        elif minutes <= 120:
+            distribution["1-2小时"] += 1
+        else:
+            distribution["2小时以上"] += 1
+    return distribution
+
+
+def timed(f):
+    start = time.perf_counter()
+    result = f()
+    return result, (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='分布直方图基准')
+    parser.add_argument('--rows', type=int, default=200000)
+    args = parser.parse_args()
+
+    from sqlalchemy import func
+    from app import db
+    from app.models import Activity
+    from app.api.analytics import DURATION_BUCKETS
+    from app.utils.histogram import histogram
+
+    app = create_bench_app()
+    client = app.test_client()
+
+    with app.app_context():
+        user_id, course_id = seed(db, args.rows)
+        db.session.remove()
+
+        expected, elapsed = timed(lambda: python_duration(db, user_id))
+        print(f'持续时间分布 旧实现: {elapsed:.0f} ms')
+        db.session.remove()
+        with count_queries(db.engine) as counter:
+            actual, elapsed = timed(lambda: histogram(func.coalesce(Activity.duration, 0), DURATION_BUCKETS,
+                                                      Activity.user_id == user_id))
+        print(f'持续时间分布 histogram(): {elapsed:.0f} ms, SQL语句 {counter.count} 条')
+        assert actual == expected, f'{actual} != {expected}'
+
+        payload = client.get(f'/api/analytics/student-learning/{user_id}').get_json()
+        assert payload['duration_distribution'] == expected
+
+        expected = python_progress(db, course_id)
+        payload = client.get(f'/api/analytics/course/{course_id}').get_json()
+        assert payload['progress_distribution'] == expected, f"{payload['progress_distribution']} != {expected}"
+
+    print('通过: 数据库分桶结果与逐个分桶一致')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""
+请求埋点开销基准
+
+- 核对 /metrics 导出的每端点请求数和SQL语句数与 count_queries 统计一致
+- 对比开启与关闭 INSTRUMENTATION_ENABLED 时同一接口的每请求耗时
+
+用法: python benchmarks/instrumentation_overhead.py [--requests 2000]
+"""
+
+import argparse
+import re
+import time
+
+from common import create_bench_app, count_queries
+
+URL = '/api/courses'
+ENDPOINT = 'api.get_courses'
+
+
+def seed(db):
+    from app.models import Course
+
+    db.session.add_all([Course(title=f'课程{i}') for i in range(20)])
+    db.session.commit()
+
+
+def run(client, count):
+    start = time.perf_counter()
+    for _ in range(count):
+        assert client.get(URL).status_code == 200
+    return (time.perf_counter() - start) * 1e6 / count
+
+
+def metric_value(text, name, endpoint):
+    match = re.search(rf'^{name}\{{endpoint="{re.escape(endpoint)}"[^}}]*\}} (\S+)$', text, re.M)
+    assert match, f'缺少指标 {name}'
+    return float(match.group(1))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='请求埋点开销基准')
+    parser.add_argument('--requests', type=int, default=2000)
+    args = parser.parse_args()
+
+    from app import create_app, db
+
+    app = create_bench_app()
+    client = app.test_client()
+    with app.app_context():
+        seed(db)
+        with count_queries(db.engine) as counter:
+            enabled_us = run(client, args.requests)
+        text = client.get('/metrics').get_data(as_text=True)
+        assert metric_value(text, 'http_requests_total', ENDPOINT) == args.requests
+        assert metric_value(text, 'http_request_sql_statements_sum', ENDPOINT) == counter.count, \
+            '导出的SQL语句数与实际执行数不一致'
+        print(f'开启埋点: 每请求 {enabled_us:.0f} µs, {counter.count / args.requests:g} 条SQL语句')
+
+    # 在同一数据库上创建关闭埋点的应用
+    from config import config, DevelopmentConfig
+
+    class NoInstrumentationConfig(DevelopmentConfig):
+        DEBUG = False
+        INSTRUMENTATION_ENABLED = False
+
+    config['bench_no_instrumentation'] = NoInstrumentationConfig
+    disabled = create_app('bench_no_instrumentation')
+    assert 'instrumentation' not in disabled.extensions
+    with disabled.app_context():
+        disabled_us = run(disabled.test_client(), args.requests)
+    print(f'关闭埋点: 每请求 {disabled_us:.0f} µs, 开销约 {enabled_us - disabled_us:.0f} µs/请求')
+
+    print('通过: /metrics 的请求数和SQL语句数与实际一致')
+
+
+if __name__ == '__main__':
+    main()
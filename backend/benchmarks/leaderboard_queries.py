@@ -0,0 +1,136 @@
+"""
+活动排行榜基准
+
+通过批量写入和单条删除活动维护排行计数，然后:
+- 核对增量维护的计数与 flask leaderboards rebuild 全量重建结果一致
+- 对比读取排行计数与对原始活动 GROUP BY + ORDER BY count(*) 的结果和耗时
+
+用法: python benchmarks/leaderboard_queries.py [--activities 300000] [--courses 50] [--students 2000]
+"""
+
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+from common import create_bench_app
+
+
+def seed(db, activity_count, course_count, student_count):
+    from app.models import User, Course
+    from app.services.ingest_buffer import write_rows
+
+    rng = random.Random(0)
+    now = datetime.utcnow()
+    courses = [Course(title=f'课程{i}') for i in range(course_count)]
+    db.session.add_all(courses)
+    db.session.execute(User.__table__.insert(), [
+        {'account': f'l{i}', 'username': f'学生{i}', 'email': f'l{i}@example.com',
+         'password_hash': 'x', 'role': 'student', 'created_at': now, 'updated_at': now}
+        for i in range(student_count)
+    ])
+    db.session.commit()
+    course_ids = [course.id for course in courses]
+    user_ids = [uid for (uid,) in db.session.query(User.id)]
+
+    # 课程和学生的活跃程度呈长尾分布
+    course_weights = [1 / (i + 1) for i in range(course_count)]
+    user_weights = [1 / (i + 1) ** 0.5 for i in range(student_count)]
+    rows = []
+    for course_id, user_id in zip(rng.choices(course_ids, course_weights, k=activity_count),
+                                  rng.choices(user_ids, user_weights, k=activity_count)):
+        created_at = now - timedelta(seconds=rng.randint(0, 90 * 86400))
+        rows.append({
+            'user_id': user_id, 'course_id': course_id, 'activity_type': 'video_watch',
+            'resource_id': None, 'duration': 60, 'score': None, 'completed': False,
+            'data_json': None, 'created_at': created_at, 'updated_at': created_at
+        })
+    for start in range(0, len(rows), 10000):
+        write_rows(rows[start:start + 10000])
+    return course_ids
+
+
+def raw_top_students(db, course_id, limit):
+    from sqlalchemy import func
+    from app.models import Activity, User
+
+    return db.session.query(User.id, User.username, func.count(Activity.id)) \
+        .join(Activity, Activity.user_id == User.id) \
+        .filter(Activity.course_id == course_id) \
+        .group_by(User.id) \
+        .order_by(func.count(Activity.id).desc(), User.id) \
+        .limit(limit) \
+        .all()
+
+
+def raw_top_courses(db, limit):
+    from sqlalchemy import func
+    from app.models import Activity, Course
+
+    return db.session.query(Course.id, Course.title, func.count(Activity.id)) \
+        .join(Activity, Activity.course_id == Course.id) \
+        .group_by(Course.id) \
+        .order_by(func.count(Activity.id).desc(), Course.id) \
+        .limit(limit) \
+        .all()
+
+
+def timed(f, repeat=5):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = f()
+    return result, (time.perf_counter() - start) * 1000 / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description='活动排行榜基准')
+    parser.add_argument('--activities', type=int, default=300000)
+    parser.add_argument('--courses', type=int, default=50)
+    parser.add_argument('--students', type=int, default=2000)
+    parser.add_argument('--deletes', type=int, default=300)
+    args = parser.parse_args()
+
+    from app import db
+    from app.models import Activity, CourseUserActivityCount
+    from app.services import leaderboards
+    from app.services.counters import check_counters
+
+    app = create_bench_app()
+    client = app.test_client()
+
+    with app.app_context():
+        course_ids = seed(db, args.activities, args.courses, args.students)
+        rng = random.Random(1)
+        for activity_id in rng.sample([aid for (aid,) in db.session.query(Activity.id)], args.deletes):
+            assert client.delete(f'/api/activities/{activity_id}').status_code == 200
+        db.session.remove()
+
+        def snapshot():
+            return sorted(db.session.query(CourseUserActivityCount.course_id, CourseUserActivityCount.user_id,
+                                           CourseUserActivityCount.activity_count))
+
+        incremental = snapshot()
+        assert not check_counters(), '课程活动计数与活动记录不一致'
+        leaderboards.rebuild_leaderboards()
+        assert snapshot() == incremental, '增量维护的排行计数与全量重建结果不一致'
+
+        expected, raw_ms = timed(lambda: raw_top_courses(db, 5))
+        actual, board_ms = timed(lambda: leaderboards.top_courses(5))
+        assert [tuple(row) for row in actual] == [tuple(row) for row in expected]
+        print(f'最活跃课程: GROUP BY {raw_ms:.1f} ms, 排行计数 {board_ms:.2f} ms')
+
+        busiest = expected[0][0]
+        expected, raw_ms = timed(lambda: raw_top_students(db, busiest, 5))
+        actual, board_ms = timed(lambda: leaderboards.top_students(busiest, 5))
+        assert [tuple(row) for row in actual] == [tuple(row) for row in expected]
+        print(f'课程内最活跃学生: GROUP BY {raw_ms:.1f} ms, 排行计数 {board_ms:.2f} ms')
+
+        for course_id in course_ids:
+            assert [tuple(row) for row in leaderboards.top_students(course_id, 5)] \
+                == [tuple(row) for row in raw_top_students(db, course_id, 5)]
+
+    print('通过: 排行计数与原始活动聚合结果一致')
+
+
+if __name__ == '__main__':
+    main()
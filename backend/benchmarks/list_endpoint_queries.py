@@ -0,0 +1,93 @@
+"""
+列表接口SQL语句数量检查
+
+分别以不同数据规模生成课程、讨论、作业和提交，请求列表接口并统计SQL语句数量，
+确认序列化时没有逐条触发的懒加载查询（语句数量与列表长度无关）。
+
+用法: python benchmarks/list_endpoint_queries.py
+"""
+
+import time
+from datetime import datetime, timedelta
+
+from common import create_bench_app, count_queries
+
+SIZES = (5, 50, 200)
+
+
+def seed(db, size):
+    """生成 size 门课程，第一门课程带 size 个讨论、作业和学生提交"""
+    from app.models import User, Course, Discussion, DiscussionReply, Assignment, AssignmentSubmission
+    from app.models.course import course_students
+
+    now = datetime.utcnow()
+    teachers = [User(account=f't{size}_{i}', username=f'教师{i}', email=f't{size}_{i}@example.com',
+                     password_hash='x', role='teacher') for i in range(size)]
+    students = [User(account=f's{size}_{i}', username=f'学生{i}', email=f's{size}_{i}@example.com',
+                     password_hash='x', role='student') for i in range(size)]
+    db.session.add_all(teachers + students)
+    db.session.flush()
+
+    courses = [Course(title=f'课程{i}', instructor_id=teachers[i].id) for i in range(size)]
+    db.session.add_all(courses)
+    db.session.flush()
+    course = courses[0]
+    db.session.execute(course_students.insert(), [
+        {'course_id': c.id, 'user_id': s.id, 'enrolled_at': now} for c in courses[:2] for s in students
+    ])
+
+    discussions = [Discussion(course_id=course.id, user_id=students[i].id, title=f'话题{i}', content='内容')
+                   for i in range(size)]
+    assignments = [Assignment(course_id=course.id, title=f'作业{i}', deadline=now + timedelta(days=7))
+                   for i in range(size)]
+    db.session.add_all(discussions + assignments)
+    db.session.flush()
+
+    db.session.add_all([DiscussionReply(discussion_id=d.id, user_id=students[0].id, content='回复')
+                        for d in discussions])
+    db.session.add_all([AssignmentSubmission(assignment_id=assignments[0].id, user_id=s.id, content='答案')
+                        for s in students])
+    db.session.add_all([AssignmentSubmission(assignment_id=a.id, user_id=students[0].id, content='答案')
+                        for a in assignments[1:]])
+    db.session.commit()
+    return course.id, assignments[0].id, students[0].id
+
+
+def main():
+    from app import db
+
+    app = create_bench_app()
+    app.config['ETAG_ENABLED'] = False
+    client = app.test_client()
+    counts = {}
+
+    with app.app_context():
+        for size in SIZES:
+            db.drop_all()
+            db.create_all()
+            course_id, assignment_id, student_id = seed(db, size)
+            db.session.remove()
+
+            endpoints = {
+                '课程列表': '/api/courses',
+                '学生课程': f'/api/users/{student_id}/courses',
+                '讨论列表': f'/api/courses/{course_id}/discussions',
+                '作业列表': f'/api/courses/{course_id}/assignments?user_id={student_id}',
+                '提交列表': f'/api/courses/{course_id}/assignments/{assignment_id}/submissions',
+            }
+            for name, url in endpoints.items():
+                with count_queries(db.engine) as counter:
+                    start = time.perf_counter()
+                    response = client.get(url)
+                    elapsed = (time.perf_counter() - start) * 1000
+                assert response.status_code == 200, response.data
+                counts.setdefault(name, []).append(counter.count)
+                print(f'规模 {size:>3} {name}: SQL语句 {counter.count} 条, 耗时 {elapsed:.1f} ms')
+
+    failed = {name: values for name, values in counts.items() if len(set(values)) != 1}
+    assert not failed, f'SQL语句数量随列表长度变化: {failed}'
+    print('通过: 各列表接口的SQL语句数量与列表长度无关')
+
+
+if __name__ == '__main__':
+    main()
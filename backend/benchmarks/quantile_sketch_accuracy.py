@@ -0,0 +1,188 @@
+"""
+课程分位数草图准确性基准
+
+通过批量写入、单条修改和删除活动以及选课、退选维护草图（部分有活动的用户未选课，
+部分选课学生没有活动），然后:
+- 核对增量维护的草图与 flask sketches rebuild 全量重建的结果完全一致
+- 将各课程及多门课程合并后的分位数与精确分位数对比，误差不超过半个桶宽
+- 测量 /api/analytics/course/<id>/percentiles 与 /api/analytics/percentiles 的响应时间
+
+用法: python benchmarks/quantile_sketch_accuracy.py [--courses 4] [--students 500] [--activities 40]
+"""
+
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+from common import create_bench_app, count_queries
+
+QUANTILES = (0.1, 0.25, 0.5, 0.75, 0.9, 0.99)
+
+
+def exact_quantile(values, q):
+    """与 QuantileSketch.quantile 相同取法（相邻秩线性插值）的精确分位数"""
+    values = sorted(values)
+    rank = q * (len(values) - 1)
+    lower = int(rank)
+    if rank == lower:
+        return values[lower]
+    return values[lower] + (values[lower + 1] - values[lower]) * (rank - lower)
+
+
+def seed(db, course_count, student_count, activities_per_student):
+    from app.models import User, Course
+    from app.models.course import course_students
+    from app.services import sketches
+    from app.services.ingest_buffer import write_rows
+
+    rng = random.Random(0)
+    now = datetime.utcnow()
+    courses = [Course(title=f'课程{i}') for i in range(course_count)]
+    db.session.add_all(courses)
+    db.session.execute(User.__table__.insert(), [
+        {'account': f'q{i}', 'username': f'学生{i}', 'email': f'q{i}@example.com',
+         'password_hash': 'x', 'role': 'student', 'created_at': now, 'updated_at': now}
+        for i in range(student_count)
+    ])
+    db.session.commit()
+    course_ids = [course.id for course in courses]
+    user_ids = [uid for (uid,) in db.session.query(User.id)]
+    # 约一成有活动的用户未选课，其完成率不计入草图
+    for course_id in course_ids:
+        enrolled = [user_id for user_id in user_ids if rng.random() < 0.9]
+        db.session.execute(course_students.insert(), [
+            {'course_id': course_id, 'user_id': user_id, 'enrolled_at': now} for user_id in enrolled
+        ])
+        sketches.students_enrolled(course_id, enrolled)
+    db.session.commit()
+
+    for course_index, course_id in enumerate(course_ids):
+        # 各课程的得分分布不同，合并后的分位数才有意义
+        center = 50 + 10 * course_index
+        rows = []
+        for user_id in user_ids:
+            diligence = rng.random()
+            for _ in range(rng.randint(0, activities_per_student)):
+                created_at = now - timedelta(days=rng.randint(0, 60), seconds=rng.randint(0, 86400))
+                score = min(100.0, max(0.0, rng.gauss(center, 15))) if rng.random() < 0.7 else None
+                rows.append({
+                    'user_id': user_id, 'course_id': course_id, 'activity_type': 'quiz',
+                    'resource_id': None, 'duration': rng.randint(10, 600), 'score': score,
+                    'completed': rng.random() < diligence, 'data_json': None,
+                    'created_at': created_at, 'updated_at': created_at
+                })
+        for start in range(0, len(rows), 10000):
+            write_rows(rows[start:start + 10000])
+    return course_ids
+
+
+def mutate(db, client, count):
+    """通过接口修改和删除部分活动、选课和退选，覆盖草图的撤销路径"""
+    from app.models import Activity
+    from app.models.course import course_students
+
+    rng = random.Random(1)
+    enrolled = set(db.session.query(course_students.c.course_id, course_students.c.user_id))
+    course_ids = sorted({course_id for course_id, _ in enrolled})
+    user_ids = sorted({user_id for _, user_id in enrolled})
+    for _ in range(count // 10):
+        course_id, user_id = rng.choice(course_ids), rng.choice(user_ids)
+        method = 'DELETE' if (course_id, user_id) in enrolled else 'POST'
+        response = client.open(f'/api/courses/{course_id}/enroll/{user_id}', method=method)
+        assert response.status_code == 200, response.data
+        enrolled ^= {(course_id, user_id)}
+
+    ids = [aid for (aid,) in db.session.query(Activity.id)]
+    for activity_id in rng.sample(ids, count):
+        if rng.random() < 0.5:
+            response = client.put(f'/api/activities/{activity_id}',
+                                  json={'score': rng.choice([None, rng.uniform(0, 100)]),
+                                        'completed': rng.random() < 0.5})
+        else:
+            response = client.delete(f'/api/activities/{activity_id}')
+        assert response.status_code == 200, response.data
+
+
+def exact_values(db, course_ids):
+    """直接从活动记录计算每门课程的得分列表和每个选课学生的完成率列表"""
+    from sqlalchemy import func, case
+    from app.models import Activity
+    from app.models.course import course_students
+
+    scores = {course_id: [] for course_id in course_ids}
+    for course_id, score in db.session.query(Activity.course_id, Activity.score).filter(Activity.score.isnot(None)):
+        scores[course_id].append(min(100.0, max(0.0, score)))
+    rates = {course_id: [] for course_id in course_ids}
+    totals = db.session.query(
+            Activity.user_id, Activity.course_id, func.count(Activity.id).label('total'),
+            func.sum(case((Activity.completed == True, 1), else_=0)).label('completed')
+        ).group_by(Activity.user_id, Activity.course_id).subquery()
+    for course_id, total, completed in db.session.query(course_students.c.course_id, totals.c.total, totals.c.completed) \
+            .outerjoin(totals, (totals.c.user_id == course_students.c.user_id)
+                       & (totals.c.course_id == course_students.c.course_id)):
+        rates[course_id].append(completed / total * 100 if total else 0)
+    return {'activity_score': scores, 'completion_rate': rates}
+
+
+def sketch_table(db):
+    from app.models import CourseQuantileSketch
+
+    return sorted(db.session.query(CourseQuantileSketch.course_id, CourseQuantileSketch.metric,
+                                   CourseQuantileSketch.bin, CourseQuantileSketch.count))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='课程分位数草图准确性基准')
+    parser.add_argument('--courses', type=int, default=4)
+    parser.add_argument('--students', type=int, default=500)
+    parser.add_argument('--activities', type=int, default=40, help='每个学生在每门课程的最多活动数')
+    parser.add_argument('--mutations', type=int, default=500)
+    args = parser.parse_args()
+
+    from app import db
+    from app.services.sketches import BINS_PER_UNIT, load_sketches, rebuild_sketches
+
+    tolerance = 0.5 / BINS_PER_UNIT + 1e-9
+    app = create_bench_app()
+    client = app.test_client()
+
+    with app.app_context():
+        course_ids = seed(db, args.courses, args.students, args.activities)
+        mutate(db, client, args.mutations)
+        db.session.remove()
+
+        incremental = sketch_table(db)
+        rebuild_sketches()
+        assert sketch_table(db) == incremental, '增量维护的草图与全量重建结果不一致'
+        print(f'增量维护与全量重建一致: {len(incremental)} 个分桶')
+
+        exact = exact_values(db, course_ids)
+        worst = 0.0
+        for metric, per_course in exact.items():
+            groups = [([course_id], per_course[course_id]) for course_id in course_ids]
+            groups.append((course_ids, [value for values in per_course.values() for value in values]))
+            for group_ids, values in groups:
+                sketch = load_sketches(group_ids, (metric,))[metric]
+                assert sketch.count == len(values)
+                for q in QUANTILES:
+                    error = abs(sketch.quantile(q) - exact_quantile(values, q))
+                    worst = max(worst, error)
+                    assert error <= tolerance, f'{metric} {group_ids} q={q} 误差 {error}'
+        print(f'分位数最大误差 {worst:.4f}（允许 {tolerance:.2f}），含 {len(course_ids)} 门课程合并')
+
+        for url in (f'/api/analytics/course/{course_ids[0]}/percentiles?q=0.5,0.9',
+                    '/api/analytics/percentiles?course_ids=' + ','.join(map(str, course_ids))):
+            app.config['ANALYTICS_CACHE_ENABLED'] = False
+            with count_queries(db.engine) as counter:
+                start = time.perf_counter()
+                response = client.get(url)
+                elapsed = (time.perf_counter() - start) * 1000
+            assert response.status_code == 200, response.data
+            print(f'{url.split("?")[0]}: SQL语句 {counter.count} 条, 耗时 {elapsed:.1f} ms')
+
+    print('通过: 草图分位数在误差范围内')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+"""
+SQL语句预算检查
+
+以 QUERY_BUDGET_MODE=report 创建应用，在不同数据规模下请求各 GET 接口:
+- 打印每个接口的 X-Query-Count / X-Query-Budget
+- 已用 @query_budget 标注的接口超出预算时失败，并列出该请求执行的SQL语句
+- 列出仍未标注预算的 GET 路由
+
+用法: python benchmarks/query_budget_check.py [--sizes 5,50]
+"""
+
+import argparse
+import os
+from datetime import datetime, timedelta
+
+os.environ['QUERY_BUDGET_MODE'] = 'report'
+
+from common import create_bench_app  # noqa: E402
+
+
+def seed(db, size):
+    """生成 size 门课程和 size 个学生，第一门课程带 size 个章节、讨论、作业、评价和成绩"""
+    from werkzeug.security import generate_password_hash
+    from app.models import (User, Course, CourseSection, CourseResource, Discussion, DiscussionReply,
+                            Assignment, AssignmentSubmission, CourseReview, GradeSetting, StudentGrade,
+                            CourseProgress, Activity)
+    from app.models.course import course_students
+
+    now = datetime.utcnow()
+    admin = User(account=f'admin{size}', username='管理员', email=f'admin{size}@example.com',
+                 password_hash=generate_password_hash('secret'), role='admin')
+    teachers = [User(account=f't{size}_{i}', username=f'教师{i}', email=f't{size}_{i}@example.com',
+                     password_hash='x', role='teacher') for i in range(size)]
+    students = [User(account=f's{size}_{i}', username=f'学生{i}', email=f's{size}_{i}@example.com',
+                     password_hash='x', role='student') for i in range(size)]
+    db.session.add_all([admin] + teachers + students)
+    db.session.flush()
+
+    courses = [Course(title=f'课程{i}', instructor_id=teachers[i].id) for i in range(size)]
+    db.session.add_all(courses)
+    db.session.flush()
+    course = courses[0]
+    student = students[0]
+    db.session.execute(course_students.insert(), [
+        {'course_id': c.id, 'user_id': s.id, 'enrolled_at': now} for c in courses for s in students
+    ])
+
+    sections = [CourseSection(course_id=course.id, title=f'章节{i}', order=i) for i in range(size)]
+    discussions = [Discussion(course_id=course.id, user_id=s.id, title='话题', content='内容') for s in students]
+    assignments = [Assignment(course_id=course.id, title=f'作业{i}', deadline=now + timedelta(days=7))
+                   for i in range(size)]
+    db.session.add_all(sections + discussions + assignments)
+    db.session.flush()
+
+    db.session.add_all([CourseResource(section_id=sections[0].id, title=f'资源{i}', resource_type='document', order=i)
+                        for i in range(size)])
+    db.session.add_all([DiscussionReply(discussion_id=discussions[0].id, user_id=s.id, content='回复')
+                        for s in students])
+    db.session.add_all([AssignmentSubmission(assignment_id=assignments[0].id, user_id=s.id, content='答案')
+                        for s in students])
+    db.session.add_all([CourseReview(course_id=course.id, user_id=s.id, rating=5, content='好') for s in students])
+    db.session.add_all([GradeSetting(course_id=c.id, final_exam_weight=60, regular_grade_weight=40) for c in courses])
+    db.session.add_all([StudentGrade(course_id=c.id, user_id=s.id, final_exam_score=80, regular_grade=90)
+                        for c in courses for s in students])
+    db.session.add_all([CourseProgress(course_id=c.id, user_id=s.id, progress_percent=50)
+                        for c in courses for s in students])
+    db.session.add_all([Activity(course_id=course.id, user_id=s.id, activity_type='quiz', duration=60, score=80)
+                        for s in students])
+    db.session.commit()
+    return {
+        'course_id': course.id, 'student_id': student.id, 'teacher_id': teachers[0].id,
+        'section_id': sections[0].id, 'discussion_id': discussions[0].id,
+        'assignment_id': assignments[0].id
+    }
+
+
+URLS = [
+    '/api/courses',
+    '/api/courses/{course_id}',
+    '/api/courses/{course_id}/students',
+    '/api/users/{student_id}/courses',
+    '/api/users/{teacher_id}/courses',
+    '/api/users/{student_id}/grades',
+    '/api/courses/{course_id}/grades',
+    '/api/courses/{course_id}/sections',
+    '/api/courses/{course_id}/sections/{section_id}',
+    '/api/sections/{section_id}/resources',
+    '/api/courses/{course_id}/discussions',
+    '/api/courses/{course_id}/discussions/{discussion_id}',
+    '/api/courses/{course_id}/assignments?user_id={student_id}',
+    '/api/courses/{course_id}/assignments/{assignment_id}/submissions',
+    '/api/courses/{course_id}/reviews',
+    '/api/users/{student_id}/activities',
+    '/api/courses/{course_id}/activities',
+    '/api/admin/users',
+    '/api/admin/courses',
+    '/api/admin/courses/{course_id}',
+    '/api/admin/courses/{course_id}/students',
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='SQL语句预算检查')
+    parser.add_argument('--sizes', default='5,50')
+    args = parser.parse_args()
+
+    from app import db
+    from app.utils import query_budget
+
+    app = create_bench_app()
+    # 关闭缓存，按最坏情况（每个请求都查询认证用户）统计
+    app.config.update(ETAG_ENABLED=False, ANALYTICS_CACHE_ENABLED=False, AUTH_PRINCIPAL_CACHE_TTL=0)
+    client = app.test_client()
+    violations = []
+    query_budget.add_violation_listener(violations.append)
+
+    with app.app_context():
+        for size in map(int, args.sizes.split(',')):
+            db.session.remove()
+            db.drop_all()
+            db.create_all()
+            ids = seed(db, size)
+            db.session.remove()
+            token = client.post('/api/auth/login', json={'account': f'admin{size}', 'password': 'secret'}) \
+                .get_json()['token']
+            headers = {'Authorization': f'Bearer {token}'}
+
+            for template in URLS:
+                url = template.format(**ids)
+                # 请求在外层应用上下文中共用会话，清空会话使每个请求像线上一样从数据库读取
+                db.session.remove()
+                response = client.get(url, headers=headers)
+                assert response.status_code == 200, (url, response.data)
+                budget = response.headers.get('X-Query-Budget', '-')
+                print(f'规模 {size:>3} {url}: SQL语句 {response.headers["X-Query-Count"]} 条, 预算 {budget}')
+
+        unbudgeted = sorted(
+            rule.rule for rule in app.url_map.iter_rules()
+            if rule.endpoint.startswith('api.') and 'GET' in rule.methods
+            and getattr(app.view_functions[rule.endpoint], 'query_budget', None) is None
+        )
+        print(f'未标注预算的 GET 路由 {len(unbudgeted)} 个: ' + ', '.join(unbudgeted))
+
+    assert not violations, '\n\n'.join(query_budget.format_violation(violation) for violation in violations)
+    print('通过: 已标注的接口均未超出SQL语句预算')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,279 @@
+"""
+合成数据生成器
+
+按固定随机种子生成可复现的数据集：用户、课程、章节、资源、选课、作业提交、资源进度、成绩和学习活动。
+明细数据按块批量插入（每块一条 executemany），日汇总、分位数草图、排行计数、课程进度、
+反范式计数和总评成绩生成后由各自的全量重建函数计算，与线上写入路径维护的结果一致。
+
+课程和学生的活跃程度呈长尾分布；活动时间分布在锚定日期之前的 --days 天内，锚定日期默认为当天，
+同一种子、同一锚定日期生成的数据完全相同。
+
+用法:
+    python benchmarks/synthetic_data.py --scale small --db /tmp/synthetic.db
+    python benchmarks/synthetic_data.py --scale production --db /tmp/prod.db --activities 5000000
+"""
+
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+from itertools import accumulate
+
+from common import create_bench_app
+
+# 预设规模，命令行参数可覆盖其中任意一项
+SCALES = {
+    'small': {
+        'students': 500, 'teachers': 20, 'courses': 20, 'enrollments_per_student': 4,
+        'sections_per_course': 4, 'resources_per_section': 4, 'assignments_per_course': 5,
+        'activities': 100000, 'days': 90,
+    },
+    'medium': {
+        'students': 5000, 'teachers': 100, 'courses': 100, 'enrollments_per_student': 5,
+        'sections_per_course': 5, 'resources_per_section': 4, 'assignments_per_course': 8,
+        'activities': 1000000, 'days': 180,
+    },
+    'production': {
+        'students': 50000, 'teachers': 500, 'courses': 500, 'enrollments_per_student': 6,
+        'sections_per_course': 6, 'resources_per_section': 5, 'assignments_per_course': 10,
+        'activities': 5000000, 'days': 365,
+    },
+}
+
+# 提交作业的基础比例和有成绩的比例
+SUBMISSION_RATE = 0.6
+GRADED_RATE = 0.9
+
+ACTIVITY_TYPES = ('video_watch', 'document_read', 'quiz', 'assignment', 'discussion')
+ACTIVITY_TYPE_WEIGHTS = (40, 25, 15, 10, 10)
+SCORED_TYPES = ('quiz', 'assignment')
+RESOURCE_TYPES = ('video', 'document', 'file')
+GRADE_WEIGHTS = ((60, 40), (50, 50), (70, 30))
+
+ADMIN_ACCOUNT = 'bench_admin'
+ADMIN_PASSWORD = 'secret'
+
+CHUNK_SIZE = 20000
+
+
+def _insert(db, table, rows):
+    """分块 executemany 插入"""
+    for start in range(0, len(rows), CHUNK_SIZE):
+        db.session.execute(table.insert(), rows[start:start + CHUNK_SIZE])
+
+
+def _ids(db, column):
+    return [row_id for (row_id,) in db.session.query(column).order_by(column)]
+
+
+def _distinct_choices(rng, population, weights, k):
+    """按权重不放回地抽取 k 个"""
+    k = min(k, len(population))
+    chosen = set()
+    while len(chosen) < k:
+        chosen.update(rng.choices(population, weights, k=k - len(chosen)))
+    return sorted(chosen)
+
+
+def _log(message, started):
+    print(f'[{time.perf_counter() - started:7.1f}s] {message}')
+
+
+def generate(db, students, teachers, courses, enrollments_per_student, sections_per_course,
+             resources_per_section, assignments_per_course, activities, days, seed=0, anchor=None):
+    """在空数据库中生成数据集，需在应用上下文中调用，返回各表行数"""
+    from werkzeug.security import generate_password_hash
+    from app.models import (User, Course, CourseSection, CourseResource, Assignment, AssignmentSubmission,
+                            ResourceProgress, GradeSetting, StudentGrade, Activity)
+    from app.models.course import course_students
+    from app.services import gradebook
+    from app.services.counters import check_counters
+    from app.services.leaderboards import rebuild_leaderboards
+    from app.services.progress_engine import recompute_course_progress
+    from app.services.rollups import backfill_rollups
+    from app.services.sketches import rebuild_sketches
+
+    rng = random.Random(seed)
+    started = time.perf_counter()
+    anchor = anchor or datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    created_at = anchor - timedelta(days=days + 30)
+    stamps = {'created_at': created_at, 'updated_at': created_at}
+    counts = {}
+
+    # 用户：管理员、教师、学生
+    password_hash = generate_password_hash(ADMIN_PASSWORD)
+    users = [dict(stamps, account=ADMIN_ACCOUNT, username='基准管理员', email=f'{ADMIN_ACCOUNT}@example.com',
+                  password_hash=password_hash, role='admin')]
+    users += [dict(stamps, account=f'teacher{i}', username=f'教师{i}', email=f'teacher{i}@example.com',
+                   password_hash='x', role='teacher') for i in range(teachers)]
+    users += [dict(stamps, account=f'student{i}', username=f'学生{i}', email=f'student{i}@example.com',
+                   password_hash='x', role='student') for i in range(students)]
+    _insert(db, User.__table__, users)
+    teacher_ids = _ids(db, User.id)[1:teachers + 1]
+    student_ids = [user_id for (user_id,) in db.session.query(User.id).filter(User.role == 'student')
+                   .order_by(User.id)]
+    counts['users'] = len(users)
+
+    # 课程、章节、资源、作业
+    _insert(db, Course.__table__, [
+        dict(stamps, title=f'课程{i}', description=f'合成课程{i}', instructor_id=teacher_ids[i % teachers],
+             status='active')
+        for i in range(courses)
+    ])
+    course_ids = _ids(db, Course.id)
+    _insert(db, CourseSection.__table__, [
+        dict(stamps, course_id=course_id, title=f'第{order + 1}章', order=order)
+        for course_id in course_ids for order in range(sections_per_course)
+    ])
+    sections = db.session.query(CourseSection.id, CourseSection.course_id).order_by(CourseSection.id).all()
+    _insert(db, CourseResource.__table__, [
+        dict(stamps, section_id=section_id, title=f'资源{order + 1}', resource_type=rng.choice(RESOURCE_TYPES),
+             order=order)
+        for section_id, _ in sections for order in range(resources_per_section)
+    ])
+    resources_by_course = {course_id: [] for course_id in course_ids}
+    for resource_id, course_id in db.session.query(CourseResource.id, CourseSection.course_id) \
+            .join(CourseSection, CourseSection.id == CourseResource.section_id).order_by(CourseResource.id):
+        resources_by_course[course_id].append(resource_id)
+    _insert(db, Assignment.__table__, [
+        dict(stamps, course_id=course_id, title=f'作业{order + 1}', points=10,
+             deadline=anchor - timedelta(days=days) + timedelta(days=(order + 1) * days // (assignments_per_course + 1)))
+        for course_id in course_ids for order in range(assignments_per_course)
+    ])
+    assignments_by_course = {course_id: [] for course_id in course_ids}
+    for assignment_id, course_id in db.session.query(Assignment.id, Assignment.course_id).order_by(Assignment.id):
+        assignments_by_course[course_id].append(assignment_id)
+    counts.update(courses=len(course_ids), sections=len(sections),
+                  resources=sum(map(len, resources_by_course.values())),
+                  assignments=sum(map(len, assignments_by_course.values())))
+    db.session.commit()
+    _log(f"用户 {counts['users']}，课程 {counts['courses']}，资源 {counts['resources']}", started)
+
+    # 选课：热门课程选课人数多；每个学生有一个勤奋程度，决定提交、完成和活动数量
+    course_weights = [1 / (i + 1) ** 0.8 for i in range(len(course_ids))]
+    diligence = {student_id: rng.betavariate(2, 2) for student_id in student_ids}
+    enrollments = [
+        (student_id, course_id)
+        for student_id in student_ids
+        for course_id in _distinct_choices(rng, course_ids, course_weights, enrollments_per_student)
+    ]
+    _insert(db, course_students, [
+        {'course_id': course_id, 'user_id': student_id, 'enrolled_at': created_at}
+        for student_id, course_id in enrollments
+    ])
+    counts['enrollments'] = len(enrollments)
+
+    # 作业提交、资源进度、成绩
+    submissions, resource_progress, grades = [], [], []
+    for student_id, course_id in enrollments:
+        level = diligence[student_id]
+        for assignment_id in assignments_by_course[course_id]:
+            if rng.random() < SUBMISSION_RATE * (0.5 + level):
+                submissions.append({
+                    'assignment_id': assignment_id, 'user_id': student_id, 'content': '合成提交',
+                    'submit_time': anchor - timedelta(seconds=rng.randint(0, days * 86400)),
+                    'grade': rng.randint(4, 10) if rng.random() < GRADED_RATE else None
+                })
+        for resource_id in resources_by_course[course_id]:
+            if rng.random() < level:
+                resource_progress.append(dict(stamps, user_id=student_id, resource_id=resource_id,
+                                              progress_percent=100.0, completed=True))
+            elif rng.random() < 0.3:
+                resource_progress.append(dict(stamps, user_id=student_id, resource_id=resource_id,
+                                              progress_percent=round(rng.uniform(5, 95), 1), completed=False))
+        if rng.random() < GRADED_RATE:
+            grades.append(dict(stamps, user_id=student_id, course_id=course_id,
+                               final_exam_score=round(min(100.0, max(0.0, rng.gauss(50 + 40 * level, 12))), 1),
+                               regular_grade=round(min(100.0, max(0.0, rng.gauss(60 + 35 * level, 10))), 1)))
+    _insert(db, AssignmentSubmission.__table__, submissions)
+    _insert(db, ResourceProgress.__table__, resource_progress)
+    _insert(db, GradeSetting.__table__, [
+        dict(stamps, course_id=course_id, final_exam_weight=final_weight, regular_grade_weight=regular_weight)
+        for course_id in course_ids for final_weight, regular_weight in [rng.choice(GRADE_WEIGHTS)]
+    ])
+    _insert(db, StudentGrade.__table__, grades)
+    db.session.commit()
+    counts.update(submissions=len(submissions), resource_progress=len(resource_progress), grades=len(grades))
+    _log(f"选课 {counts['enrollments']}，提交 {counts['submissions']}，资源进度 {counts['resource_progress']}，"
+         f"成绩 {counts['grades']}", started)
+
+    # 学习活动：按学生勤奋程度和课程热度加权选取选课记录，分块生成以控制内存
+    course_rank = {course_id: rank for rank, course_id in enumerate(course_ids)}
+    cumulative = list(accumulate(diligence[student_id] * course_weights[course_rank[course_id]] ** 0.5
+                                 for student_id, course_id in enrollments))
+    span = days * 86400
+    for start in range(0, activities, CHUNK_SIZE):
+        size = min(CHUNK_SIZE, activities - start)
+        rows = []
+        for (student_id, course_id), activity_type in zip(
+                rng.choices(enrollments, cum_weights=cumulative, k=size),
+                rng.choices(ACTIVITY_TYPES, ACTIVITY_TYPE_WEIGHTS, k=size)):
+            level = diligence[student_id]
+            when = anchor - timedelta(seconds=int(span * rng.random() ** 1.5))
+            resources = resources_by_course[course_id]
+            scored = activity_type in SCORED_TYPES
+            rows.append({
+                'user_id': student_id, 'course_id': course_id, 'activity_type': activity_type,
+                'resource_id': str(rng.choice(resources)) if resources else None,
+                'duration': int(rng.lognormvariate(5.5, 0.8)),
+                'score': round(min(100.0, max(0.0, rng.gauss(55 + 40 * level, 15))), 1) if scored else None,
+                'completed': rng.random() < 0.3 + 0.6 * level,
+                'data_json': None, 'created_at': when, 'updated_at': when
+            })
+        db.session.execute(Activity.__table__.insert(), rows)
+        db.session.commit()
+        if (start // CHUNK_SIZE) % 25 == 24:
+            _log(f'活动 {start + size}/{activities}', started)
+    counts['activities'] = activities
+    _log(f'活动 {activities}', started)
+
+    # 派生数据：与线上增量维护的结果一致
+    counts['rollups'] = backfill_rollups()
+    counts['sketch_bins'] = rebuild_sketches()
+    counts['leaderboard_rows'] = rebuild_leaderboards()
+    for course_id in course_ids:
+        recompute_course_progress(course_id)
+    gradebook.recompute_total_scores()
+    db.session.commit()
+    check_counters(fix=True)
+    _log('日汇总、草图、排行、进度、总评和计数已重建', started)
+
+    return counts
+
+
+def add_scale_arguments(parser):
+    """规模相关的命令行参数，供基准脚本复用"""
+    parser.add_argument('--scale', choices=sorted(SCALES), default='small')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--anchor', type=lambda value: datetime.strptime(value, '%Y-%m-%d'), default=None,
+                        help='活动时间的锚定日期 YYYY-MM-DD，默认为当天')
+    for name in SCALES['small']:
+        parser.add_argument(f"--{name.replace('_', '-')}", type=int, default=None, dest=name)
+
+
+def scale_params(args):
+    params = dict(SCALES[args.scale])
+    params.update({name: getattr(args, name) for name in params if getattr(args, name) is not None})
+    return params
+
+
+def main():
+    parser = argparse.ArgumentParser(description='合成数据生成器')
+    parser.add_argument('--db', required=True, help='SQLite 数据库文件路径，已有数据会被清空')
+    add_scale_arguments(parser)
+    args = parser.parse_args()
+
+    from app import db
+
+    params = scale_params(args)
+    app = create_bench_app(args.db)
+    # 批量插入和全量重建必然超过慢查询阈值
+    app.config['INSTRUMENTATION_SLOW_QUERY_MS'] = 0
+    with app.app_context():
+        counts = generate(db, seed=args.seed, anchor=args.anchor, **params)
+    for name, count in counts.items():
+        print(f'{name}: {count}')
+
+
+if __name__ == '__main__':
+    main()
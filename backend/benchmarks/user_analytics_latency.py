@@ -0,0 +1,110 @@
+"""
+用户学习分析接口延迟基准
+
+为一个学生生成一年内的大量活动（分布在多门课程，其中一门未选课），测量
+/api/analytics/user/<id> 的SQL语句数量和响应时间，并与直接聚合原始活动记录的结果对比。
+
+用法: python benchmarks/user_analytics_latency.py [--activities 100000] [--budget 20]
+"""
+
+import argparse
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from common import create_bench_app, count_queries
+
+COURSE_COUNT = 6
+ACTIVITY_TYPES = ['video_watch', 'quiz', 'assignment']
+
+
+def seed(db, activity_count):
+    from app.models import User, Course, Activity
+    from app.models.course import course_students
+    from app.services.rollups import backfill_rollups
+
+    rng = random.Random(0)
+    now = datetime.utcnow()
+    student = User(account='s0', username='学生', email='s0@example.com', password_hash='x', role='student')
+    courses = [Course(title=f'课程{i}') for i in range(COURSE_COUNT)]
+    db.session.add(student)
+    db.session.add_all(courses)
+    db.session.flush()
+
+    # 最后一门课程未选，其活动只计入总数
+    db.session.execute(course_students.insert(), [
+        {'course_id': course.id, 'user_id': student.id, 'enrolled_at': now} for course in courses[:-1]
+    ])
+    rows = []
+    for _ in range(activity_count):
+        created_at = now - timedelta(seconds=rng.randint(0, 365 * 86400))
+        rows.append({
+            'user_id': student.id, 'course_id': rng.choice(courses).id,
+            'activity_type': rng.choice(ACTIVITY_TYPES), 'duration': rng.randint(10, 600),
+            'score': rng.uniform(0, 100) if rng.random() < 0.5 else None,
+            'completed': rng.random() < 0.6, 'created_at': created_at, 'updated_at': created_at
+        })
+    db.session.execute(Activity.__table__.insert(), rows)
+    db.session.commit()
+    backfill_rollups()
+    return student.id
+
+
+def expected_stats(db, user_id):
+    """直接聚合原始活动记录"""
+    from sqlalchemy import func, case
+    from app.models import Activity
+
+    return {
+        course_id: (total, completed, duration)
+        for course_id, total, completed, duration in db.session.query(
+            Activity.course_id, func.count(Activity.id),
+            func.sum(case((Activity.completed == True, 1), else_=0)), func.sum(Activity.duration)
+        ).filter(Activity.user_id == user_id).group_by(Activity.course_id)
+    }, db.session.query(func.avg(Activity.score)).filter(Activity.user_id == user_id).scalar()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='用户学习分析接口延迟基准')
+    parser.add_argument('--activities', type=int, default=100000)
+    parser.add_argument('--budget', type=float, default=20.0, help='响应时间中位数上限（毫秒）')
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    from app import db
+
+    app = create_bench_app()
+    client = app.test_client()
+
+    with app.app_context():
+        user_id = seed(db, args.activities)
+        per_course, avg_score = expected_stats(db, user_id)
+        db.session.remove()
+
+        timings = []
+        for _ in range(args.repeat):
+            with count_queries(db.engine) as counter:
+                start = time.perf_counter()
+                response = client.get(f'/api/analytics/user/{user_id}')
+                timings.append((time.perf_counter() - start) * 1000)
+            assert response.status_code == 200, response.data
+
+    payload = response.get_json()
+    assert payload['total_activities'] == args.activities
+    assert payload['completed_activities'] == sum(stats[1] for stats in per_course.values())
+    assert payload['total_duration'] == sum(stats[2] for stats in per_course.values())
+    assert abs(payload['avg_score'] - avg_score) < 1e-6
+    assert len(payload['course_progress']) == COURSE_COUNT - 1
+    for item in payload['course_progress']:
+        assert (item['total_activities'], item['completed_activities'], item['total_duration']) \
+            == per_course[item['course_id']]
+
+    median = statistics.median(timings)
+    print(f'{args.activities} 条活动: SQL语句 {counter.count} 条, 响应时间中位数 {median:.1f} ms')
+    assert median < args.budget, f'响应时间 {median:.1f} ms 超出预算 {args.budget} ms'
+    print('通过: 结果与原始活动记录一致')
+
+
+if __name__ == '__main__':
+    main()
@@ -4,11 +4,83 @@ from dotenv import load_dotenv
 # 加载.env文件中的环境变量
 load_dotenv()
 
+def engine_options(database_uri):
+    """按数据库类型生成 SQLALCHEMY_ENGINE_OPTIONS
+
+    MySQL（pymysql）使用连接池：连接在服务端 wait_timeout 或代理断开前回收，取用前 ping 检测失效连接。
+    SQLite 文件库由 Flask-SQLAlchemy 使用默认连接池，调优通过 SQLITE_PRAGMAS 完成。
+    """
+    if database_uri.startswith('mysql'):
+        return {
+            'pool_size': int(os.environ.get('DB_POOL_SIZE', 10)),
+            'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 20)),
+            'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT', 30)),  # 秒
+            'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 1800)),  # 秒
+            'pool_pre_ping': True
+        }
+    return {}
+
 class Config:
     """基础配置"""
     SECRET_KEY = os.environ.get('SECRET_KEY', 'dev_key')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'sqlite:///learning_analytics.db')
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI)
+
+    # SQLite 连接参数（见 app.utils.sqlite_pragmas），每个新连接建立时执行；
+    # WAL 模式写入数据库文件后持久生效，读写互不阻塞，但不适用于网络文件系统
+    SQLITE_PRAGMAS_ENABLED = os.environ.get('SQLITE_PRAGMAS_ENABLED', '1') == '1'
+    SQLITE_PRAGMAS = {
+        'journal_mode': os.environ.get('SQLITE_JOURNAL_MODE', 'WAL'),
+        # WAL 模式下 NORMAL 只在检查点时同步，掉电可能丢失最近提交的事务但不会损坏数据库
+        'synchronous': os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL'),
+        # 等待其他进程释放写锁的毫秒数，超时才报 database is locked
+        'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT', 5000)),
+        'mmap_size': int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),  # 字节
+        'cache_size': int(os.environ.get('SQLITE_CACHE_SIZE', -16000)),  # 负数单位为KB，每个连接一份
+        'temp_store': 'MEMORY'
+    }
+
+    # 分析接口响应缓存
+    ANALYTICS_CACHE_ENABLED = os.environ.get('ANALYTICS_CACHE_ENABLED', '1') == '1'
+    ANALYTICS_CACHE_TTL = int(os.environ.get('ANALYTICS_CACHE_TTL', 60))  # 秒
+    ANALYTICS_CACHE_MAX_ENTRIES = int(os.environ.get('ANALYTICS_CACHE_MAX_ENTRIES', 1024))
+    # 'memory' 为进程内缓存；'redis' 为多进程共享缓存；也可以直接设置为自定义后端对象
+    ANALYTICS_CACHE_BACKEND = os.environ.get('ANALYTICS_CACHE_BACKEND', 'memory')
+    ANALYTICS_CACHE_REDIS_URL = os.environ.get('ANALYTICS_CACHE_REDIS_URL')
+
+    # 基于数据版本号的ETag条件响应；版本号保存在上面的缓存后端中，
+    # 各进程的 memory 后端版本号互不可见，因此默认只在 redis 后端下开启；
+    # 在 memory 后端下显式开启时，ETag 每隔 ANALYTICS_CACHE_TTL 秒轮换一次，过期数据最多返回一个TTL
+    ETAG_ENABLED = os.environ.get('ETAG_ENABLED', '1' if ANALYTICS_CACHE_BACKEND == 'redis' else '0') == '1'
+
+    # 活动写缓冲：POST /activities 入队后立即返回202，由后台线程批量写入
+    ACTIVITY_BUFFER_ENABLED = os.environ.get('ACTIVITY_BUFFER_ENABLED', '0') == '1'
+    ACTIVITY_BUFFER_MAX_SIZE = int(os.environ.get('ACTIVITY_BUFFER_MAX_SIZE', 50000))  # 超出后返回503
+    ACTIVITY_BUFFER_FLUSH_SIZE = int(os.environ.get('ACTIVITY_BUFFER_FLUSH_SIZE', 1000))
+    ACTIVITY_BUFFER_FLUSH_INTERVAL = float(os.environ.get('ACTIVITY_BUFFER_FLUSH_INTERVAL', 1.0))  # 秒
+    # spool 文件目录，默认为 instance/activity_spool
+    ACTIVITY_BUFFER_SPOOL_DIR = os.environ.get('ACTIVITY_BUFFER_SPOOL_DIR')
+
+    # 认证身份缓存：按 (用户ID, 令牌签发时间) 缓存已验证的用户，0 表示不缓存；
+    # 用户修改、删除时本进程的缓存立即失效，其他进程最多在 TTL 内读到旧身份
+    AUTH_PRINCIPAL_CACHE_TTL = int(os.environ.get('AUTH_PRINCIPAL_CACHE_TTL', 30))  # 秒
+    AUTH_PRINCIPAL_CACHE_MAX_ENTRIES = int(os.environ.get('AUTH_PRINCIPAL_CACHE_MAX_ENTRIES', 10000))
+    # 直接信任令牌中的角色声明，认证不访问数据库；令牌签发后用户被修改或删除过的仍会查询
+    AUTH_TRUST_TOKEN_ROLE = os.environ.get('AUTH_TRUST_TOKEN_ROLE', '0') == '1'
+
+    # 请求埋点：按端点统计请求耗时、SQL语句数和SQL耗时，GET /metrics 导出 Prometheus 指标
+    INSTRUMENTATION_ENABLED = os.environ.get('INSTRUMENTATION_ENABLED', '1') == '1'
+    INSTRUMENTATION_METRICS_ENABLED = os.environ.get('INSTRUMENTATION_METRICS_ENABLED', '1') == '1'
+    # 详细追踪（每条SQL语句）的抽样比例，需开启 app.services.instrumentation 的 INFO 日志
+    INSTRUMENTATION_TRACE_SAMPLE_RATE = float(os.environ.get('INSTRUMENTATION_TRACE_SAMPLE_RATE', 0.01))
+    # 慢查询日志阈值（毫秒），0 表示不记录
+    INSTRUMENTATION_SLOW_QUERY_MS = float(os.environ.get('INSTRUMENTATION_SLOW_QUERY_MS', 200))
+
+    # 每请求SQL语句预算（见 app.utils.query_budget）：'off'、'report'（预发布，输出响应头和日志）、'enforce'（测试）
+    QUERY_BUDGET_MODE = os.environ.get('QUERY_BUDGET_MODE', 'off')
+    # 未用 @query_budget 标注的路由的预算，不设置表示不限
+    QUERY_BUDGET_DEFAULT = int(os.environ['QUERY_BUDGET_DEFAULT']) if os.environ.get('QUERY_BUDGET_DEFAULT') else None
 
 class DevelopmentConfig(Config):
     """开发环境配置"""
@@ -18,6 +90,7 @@ class TestingConfig(Config):
     """测试环境配置"""
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///test.db'
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI)
 
 class ProductionConfig(Config):
     """生产环境配置"""
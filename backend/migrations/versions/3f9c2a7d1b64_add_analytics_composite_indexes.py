@@ -0,0 +1,58 @@
+"""add composite indexes for analytics queries
+
+Revision ID: 3f9c2a7d1b64
+Revises: add_grade_tables
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f9c2a7d1b64'
+down_revision = 'add_grade_tables'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 学习活动表：按课程/用户/时间/类型过滤的分析查询
+    with op.batch_alter_table('activities', schema=None) as batch_op:
+        batch_op.create_index('ix_activities_course_user', ['course_id', 'user_id'], unique=False)
+        batch_op.create_index('ix_activities_user_created', ['user_id', 'created_at'], unique=False)
+        batch_op.create_index('ix_activities_course_created', ['course_id', 'created_at'], unique=False)
+        batch_op.create_index('ix_activities_course_type', ['course_id', 'activity_type'], unique=False)
+        batch_op.create_index('ix_activities_created_at', ['created_at'], unique=False)
+
+    # 课程进度表：按课程统计进度分布
+    with op.batch_alter_table('course_progress', schema=None) as batch_op:
+        batch_op.create_index('ix_course_progress_course', ['course_id', 'progress_percent'], unique=False)
+
+    # 资源进度表：按资源查询/删除进度记录
+    with op.batch_alter_table('resource_progress', schema=None) as batch_op:
+        batch_op.create_index('ix_resource_progress_resource', ['resource_id', 'completed'], unique=False)
+
+    # 作业提交表：按作业和用户查询提交记录
+    with op.batch_alter_table('assignment_submissions', schema=None) as batch_op:
+        batch_op.create_index('ix_assignment_submissions_assignment_user', ['assignment_id', 'user_id'], unique=False)
+        batch_op.create_index('ix_assignment_submissions_user', ['user_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('assignment_submissions', schema=None) as batch_op:
+        batch_op.drop_index('ix_assignment_submissions_user')
+        batch_op.drop_index('ix_assignment_submissions_assignment_user')
+
+    with op.batch_alter_table('resource_progress', schema=None) as batch_op:
+        batch_op.drop_index('ix_resource_progress_resource')
+
+    with op.batch_alter_table('course_progress', schema=None) as batch_op:
+        batch_op.drop_index('ix_course_progress_course')
+
+    with op.batch_alter_table('activities', schema=None) as batch_op:
+        batch_op.drop_index('ix_activities_created_at')
+        batch_op.drop_index('ix_activities_course_type')
+        batch_op.drop_index('ix_activities_course_created')
+        batch_op.drop_index('ix_activities_user_created')
+        batch_op.drop_index('ix_activities_course_user')
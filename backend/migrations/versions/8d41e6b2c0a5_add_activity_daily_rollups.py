@@ -0,0 +1,59 @@
+"""add activity daily rollups
+
+Revision ID: 8d41e6b2c0a5
+Revises: 3f9c2a7d1b64
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d41e6b2c0a5'
+down_revision = '3f9c2a7d1b64'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('activity_daily_rollups',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('date', sa.Date(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('course_id', sa.Integer(), nullable=False),
+    sa.Column('activity_type', sa.String(length=50), nullable=False),
+    sa.Column('activity_count', sa.Integer(), nullable=False),
+    sa.Column('duration_sum', sa.Integer(), nullable=False),
+    sa.Column('score_sum', sa.Float(), nullable=False),
+    sa.Column('score_count', sa.Integer(), nullable=False),
+    sa.Column('completed_count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['course_id'], ['courses.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('date', 'user_id', 'course_id', 'activity_type', name='uq_activity_daily_rollup')
+    )
+    with op.batch_alter_table('activity_daily_rollups', schema=None) as batch_op:
+        batch_op.create_index('ix_activity_daily_rollups_user_date', ['user_id', 'date'], unique=False)
+        batch_op.create_index('ix_activity_daily_rollups_course_date', ['course_id', 'date'], unique=False)
+
+    # 根据已有活动记录回填汇总数据（之后可用 flask rollups backfill 重建）
+    op.execute("""
+        INSERT INTO activity_daily_rollups
+            (date, user_id, course_id, activity_type,
+             activity_count, duration_sum, score_sum, score_count, completed_count)
+        SELECT DATE(created_at), user_id, course_id, activity_type,
+               COUNT(id), COALESCE(SUM(duration), 0), COALESCE(SUM(score), 0), COUNT(score),
+               COALESCE(SUM(CASE WHEN completed = 1 THEN 1 ELSE 0 END), 0)
+        FROM activities
+        WHERE created_at IS NOT NULL
+        GROUP BY DATE(created_at), user_id, course_id, activity_type
+    """)
+
+
+def downgrade():
+    with op.batch_alter_table('activity_daily_rollups', schema=None) as batch_op:
+        batch_op.drop_index('ix_activity_daily_rollups_course_date')
+        batch_op.drop_index('ix_activity_daily_rollups_user_date')
+
+    op.drop_table('activity_daily_rollups')
@@ -0,0 +1,56 @@
+"""add progress counters to course_progress
+
+Revision ID: b7e3f19a4c82
+Revises: 8d41e6b2c0a5
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7e3f19a4c82'
+down_revision = '8d41e6b2c0a5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('course_progress', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('completed_resources', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('total_resources', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('submitted_assignments', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('total_assignments', sa.Integer(), nullable=False, server_default='0'))
+
+    # 根据现有资源进度和作业提交初始化计数（之后可用 flask progress check --fix 校正）
+    op.execute("""
+        UPDATE course_progress SET
+            total_resources = (
+                SELECT COUNT(*) FROM course_resources r
+                JOIN course_sections s ON r.section_id = s.id
+                WHERE s.course_id = course_progress.course_id),
+            completed_resources = (
+                SELECT COUNT(*) FROM resource_progress rp
+                JOIN course_resources r ON rp.resource_id = r.id
+                JOIN course_sections s ON r.section_id = s.id
+                WHERE s.course_id = course_progress.course_id
+                  AND rp.user_id = course_progress.user_id
+                  AND rp.completed = 1),
+            total_assignments = (
+                SELECT COUNT(*) FROM assignments a
+                WHERE a.course_id = course_progress.course_id),
+            submitted_assignments = (
+                SELECT COUNT(DISTINCT sub.assignment_id) FROM assignment_submissions sub
+                JOIN assignments a ON sub.assignment_id = a.id
+                WHERE a.course_id = course_progress.course_id
+                  AND sub.user_id = course_progress.user_id)
+    """)
+
+
+def downgrade():
+    with op.batch_alter_table('course_progress', schema=None) as batch_op:
+        batch_op.drop_column('total_assignments')
+        batch_op.drop_column('submitted_assignments')
+        batch_op.drop_column('total_resources')
+        batch_op.drop_column('completed_resources')
@@ -0,0 +1,52 @@
+"""add denormalized student, reply and submission counters
+
+Revision ID: c4a8d2f61e93
+Revises: b7e3f19a4c82
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4a8d2f61e93'
+down_revision = 'b7e3f19a4c82'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('courses', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('student_count', sa.Integer(), nullable=False, server_default='0'))
+
+    with op.batch_alter_table('discussions', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('replies_count', sa.Integer(), nullable=False, server_default='0'))
+
+    with op.batch_alter_table('assignments', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('submissions_count', sa.Integer(), nullable=False, server_default='0'))
+
+    # 根据现有明细初始化计数（之后可用 flask counters reconcile --fix 校正）
+    op.execute("""
+        UPDATE courses SET student_count = (
+            SELECT COUNT(*) FROM course_students cs WHERE cs.course_id = courses.id)
+    """)
+    op.execute("""
+        UPDATE discussions SET replies_count = (
+            SELECT COUNT(*) FROM discussion_replies r WHERE r.discussion_id = discussions.id)
+    """)
+    op.execute("""
+        UPDATE assignments SET submissions_count = (
+            SELECT COUNT(*) FROM assignment_submissions s WHERE s.assignment_id = assignments.id)
+    """)
+
+
+def downgrade():
+    with op.batch_alter_table('assignments', schema=None) as batch_op:
+        batch_op.drop_column('submissions_count')
+
+    with op.batch_alter_table('discussions', schema=None) as batch_op:
+        batch_op.drop_column('replies_count')
+
+    with op.batch_alter_table('courses', schema=None) as batch_op:
+        batch_op.drop_column('student_count')
@@ -0,0 +1,58 @@
+"""add activity leaderboard counts
+
+Revision ID: e8c3f0a1b742
+Revises: d5b1e7a93c20
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e8c3f0a1b742'
+down_revision = 'd5b1e7a93c20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('courses', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('activity_count', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.create_index('ix_courses_activity_count', ['activity_count'], unique=False)
+
+    op.create_table('course_user_activity_counts',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('course_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('activity_count', sa.Integer(), nullable=False),
+    sa.Column('completed_count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['course_id'], ['courses.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('course_id', 'user_id', name='uq_course_user_activity_count')
+    )
+    with op.batch_alter_table('course_user_activity_counts', schema=None) as batch_op:
+        batch_op.create_index('ix_course_user_activity_counts_rank', ['course_id', 'activity_count'], unique=False)
+
+    # 根据已有活动记录初始化计数（之后可用 flask leaderboards rebuild 重建）
+    op.execute("""
+        UPDATE courses SET activity_count = (
+            SELECT COUNT(*) FROM activities a WHERE a.course_id = courses.id)
+    """)
+    op.execute("""
+        INSERT INTO course_user_activity_counts (course_id, user_id, activity_count, completed_count)
+        SELECT course_id, user_id, COUNT(id), COALESCE(SUM(CASE WHEN completed = 1 THEN 1 ELSE 0 END), 0)
+        FROM activities GROUP BY course_id, user_id
+    """)
+
+
+def downgrade():
+    with op.batch_alter_table('course_user_activity_counts', schema=None) as batch_op:
+        batch_op.drop_index('ix_course_user_activity_counts_rank')
+
+    op.drop_table('course_user_activity_counts')
+
+    with op.batch_alter_table('courses', schema=None) as batch_op:
+        batch_op.drop_index('ix_courses_activity_count')
+        batch_op.drop_column('activity_count')
@@ -0,0 +1,58 @@
+"""
+测试公共夹具
+
+每个测试使用独立的内存SQLite数据库；配置在创建应用时才导入，
+以便插件先设置好环境变量。
+
+启用 SQL语句预算插件，默认为 enforce 模式：任一请求超出其 @query_budget 时测试失败，
+可用 --query-budget=report 只记录不抛异常（超出预算的测试仍然失败）。
+"""
+
+import os
+import sys
+
+import pytest
+
+# 将 backend 目录添加到 Python 路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+pytest_plugins = ['app.utils.query_budget_pytest']
+
+
+@pytest.fixture
+def app():
+    from config import config, TestingConfig
+    from app import create_app, db
+
+    class PytestConfig(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = 'sqlite://'
+        SQLALCHEMY_ENGINE_OPTIONS = {}
+        # 每个请求都查询认证用户，按最坏情况统计SQL语句
+        AUTH_PRINCIPAL_CACHE_TTL = 0
+        INSTRUMENTATION_ENABLED = False
+        # memory 后端默认不开启ETag，测试中显式开启
+        ETAG_ENABLED = True
+
+    config['pytest'] = PytestConfig
+    app = create_app('pytest')
+    with app.app_context():
+        db.create_all()
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def login(client):
+    """login(account, password) 返回带令牌的请求头"""
+    def login(account, password):
+        response = client.post('/api/auth/login', json={'account': account, 'password': password})
+        assert response.status_code == 200, response.get_data(as_text=True)
+        return {'Authorization': f"Bearer {response.get_json()['token']}"}
+    return login
@@ -0,0 +1,43 @@
+"""修改课程和用户的写入路径未调用 bump() 时，分析接口的缓存也应失效"""
+
+from app import db
+from app.models import User, Course
+from app.models.course import course_students
+
+
+def seed(app):
+    with app.app_context():
+        student = User(account='s0', username='学生', email='s0@example.com', password_hash='x', role='student')
+        db.session.add(student)
+        db.session.flush()
+        course = Course(title='课程')
+        db.session.add(course)
+        db.session.flush()
+        db.session.execute(course_students.insert(), [{'course_id': course.id, 'user_id': student.id}])
+        db.session.commit()
+        return course.id, student.id
+
+
+def test_overview_reflects_new_user_and_course(app, client):
+    seed(app)
+    overview = client.get('/api/analytics/overview').get_json()
+
+    response = client.post('/api/auth/register', json={
+        'account': 's1', 'username': '新学生', 'email': 's1@example.com', 'password': 'secret', 'role': 'student'
+    })
+    assert response.status_code == 201
+    assert client.post('/api/courses', json={'title': '新课程'}).status_code == 201
+
+    data = client.get('/api/analytics/overview').get_json()
+    assert data['user_counts']['total'] == overview['user_counts']['total'] + 1
+    assert data['course_counts']['total'] == overview['course_counts']['total'] + 1
+
+
+def test_class_performance_reflects_renamed_student(app, client):
+    course_id, student_id = seed(app)
+    url = f'/api/analytics/class-performance/{course_id}'
+    assert client.get(url).get_json()['progress_data'][0]['username'] == '学生'
+
+    assert client.put(f'/api/users/{student_id}', json={'username': '改名'}).status_code == 200
+
+    assert client.get(url).get_json()['progress_data'][0]['username'] == '改名'
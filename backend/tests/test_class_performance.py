@@ -0,0 +1,52 @@
+"""班级表现分析的完成率分位数与 completion_stats 统计同一批选课学生"""
+
+from datetime import datetime
+
+from app import db
+from app.models import User, Course
+from app.services import sketches
+from app.services.ingest_buffer import write_rows
+
+
+def activity(user_id, course_id, completed):
+    now = datetime.utcnow()
+    return {'user_id': user_id, 'course_id': course_id, 'activity_type': 'quiz', 'resource_id': None,
+            'duration': 60, 'score': 80.0, 'completed': completed, 'data_json': None,
+            'created_at': now, 'updated_at': now}
+
+
+def test_completion_rate_sketch_covers_enrolled_students(app, client):
+    with app.app_context():
+        teacher = User(account='teacher', username='教师', email='teacher@example.com',
+                       password_hash='x', role='teacher')
+        students = [User(account=f's{i}', username=f'学生{i}', email=f's{i}@example.com',
+                         password_hash='x', role='student') for i in range(4)]
+        db.session.add_all([teacher] + students)
+        db.session.flush()
+        course = Course(title='课程', instructor_id=teacher.id)
+        db.session.add(course)
+        db.session.commit()
+        course_id, teacher_id = course.id, teacher.id
+        student_ids = [student.id for student in students]
+
+    for student_id in student_ids:
+        assert client.post(f'/api/courses/{course_id}/enroll/{student_id}').status_code == 200
+
+    with app.app_context():
+        # 完成率分别为 50%、100%、0%（无活动）、0%；教师未选课，不计入
+        write_rows([
+            activity(student_ids[0], course_id, True), activity(student_ids[0], course_id, False),
+            activity(student_ids[1], course_id, True),
+            activity(student_ids[3], course_id, False),
+            activity(teacher_id, course_id, True),
+        ])
+    # 退选的学生移出草图
+    assert client.delete(f'/api/courses/{course_id}/enroll/{student_ids[3]}').status_code == 200
+
+    data = client.get(f'/api/analytics/class-performance/{course_id}').get_json()
+    completion = data['percentiles']['completion_rate']
+    assert data['student_count'] == 3
+    assert completion['count'] == 3
+    # completion_stats 的中位数按学生精确计算，草图分位数的误差不超过半个桶宽
+    assert data['completion_stats']['median'] == 50
+    assert abs(completion['p50'] - 50) <= 0.5 / sketches.BINS_PER_UNIT
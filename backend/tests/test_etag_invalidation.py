@@ -0,0 +1,122 @@
+"""批量写入后条件请求的ETag应失效"""
+
+from app import db
+from app.models import User, Course, GradeSetting, StudentGrade
+from app.models.course import course_students
+
+
+def seed_course(app, students=3):
+    with app.app_context():
+        teacher = User(account='teacher', username='教师', email='teacher@example.com',
+                       password_hash='x', role='teacher')
+        users = [User(account=f's{i}', username=f'学生{i}', email=f's{i}@example.com',
+                      password_hash='x', role='student') for i in range(students)]
+        db.session.add_all([teacher] + users)
+        db.session.flush()
+        course = Course(title='课程', instructor_id=teacher.id)
+        db.session.add(course)
+        db.session.flush()
+        db.session.execute(course_students.insert(), [{'course_id': course.id, 'user_id': u.id} for u in users])
+        db.session.add(GradeSetting(course_id=course.id, final_exam_weight=60, regular_grade_weight=40))
+        db.session.add_all([StudentGrade(course_id=course.id, user_id=u.id, final_exam_score=70, regular_grade=80,
+                                         total_score=74) for u in users])
+        db.session.commit()
+        return course.id, [u.id for u in users]
+
+
+def conditional_get(client, url):
+    """先取得ETag，再确认带 If-None-Match 的请求返回304"""
+    response = client.get(url)
+    assert response.status_code == 200
+    etag = response.headers['ETag']
+    assert client.get(url, headers={'If-None-Match': etag}).status_code == 304
+    return etag
+
+
+def test_batch_grade_update_changes_course_grades_etag(app, client):
+    course_id, student_ids = seed_course(app)
+    url = f'/api/courses/{course_id}/grades'
+    etag = conditional_get(client, url)
+
+    response = client.post(f'/api/courses/{course_id}/grades/batch', json={
+        'grades': [{'user_id': student_ids[0], 'final_exam_score': 90}]
+    })
+    assert response.status_code == 200
+
+    response = client.get(url, headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    grades = {item['user_id']: item for item in response.get_json()['grades']}
+    assert grades[student_ids[0]]['final_exam_score'] == 90
+    assert grades[student_ids[0]]['total_score'] == 86
+
+
+def test_admin_grade_weights_change_course_grades_etag(app, client, login):
+    from werkzeug.security import generate_password_hash
+
+    course_id, student_ids = seed_course(app)
+    with app.app_context():
+        db.session.add(User(account='admin', username='管理员', email='admin@example.com',
+                            password_hash=generate_password_hash('secret'), role='admin'))
+        db.session.commit()
+    url = f'/api/courses/{course_id}/grades'
+    etag = conditional_get(client, url)
+
+    response = client.put('/api/admin/grade-settings', headers=login('admin', 'secret'),
+                          json={'final_exam_weight': 50, 'regular_grade_weight': 50})
+    assert response.status_code == 200
+
+    response = client.get(url, headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['settings']['final_exam_weight'] == 50
+    assert all(item['total_score'] == 75 for item in data['grades'])
+
+
+def test_recompute_total_scores_changes_course_grades_etag(app, client):
+    from app.services import gradebook
+
+    course_id, _ = seed_course(app)
+    url = f'/api/courses/{course_id}/grades'
+    etag = conditional_get(client, url)
+
+    with app.app_context():
+        GradeSetting.query.filter_by(course_id=course_id).update({'final_exam_weight': 0, 'regular_grade_weight': 100})
+        db.session.commit()
+        etag = conditional_get(client, url)
+        # 全部课程重算
+        gradebook.recompute_total_scores()
+        db.session.commit()
+
+    response = client.get(url, headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert all(item['total_score'] == 80 for item in response.get_json()['grades'])
+
+
+def test_activity_write_keeps_course_list_etag(app, client):
+    course_id, student_ids = seed_course(app)
+    etag = conditional_get(client, '/api/courses')
+
+    response = client.post('/api/activities', json={
+        'user_id': student_ids[0], 'course_id': course_id, 'activity_type': 'quiz', 'duration': 60
+    })
+    assert response.status_code == 201
+    with app.app_context():
+        assert db.session.get(Course, course_id).activity_count == 1
+
+    assert client.get('/api/courses', headers={'If-None-Match': etag}).status_code == 304
+
+
+def test_memory_backend_etag_rotates_after_ttl(app, client, monkeypatch):
+    """memory 后端的版本号不在进程间共享，其他进程的写入最多在一个TTL后使ETag失效"""
+    from app.utils import etag as etag_module
+
+    seed_course(app)
+    now = 1_000_000.0
+    monkeypatch.setattr(etag_module.time, 'time', lambda: now)
+    etag = conditional_get(client, '/api/courses')
+
+    now += app.config['ANALYTICS_CACHE_TTL']
+    response = client.get('/api/courses', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
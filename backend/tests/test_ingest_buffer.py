@@ -0,0 +1,120 @@
+"""活动写缓冲：无法写入的事件进入死信文件，连接类错误保留事件待重试"""
+
+import glob
+import json
+import os
+from datetime import datetime
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from app import db
+from app.models import User, Course, Activity
+from app.services import ingest_buffer
+
+
+@pytest.fixture
+def worker(app, tmp_path):
+    app.config.update(ACTIVITY_BUFFER_ENABLED=True, ACTIVITY_BUFFER_SPOOL_DIR=str(tmp_path),
+                      ACTIVITY_BUFFER_FLUSH_INTERVAL=60)
+    worker = app.extensions['activity_buffer'] = ingest_buffer._BufferWorker(app)
+    yield worker
+    worker.stop()
+
+
+@pytest.fixture
+def ids(app):
+    with app.app_context():
+        user = User(account='s0', username='学生', email='s0@example.com', password_hash='x', role='student')
+        course = Course(title='课程')
+        db.session.add_all([user, course])
+        db.session.commit()
+        return user.id, course.id
+
+
+def activity(user_id, course_id, activity_type='quiz'):
+    now = datetime.utcnow()
+    return {'user_id': user_id, 'course_id': course_id, 'activity_type': activity_type, 'resource_id': None,
+            'duration': 60, 'score': 80.0, 'completed': True, 'data_json': None,
+            'created_at': now, 'updated_at': now}
+
+
+def spool_segments(worker):
+    return glob.glob(worker.prefix + '.spool.*')
+
+
+def test_invalid_event_goes_to_dead_letter(app, worker, ids):
+    rows = [activity(*ids), activity(*ids, activity_type=None), activity(*ids), activity(*ids)]
+    for row in rows:
+        worker.submit(row)
+    worker.flush()
+
+    with app.app_context():
+        assert Activity.query.count() == 3
+    assert worker.stats['flushed'] == 3
+    assert worker.stats['dead_lettered'] == 1
+    assert worker.in_flight == 0
+    assert spool_segments(worker) == []
+    with open(worker.dead_letter_path, encoding='utf-8') as f:
+        letters = [json.loads(line) for line in f]
+    assert [letter['row']['activity_type'] for letter in letters] == [None]
+
+
+def test_connection_error_keeps_segment(app, worker, ids, monkeypatch):
+    def unavailable(rows):
+        raise OperationalError('INSERT', {}, Exception('database is locked'))
+
+    monkeypatch.setattr(ingest_buffer, 'write_rows', unavailable)
+    for _ in range(3):
+        worker.submit(activity(*ids))
+    worker.flush()
+
+    assert worker.stats['dead_lettered'] == 0
+    assert worker.stats['errors'] == 1
+    segments = spool_segments(worker)
+    assert len(segments) == 1
+    assert len(ingest_buffer.read_spool(segments[0])) == 3
+    assert not os.path.exists(worker.dead_letter_path)
+
+    # 数据库恢复后，下一个进程启动时写回保留的分段
+    monkeypatch.undo()
+    worker.stop()
+    worker.lock_file.close()
+    assert ingest_buffer._BufferWorker(app).recover() == 3
+    with app.app_context():
+        assert Activity.query.count() == 3
+
+
+def test_leftover_spool_recovered_in_flusher_thread(app, worker, ids, tmp_path):
+    # 已退出进程残留的分段，其中一条事件无法写入
+    leftover = str(tmp_path / 'activities-1-1')
+    ingest_buffer._rewrite_spool(leftover + '.spool.1', [activity(*ids), activity(*ids, activity_type=None)])
+    open(leftover + '.lock', 'w').close()
+
+    worker.submit(activity(*ids))
+    worker.stop()
+
+    with app.app_context():
+        assert Activity.query.count() == 2
+    assert worker.stats['dead_lettered'] == 1
+    assert glob.glob(leftover + '.*') == []
+
+
+def test_failed_start_releases_spool_lock(app, worker, ids, monkeypatch):
+    class BrokenThread:
+        def __init__(self, **kwargs):
+            pass
+
+        def start(self):
+            raise RuntimeError("can't start new thread")
+
+    monkeypatch.setattr(ingest_buffer.threading, 'Thread', BrokenThread)
+    with pytest.raises(RuntimeError):
+        worker.submit(activity(*ids))
+    assert worker.thread is None and worker.lock_file is None
+
+    monkeypatch.undo()
+    worker.submit(activity(*ids))
+    worker.stop()
+    with app.app_context():
+        assert Activity.query.count() == 1
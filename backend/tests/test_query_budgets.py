@@ -0,0 +1,106 @@
+"""已标注 @query_budget 的 GET 接口在不同数据规模下都不超出预算
+
+每个接口分别在小规模和较大规模的数据上请求，出现逐条查询（N+1）时较大规模的请求会超出预算，
+由 query_budget_pytest 插件使测试失败并列出执行的SQL语句。
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+from werkzeug.security import generate_password_hash
+
+from app import db
+from app.models import (User, Course, CourseSection, CourseResource, Discussion, DiscussionReply,
+                        Assignment, AssignmentSubmission, CourseReview, GradeSetting, StudentGrade,
+                        CourseProgress, Activity)
+from app.models.course import course_students
+
+SIZES = (3, 20)
+
+URLS = [
+    '/api/courses',
+    '/api/courses/{course_id}',
+    '/api/courses/{course_id}/students',
+    '/api/users/{student_id}/courses',
+    '/api/users/{teacher_id}/courses',
+    '/api/users/{student_id}/grades',
+    '/api/courses/{course_id}/grades',
+    '/api/courses/{course_id}/sections',
+    '/api/courses/{course_id}/sections/{section_id}',
+    '/api/sections/{section_id}/resources',
+    '/api/courses/{course_id}/discussions',
+    '/api/courses/{course_id}/discussions/{discussion_id}',
+    '/api/courses/{course_id}/assignments?user_id={student_id}',
+    '/api/courses/{course_id}/assignments/{assignment_id}/submissions',
+    '/api/courses/{course_id}/reviews',
+    '/api/users/{student_id}/activities',
+    '/api/courses/{course_id}/activities',
+    '/api/admin/users',
+    '/api/admin/courses',
+    '/api/admin/courses/{course_id}',
+    '/api/admin/courses/{course_id}/students',
+]
+
+
+def seed(size):
+    """生成 size 门课程和 size 个学生，第一门课程带 size 个章节、讨论、作业、评价和成绩"""
+    now = datetime.utcnow()
+    admin = User(account='admin', username='管理员', email='admin@example.com',
+                 password_hash=generate_password_hash('secret'), role='admin')
+    teachers = [User(account=f't{i}', username=f'教师{i}', email=f't{i}@example.com',
+                     password_hash='x', role='teacher') for i in range(size)]
+    students = [User(account=f's{i}', username=f'学生{i}', email=f's{i}@example.com',
+                     password_hash='x', role='student') for i in range(size)]
+    db.session.add_all([admin] + teachers + students)
+    db.session.flush()
+
+    courses = [Course(title=f'课程{i}', instructor_id=teachers[i].id) for i in range(size)]
+    db.session.add_all(courses)
+    db.session.flush()
+    course = courses[0]
+    db.session.execute(course_students.insert(), [
+        {'course_id': c.id, 'user_id': s.id, 'enrolled_at': now} for c in courses for s in students
+    ])
+
+    sections = [CourseSection(course_id=course.id, title=f'章节{i}', order=i) for i in range(size)]
+    discussions = [Discussion(course_id=course.id, user_id=s.id, title='话题', content='内容') for s in students]
+    assignments = [Assignment(course_id=course.id, title=f'作业{i}', deadline=now + timedelta(days=7))
+                   for i in range(size)]
+    db.session.add_all(sections + discussions + assignments)
+    db.session.flush()
+
+    db.session.add_all([CourseResource(section_id=sections[0].id, title=f'资源{i}', resource_type='document', order=i)
+                        for i in range(size)])
+    db.session.add_all([DiscussionReply(discussion_id=discussions[0].id, user_id=s.id, content='回复')
+                        for s in students])
+    db.session.add_all([AssignmentSubmission(assignment_id=assignments[0].id, user_id=s.id, content='答案')
+                        for s in students])
+    db.session.add_all([CourseReview(course_id=course.id, user_id=s.id, rating=5, content='好') for s in students])
+    db.session.add_all([GradeSetting(course_id=c.id, final_exam_weight=60, regular_grade_weight=40) for c in courses])
+    db.session.add_all([StudentGrade(course_id=c.id, user_id=s.id, final_exam_score=80, regular_grade=90)
+                        for c in courses for s in students])
+    db.session.add_all([CourseProgress(course_id=c.id, user_id=s.id, progress_percent=50)
+                        for c in courses for s in students])
+    db.session.add_all([Activity(course_id=course.id, user_id=s.id, activity_type='quiz', duration=60, score=80)
+                        for s in students])
+    db.session.commit()
+    return {
+        'course_id': course.id, 'student_id': students[0].id, 'teacher_id': teachers[0].id,
+        'section_id': sections[0].id, 'discussion_id': discussions[0].id,
+        'assignment_id': assignments[0].id
+    }
+
+
+@pytest.fixture(params=SIZES, ids=lambda size: f'size{size}')
+def seeded(request, app):
+    with app.app_context():
+        return seed(request.param)
+
+
+@pytest.mark.parametrize('template', URLS)
+def test_get_endpoint_within_query_budget(client, login, seeded, template):
+    response = client.get(template.format(**seeded), headers=login('admin', 'secret'))
+    assert response.status_code == 200, response.get_data(as_text=True)
+    # 接口需标注预算，否则插件无从检查
+    assert 'X-Query-Budget' in response.headers
+    assert int(response.headers['X-Query-Count']) <= int(response.headers['X-Query-Budget'])